@@ -3,15 +3,30 @@
 Working dental app with stable Gradio 3.50.2
 """
 import json, os
-import gradio as gr
-from src.detect import Detector
-from src.tooth_numbering import grid_tooth_map
+from src.tooth_numbering import image_tooth_map
 from src.postprocess import assign_lesions_to_teeth_and_format
 
-# Initialize detector
-detector = Detector()
+# Detector, tooth locator and gradio are imported on first use to keep startup fast
+_detector = None
+_tooth_locator = None
 os.makedirs(".outputs", exist_ok=True)
 
+def get_detector():
+    """Return the shared Detector, creating it on first use"""
+    global _detector
+    if _detector is None:
+        from src.detect import Detector
+        _detector = Detector()
+    return _detector
+
+def get_tooth_locator():
+    """Return the shared ToothLocator, creating it on first use"""
+    global _tooth_locator
+    if _tooth_locator is None:
+        from src.tooth_locator import ToothLocator
+        _tooth_locator = ToothLocator()
+    return _tooth_locator
+
 def analyze_xray(img):
     """Analyze X-ray and return results"""
     if img is None:
@@ -19,8 +34,8 @@ def analyze_xray(img):
     
     try:
         # Detection and processing
-        dets = detector.detect(img)
-        locator = grid_tooth_map(img.size, "universal")
+        dets = get_detector().detect(img)
+        locator = image_tooth_map(img, "universal", get_tooth_locator())
         findings, overlay = assign_lesions_to_teeth_and_format(img, dets, locator)
         
         # Generate report
@@ -44,6 +59,7 @@ def analyze_xray(img):
 
 # Create the interface
 def create_app():
+    import gradio as gr
     return gr.Interface(
         fn=analyze_xray,
         inputs=gr.Image(type="pil", label="Upload dental X-ray"),
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite for the detection and serving paths
+
+Results are written to JSON (one file per commit) so runs can be compared:
+    python3 benchmark_suite.py
+    python3 benchmark_suite.py --compare .outputs/benchmarks/<old>.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from types import SimpleNamespace
+from unittest import mock
+
+IMAGE_SIZES = [(640, 320), (1280, 640), (2964, 1464)]
+
+def summarize(samples_ms):
+    """Robust statistics for one benchmark; the median is what --compare uses"""
+    ordered = sorted(samples_ms)
+    return {
+        "n": len(ordered),
+        "min_ms": round(ordered[0], 3),
+        "median_ms": round(statistics.median(ordered), 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "stdev_ms": round(statistics.stdev(ordered), 3) if len(ordered) > 1 else 0.0,
+    }
+
+def bench(fn, warmup, repeats):
+    """Call fn warmup times untimed, then time it repeats times"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+def synthetic_xray(size, seed=0):
+    """Grayscale noise with a bright band where the teeth would be"""
+    import numpy as np
+    from PIL import Image
+    w, h = size
+    rng = np.random.default_rng(seed)
+    a = rng.normal(60, 20, (h, w))
+    a[int(h * 0.3):int(h * 0.7), int(w * 0.1):int(w * 0.9)] += 120
+    return Image.fromarray(np.clip(a, 0, 255).astype(np.uint8)).convert("RGB")
+
+def png_bytes(img):
+    import io
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+def bench_detector(args, results):
+    from src.detect import Detector
+    detectors = {"mock": Detector(mock_ok=True)}
+    if os.path.exists(args.weights):
+        detectors["real"] = Detector(args.weights, mock_ok=False)
+    else:
+        print(f"   ⚠️  {args.weights} not found - skipping real Detector benchmarks")
+
+    for name, detector in detectors.items():
+        for size in IMAGE_SIZES:
+            img = synthetic_xray(size)
+            key = f"detector.{name}.{size[0]}x{size[1]}"
+            results[key] = bench(lambda: detector.detect(img), args.warmup, args.repeats)
+            print(f"   {key:<40} {results[key]['median_ms']:>10.3f} ms")
+
+def bench_locator(args, results):
+    from src.tooth_numbering import grid_tooth_map
+    from src.tooth_locator import ToothLocator
+    import numpy as np
+    rng = np.random.default_rng(0)
+    tooth_locator = ToothLocator()
+    for size in IMAGE_SIZES:
+        w, h = size
+        img = synthetic_xray(size)
+        key = f"locator.fit_teeth.{w}x{h}"
+        results[key] = bench(lambda: tooth_locator.locate(img), args.warmup, args.repeats)
+        print(f"   {key:<40} {results[key]['median_ms']:>10.3f} ms")
+        locator = grid_tooth_map(size, "universal")
+        boxes = [[x, y, x + 40, y + 40] for x, y in zip(rng.integers(0, w - 40, 1000), rng.integers(0, h - 40, 1000))]
+        key = f"locator.1000_boxes.{w}x{h}"
+        results[key] = bench(lambda: [locator(b) for b in boxes], args.warmup, args.repeats)
+        print(f"   {key:<40} {results[key]['median_ms']:>10.3f} ms")
+        key = f"locator.assign_1000_boxes.{w}x{h}"
+        results[key] = bench(lambda: locator.assign(boxes), args.warmup, args.repeats)
+        print(f"   {key:<40} {results[key]['median_ms']:>10.3f} ms")
+
+def bench_postprocess(args, results):
+    from src.postprocess import assign_lesions_to_teeth_and_format
+    from src.tooth_numbering import grid_tooth_map
+    for size in IMAGE_SIZES:
+        w, h = size
+        img = synthetic_xray(size)
+        locator = grid_tooth_map(size, "universal")
+        dets = [{"bbox": [int(w * f), int(h * 0.4), int(w * f) + 60, int(h * 0.4) + 60], "conf": 0.8, "cls": "caries"}
+                for f in (0.1, 0.3, 0.5, 0.7, 0.85)]
+        key = f"postprocess.5_lesions.{w}x{h}"
+        results[key] = bench(lambda: assign_lesions_to_teeth_and_format(img, dets, locator), args.warmup, args.repeats)
+        print(f"   {key:<40} {results[key]['median_ms']:>10.3f} ms")
+
+def bench_transport(args, results):
+    """Round trip of one decoded image to an inference process: pickled through the queue vs a shared-memory slot"""
+    import numpy as np
+    from src.shm_transport import InferencePool, image_size_handler
+    for transport in ("pickle", "shm"):
+        with InferencePool(1, image_size_handler, transport=transport) as pool:
+            for size in IMAGE_SIZES:
+                w, h = size
+                img = np.asarray(synthetic_xray(size))
+                key = f"transport.{transport}.{w}x{h}"
+                results[key] = bench(lambda: pool.submit(img).result(), args.warmup, args.repeats)
+                print(f"   {key:<40} {results[key]['median_ms']:>10.3f} ms")
+
+def _fake_openai_client(*_, **__):
+    """Stand-in for openai.OpenAI that answers instantly"""
+    message = SimpleNamespace(content="Mocked dental assistant reply.")
+    completion = SimpleNamespace(choices=[SimpleNamespace(message=message)])
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **_: completion)))
+
+@contextmanager
+def scratch_workdir(shared=("weights", "operating_points.json")):
+    """Run in a temporary directory that is deleted afterwards.
+
+    The app writes patient records, images, overlays, stores and the findings
+    journal under .outputs/ relative to the working directory; here they land
+    in the scratch copy. Model weights and operating points are linked in so
+    the same model is served.
+    """
+    repo = os.getcwd()
+    scratch = tempfile.mkdtemp(prefix="bench_http_")
+    for name in shared:
+        if os.path.exists(name):
+            os.symlink(os.path.abspath(name), os.path.join(scratch, name))
+    os.makedirs(os.path.join(scratch, ".outputs"))
+    os.chdir(scratch)
+    try:
+        yield scratch
+    finally:
+        os.chdir(repo)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+def bench_http(args, results):
+    """Drive /analyze and /chat/api through the Flask test client under concurrency"""
+    import flask_app
+
+    with ExitStack() as stack:
+        # Benchmark patients and their files never reach the real .outputs/
+        stack.enter_context(scratch_workdir())
+        # Keep everything local: OpenAI, SMTP and Twilio are replaced with fakes
+        stack.enter_context(mock.patch.object(flask_app, "OPENAI_API_KEY", "benchmark"))
+        stack.enter_context(mock.patch.object(flask_app, "EMAIL_USERNAME", "bench@example.com"))
+        stack.enter_context(mock.patch.object(flask_app, "EMAIL_PASSWORD", "benchmark"))
+        stack.enter_context(mock.patch("openai.OpenAI", _fake_openai_client))
+        stack.enter_context(mock.patch("smtplib.SMTP"))
+        stack.enter_context(mock.patch.object(flask_app, "send_patient_sms", lambda *a, **k: True))
+
+        payloads = {size: png_bytes(synthetic_xray(size)) for size in IMAGE_SIZES}
+
+        def analyze(size):
+            import io
+            client = flask_app.app.test_client()
+            start = time.perf_counter()
+            resp = client.post("/analyze", data={
+                "image": (io.BytesIO(payloads[size]), "xray.png"),
+                "patient_name": "Bench Patient",
+                "patient_email": "patient@example.com",
+                "send_email": "true",
+            })
+            assert resp.status_code == 200 and resp.get_json().get("success"), resp.get_json()
+            return (time.perf_counter() - start) * 1000
+
+        def chat(_):
+            client = flask_app.app.test_client()
+            start = time.perf_counter()
+            resp = client.post("/chat/api", json={
+                "message": "What does my finding on tooth 14 mean?",
+                "patient_name": "Bench Patient",
+                "findings": [{"tooth_id": 14, "region": "MO", "conf": 0.85}],
+            })
+            assert resp.status_code == 200, resp.status_code
+            return (time.perf_counter() - start) * 1000
+
+        cases = [(f"http.analyze.{w}x{h}", analyze, (w, h)) for w, h in IMAGE_SIZES]
+        cases.append(("http.chat", chat, None))
+
+        for name, fn, arg in cases:
+            for _ in range(args.warmup):
+                fn(arg)
+            for concurrency in args.concurrency:
+                requests_total = max(args.repeats, concurrency)
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    start = time.perf_counter()
+                    samples = list(pool.map(fn, [arg] * requests_total))
+                    elapsed = time.perf_counter() - start
+                key = f"{name}.c{concurrency}"
+                results[key] = dict(summarize(samples), throughput_rps=round(requests_total / elapsed, 2))
+                print(f"   {key:<40} {results[key]['median_ms']:>10.3f} ms  {results[key]['throughput_rps']:>8} req/s")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def compare(current, baseline_path, threshold):
+    """Print median ratios against a previous run and flag regressions"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n📊 Comparison against {baseline.get('commit', baseline_path)}:")
+    regressions = 0
+    for key, stats in current["results"].items():
+        old = baseline["results"].get(key)
+        if not old or not old["median_ms"]:
+            continue
+        ratio = stats["median_ms"] / old["median_ms"]
+        flag = "❌ regression" if ratio > 1 + threshold else "✅"
+        regressions += ratio > 1 + threshold
+        print(f"   {key:<40} {old['median_ms']:>10.3f} → {stats['median_ms']:>10.3f} ms  x{ratio:.2f} {flag}")
+    return regressions
+
+SUITES = {
+    "detector": bench_detector,
+    "locator": bench_locator,
+    "postprocess": bench_postprocess,
+    "transport": bench_transport,
+    "http": bench_http,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detection and serving paths")
+    parser.add_argument("--suites", default=",".join(SUITES), help="comma-separated subset of " + ",".join(SUITES))
+    parser.add_argument("--weights", default="weights/best.pt")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--concurrency", default="1,4", help="client threads for the HTTP suite")
+    parser.add_argument("--threads", type=int, default=1, help="pinned inference threads, for stable numbers")
+    parser.add_argument("--output-dir", default=".outputs/benchmarks")
+    parser.add_argument("--compare", default=None, help="previous result JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="median slowdown counted as a regression")
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+
+    # Pin threads before torch or flask_app are imported (flask_app reads the env)
+    os.environ["INFERENCE_INTRA_THREADS"] = str(args.threads)
+    os.environ["INFERENCE_INTER_THREADS"] = "1"
+    os.environ["INFERENCE_PIN_CPUS"] = "true"
+    from src.runtime import configure_runtime, describe_runtime
+    configure_runtime()
+
+    print("🦷 Benchmark Suite")
+    print("=" * 60)
+    print(describe_runtime())
+
+    current = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "threads": args.threads,
+        "warmup": args.warmup,
+        "repeats": args.repeats,
+        "results": {},
+    }
+    for name in args.suites.split(","):
+        print(f"\n▶️  {name}")
+        SUITES[name](args, current["results"])
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    out_path = os.path.join(args.output_dir, f"{current['commit']}.json")
+    with open(out_path, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"\n✅ Results saved: {out_path}")
+
+    if args.compare:
+        return 1 if compare(current, args.compare, args.threshold) else 0
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Find the best workers x threads split for CPU inference on this machine
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+import numpy as np
+from src.runtime import configure_runtime, describe_runtime
+
+def _worker(args, workers, threads, index, barrier, queue):
+    """One inference worker: configure threads, load the model, detect in a loop"""
+    configure_runtime(intra_threads=threads, inter_threads=1, workers=workers,
+                      worker_index=index, pin=args.pin)
+    from PIL import Image
+    from src.detect import Detector
+
+    detector = Detector(args.weights, mock_ok=False)
+    rng = np.random.default_rng(index)
+    img = Image.fromarray(rng.integers(0, 255, (args.height, args.width), dtype=np.uint8)).convert("RGB")
+    detector.detect(img)  # warmup
+
+    if index == 0:
+        print(f"   {describe_runtime()}")
+    barrier.wait()
+
+    latencies = []
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        detector.detect(img)
+        latencies.append((time.perf_counter() - start) * 1000)
+    queue.put(latencies)
+
+def run_split(args, workers, threads):
+    """Run `workers` processes with `threads` intra-op threads each and aggregate"""
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(args, workers, threads, i, barrier, queue))
+             for i in range(workers)]
+    for p in procs:
+        p.start()
+    latencies = []
+    for _ in procs:
+        latencies.extend(queue.get())
+    for p in procs:
+        p.join()
+
+    lat = np.asarray(latencies)
+    return {
+        "workers": workers,
+        "threads": threads,
+        "throughput_ips": round(len(lat) / args.duration, 2),
+        "p50_ms": round(float(np.percentile(lat, 50)), 1),
+        "p95_ms": round(float(np.percentile(lat, 95)), 1),
+        "p99_ms": round(float(np.percentile(lat, 99)), 1),
+    }
+
+def candidate_splits(cores):
+    """All workers x threads combinations that do not oversubscribe the cores"""
+    return [(w, cores // w) for w in range(1, cores + 1) if cores % w == 0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark workers x threads splits")
+    parser.add_argument("--weights", default="weights/best.pt")
+    parser.add_argument("--width", type=int, default=2964)
+    parser.add_argument("--height", type=int, default=1464)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per split")
+    parser.add_argument("--pin", action="store_true", help="pin workers to disjoint cores")
+    parser.add_argument("--p95-budget", type=float, default=None, help="ignore splits with slower p95 (ms)")
+    parser.add_argument("--output", default=".outputs/thread_benchmark.json")
+    args = parser.parse_args()
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print("🦷 Workers x Threads Benchmark")
+    print("=" * 50)
+    print(f"🖥️  {cores} cores available, {args.duration:.0f}s per split, pinning {'on' if args.pin else 'off'}")
+    if not os.path.exists(args.weights):
+        print(f"⚠️  {args.weights} not found - workers will run mock detection")
+
+    results = []
+    for workers, threads in candidate_splits(cores):
+        print(f"\n▶️  {workers} workers x {threads} threads")
+        result = run_split(args, workers, threads)
+        results.append(result)
+        print(f"   {result['throughput_ips']} img/s, p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms")
+
+    eligible = [r for r in results if args.p95_budget is None or r["p95_ms"] <= args.p95_budget] or results
+    best = max(eligible, key=lambda r: r["throughput_ips"])
+    print(f"\n🏆 Best split: {best['workers']} workers x {best['threads']} threads "
+          f"({best['throughput_ips']} img/s, p95 {best['p95_ms']} ms)")
+    print(f"💡 INFERENCE_WORKERS={best['workers']} INFERENCE_INTRA_THREADS={best['threads']} "
+          f"gunicorn -c gunicorn.conf.py flask_app:app")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"cores": cores, "pinned": args.pin, "results": results, "best": best}, f, indent=2)
+    print(f"📊 Results saved: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Rebuild the findings index from every patient record
+
+The web app keeps the index current on its own: each analysis appends its
+findings to the index journal. Run this offline after records were edited or
+removed by hand, or to fold a long journal back into the index file.
+"""
+import argparse
+import time
+from src.findings_index import build_findings_index, FINDINGS_INDEX, FINDINGS_JOURNAL
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the findings index from .outputs/patient_*.json")
+    parser.add_argument("--outputs", default=".outputs", help="directory holding the patient records")
+    parser.add_argument("--index", default=FINDINGS_INDEX)
+    parser.add_argument("--journal", default=FINDINGS_JOURNAL)
+    args = parser.parse_args()
+
+    print("🗺️ Findings Index")
+    print("=" * 40)
+    start = time.perf_counter()
+    index = build_findings_index(args.outputs, args.index, args.journal)
+    print(f"   {len(index)} findings from {len(index.visit_rows)} records "
+          f"({len(index.patients)} patients) in {time.perf_counter() - start:.2f}s")
+    print(f"✅ Saved {args.index}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Pre-decode training images into memory-mapped caches
+
+Decodes and resizes every image of a dataset once to the training imgsz so the
+data loader reads zero-copy views instead of decoding JPEGs every epoch.
+Caches are rebuilt automatically when any image or label changes.
+"""
+import argparse
+import time
+from src.image_cache import build_image_cache, cache_prefix_for, image_files
+from src.labels import dataset_split_dirs
+
+def build_dataset_caches(dataset_yaml, imgsz=640, force=False):
+    """Build (or reuse) the cache for every split of a dataset"""
+    caches = {}
+    for split, image_dir in dataset_split_dirs(dataset_yaml).items():
+        files = image_files(image_dir)
+        if not files:
+            continue
+        start = time.perf_counter()
+        caches[split] = build_image_cache(files, cache_prefix_for(image_dir, imgsz), imgsz=imgsz,
+                                          augment=(split == 'train'), force=force)
+        print(f"   {split}: {len(files)} images ready in {time.perf_counter() - start:.2f}s")
+    return caches
+
+def main():
+    parser = argparse.ArgumentParser(description="Build memory-mapped training image caches")
+    parser.add_argument("--data", default="data/dataset.yaml", help="dataset.yaml to cache")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--force", action="store_true", help="rebuild even if sources are unchanged")
+    args = parser.parse_args()
+
+    print("🦷 Training Image Cache")
+    print("=" * 40)
+    build_dataset_caches(args.data, args.imgsz, args.force)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Find duplicate images and train/val/test leakage across datasets
+
+Hashes every image (SHA-1 for exact copies, 64-bit DCT perceptual hash for
+re-encoded or resized copies) in parallel, caches hashes in a sidecar per
+dataset, and reports duplicate groups that straddle splits or datasets.
+--regroup rebuilds one dataset's splits so each duplicate group lands in a
+single split.
+"""
+import argparse
+import json
+import os
+import time
+from src.dedup import apply_split_plan, hash_dataset, leakage_report, plan_grouped_splits
+
+def default_roots():
+    """data/ plus every dataset under datasets/"""
+    roots = ['data'] if os.path.isdir('data/images') else []
+    if os.path.isdir('datasets'):
+        roots += [os.path.join('datasets', d) for d in sorted(os.listdir('datasets'))
+                  if os.path.isdir(os.path.join('datasets', d, 'images'))]
+    return roots
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect duplicate images and split leakage")
+    parser.add_argument("roots", nargs="*", help="dataset roots containing images/<split>/ (default: data and datasets/*)")
+    parser.add_argument("--max-distance", type=int, default=6, help="perceptual hash bits that may differ for a near duplicate")
+    parser.add_argument("--workers", type=int, default=None, help="hashing processes (default: all CPUs)")
+    parser.add_argument("--force", action="store_true", help="rehash even unchanged images")
+    parser.add_argument("--output", default=".outputs/leakage_report.json")
+    parser.add_argument("--regroup", default=None, metavar="ROOT", help="rebuild this dataset's splits grouped by hash")
+    parser.add_argument("--val-fraction", type=float, default=0.2)
+    parser.add_argument("--test-fraction", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--apply", action="store_true", help="with --regroup: move the files (default: print the plan)")
+    args = parser.parse_args()
+
+    print("🦷 Dataset Deduplication")
+    print("=" * 50)
+    roots = args.roots or default_roots()
+    start = time.perf_counter()
+    records = []
+    for root in roots:
+        result = hash_dataset(root, args.workers, args.force)
+        records.append((root, result))
+        print(f"   {root}: {len(result['paths'])} images ({result['hashed']} newly hashed)")
+    print(f"⏱️  Hashing took {time.perf_counter() - start:.2f}s")
+
+    report = leakage_report(records, args.max_distance)
+    print(f"\n📊 {report['duplicate_groups']} duplicate groups, {report['leaking_groups']} leak across splits, "
+          f"{report['cross_dataset_groups']} span several datasets")
+    for group in report['groups']:
+        if group['leaks_across_splits']:
+            kind = "exact" if group['exact'] else "near"
+            print(f"   ⚠️  {kind}: " + ", ".join(f"{i['path']} [{i['split']}]" for i in group['images']))
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Report saved: {args.output}")
+
+    if args.regroup:
+        result = dict(records)[args.regroup] if args.regroup in dict(records) else hash_dataset(args.regroup, args.workers)
+        plan = plan_grouped_splits(result, args.max_distance, args.val_fraction, args.test_fraction, args.seed)
+        changes = [(p, old, new) for p, old, new in plan if old != new]
+        print(f"\n🔀 Regrouping {args.regroup}: {len(changes)} of {len(plan)} images change split")
+        for path, old, new in changes:
+            print(f"   {path}: {old} → {new}")
+        if args.apply:
+            moved = apply_split_plan(args.regroup, plan)
+            print(f"✅ Moved {moved} images (with labels)")
+        elif changes:
+            print("   Re-run with --apply to move the files")
+
+    return 1 if report['leaking_groups'] else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Distill the caries model into a smaller student for low-latency serving
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import time
+import numpy as np
+from PIL import Image
+from src.labels import build_label_index, dataset_split_dirs
+from src.materialize import manifest_from_dir, materialize_dataset, write_dataset_yaml
+from src.tiling import box_iou
+from src.detect import MODEL_REGISTRY
+
+DISTILL_ROOT = "runs/distill"
+
+def collect_items(roots):
+    """Manifest items for every image of the given dataset roots, exact duplicates dropped.
+
+    Names are prefixed with the root so data/ and datasets/*/ can share a view.
+    """
+    from src.dedup import hash_dataset
+    items, seen = [], set()
+    for root in roots:
+        sha1 = {}
+        if os.path.isdir(os.path.join(root, "images")):
+            result = hash_dataset(root)
+            sha1 = dict(zip(result["paths"].tolist(), result["sha1"].tolist()))
+        tag = os.path.basename(os.path.normpath(root))
+        for item in manifest_from_dir(root):
+            digest = sha1.get(item["image"])
+            if digest in seen:
+                continue
+            seen.add(digest)
+            item["name"] = f"{tag}_{item['name']}"
+            items.append(item)
+    return items
+
+def _read_rows(label_path):
+    if not label_path or os.path.getsize(label_path) == 0:
+        return np.zeros((0, 5), dtype=np.float32)
+    return np.loadtxt(label_path, ndmin=2, dtype=np.float32).reshape(-1, 5)
+
+def _xyxy(rows):
+    cx, cy, w, h = rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4]
+    return np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+def pseudo_label(teacher, items, label_dir, conf=0.25, imgsz=640, batch=8, iou_thr=0.5):
+    """Write teacher-augmented labels for train items and point the items at them.
+
+    Ground-truth boxes are kept as they are; teacher boxes above conf that do not
+    overlap a ground-truth box (IoU < iou_thr) are added, so unlabeled images and
+    lesions the annotators missed still teach the student.
+    """
+    from ultralytics import YOLO
+    model = YOLO(teacher, task="detect")
+    os.makedirs(label_dir, exist_ok=True)
+    added = 0
+    for start in range(0, len(items), batch):
+        chunk = items[start:start + batch]
+        results = model([i["image"] for i in chunk], conf=conf, imgsz=imgsz, device="cpu", verbose=False)
+        for item, result in zip(chunk, results):
+            gt = _read_rows(item["label"])
+            rows = [gt]
+            if result.boxes is not None and len(result.boxes):
+                xywhn = result.boxes.xywhn.cpu().numpy().astype(np.float32)
+                cls = result.boxes.cls.cpu().numpy().astype(np.float32)
+                pred = np.column_stack([cls, xywhn])
+                if len(gt):
+                    pred = pred[box_iou(_xyxy(pred), _xyxy(gt)).max(axis=1) < iou_thr]
+                rows.append(pred)
+                added += len(pred)
+            rows = np.concatenate(rows)
+            path = os.path.join(label_dir, os.path.splitext(item["name"])[0] + ".txt")
+            with open(path, "w") as f:
+                f.writelines(f"{int(r[0])} {r[1]:.6f} {r[2]:.6f} {r[3]:.6f} {r[4]:.6f}\n" for r in rows)
+            item["label"] = path
+    return added
+
+def student_config(path, width=0.125, depth=0.33, nc=1):
+    """YOLOv8 model yaml with reduced width/depth multipliers (yolov8n is 0.25/0.33)"""
+    import yaml
+    from ultralytics.nn.tasks import yaml_model_load
+    cfg = yaml_model_load("yolov8.yaml")
+    for key in ("scales", "scale", "yaml_file"):
+        cfg.pop(key, None)
+    cfg.update(nc=nc, depth_multiple=depth, width_multiple=width)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        yaml.safe_dump(cfg, f, sort_keys=False)
+    return path
+
+def evaluate(weights, image_dir, imgsz, conf_thr=0.5, iou_thr=0.5, repeats=3):
+    """Caries recall/precision at IoU iou_thr and median CPU latency on one split"""
+    from ultralytics import YOLO
+    model = YOLO(weights, task="detect")
+    index = build_label_index(image_dir)
+    hits = total = matched = predicted = 0
+    latencies = []
+    for i, path in enumerate(index.image_files):
+        img = Image.open(path).convert("RGB")
+        model(img, imgsz=imgsz, device="cpu", verbose=False)  # warmup
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = model(img, imgsz=imgsz, conf=conf_thr, device="cpu", verbose=False)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        gt = index.pixel_boxes(i)
+        pred = result.boxes.xyxy.cpu().numpy() if result.boxes is not None else np.zeros((0, 4))
+        total += len(gt)
+        predicted += len(pred)
+        if len(gt) and len(pred):
+            iou = box_iou(gt, pred)
+            hits += int((iou.max(axis=1) >= iou_thr).sum())
+            matched += int((iou.max(axis=0) >= iou_thr).sum())
+    return {
+        "recall": round(hits / total, 3) if total else None,
+        "precision": round(matched / predicted, 3) if predicted else None,
+        "lesions": total,
+        "images": len(index),
+        "latency_ms": round(statistics.median(latencies), 1) if latencies else None,
+    }
+
+def update_registry(entries, path=MODEL_REGISTRY):
+    """Merge model entries (by name) into the registry Detector reads"""
+    registry = {"models": []}
+    if os.path.exists(path):
+        with open(path) as f:
+            registry = json.load(f)
+    by_name = {m["name"]: m for m in registry["models"]}
+    by_name.update({e["name"]: e for e in entries})
+    registry["models"] = sorted(by_name.values(), key=lambda m: m.get("latency_ms") or 0)
+    with open(path, "w") as f:
+        json.dump(registry, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a distilled student caries model")
+    parser.add_argument("--teacher", default="weights/best.pt")
+    parser.add_argument("--teacher-imgsz", type=int, default=640)
+    parser.add_argument("--roots", nargs="+", default=["data", "datasets/sample", "datasets/enhanced"])
+    parser.add_argument("--width", type=float, default=0.125, help="student width multiple (yolov8n: 0.25)")
+    parser.add_argument("--depth", type=float, default=0.33, help="student depth multiple (yolov8n: 0.33)")
+    parser.add_argument("--student", default=None,
+                        help="train this model (e.g. yolov8n.pt) instead of a reduced-width yaml")
+    parser.add_argument("--imgsz", type=int, default=480, help="student input size")
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--pseudo-conf", type=float, default=0.25,
+                        help="teacher confidence for pseudo-labels")
+    parser.add_argument("--output", default="weights/student.pt")
+    parser.add_argument("--report", default="weights/distill_report.json")
+    args = parser.parse_args()
+
+    print("🦷 Caries Model Distillation")
+    print("=" * 50)
+
+    if not os.path.exists(args.teacher):
+        print(f"❌ Teacher weights not found: {args.teacher}")
+        return 1
+
+    # 1. Build the distillation dataset: GT + teacher boxes for train, GT only for val
+    items = collect_items([r for r in args.roots if os.path.isdir(r)])
+    train = [i for i in items if i["split"] != "val"]
+    val = [i for i in items if i["split"] == "val"]
+    for item in train:
+        item["split"] = "train"
+    if not train or not val:
+        print("❌ Need train and val images under the dataset roots")
+        return 1
+    print(f"📂 {len(train)} train / {len(val)} val images from {', '.join(args.roots)}")
+
+    dataset_root = os.path.join(DISTILL_ROOT, "dataset")
+    added = pseudo_label(args.teacher, train, os.path.join(DISTILL_ROOT, "pseudo_labels"),
+                         conf=args.pseudo_conf, imgsz=args.teacher_imgsz)
+    print(f"🏷️  Teacher added {added} boxes to the train labels")
+    materialize_dataset(train + val, dataset_root)
+    write_dataset_yaml(dataset_root, ("train", "val"), ["caries"])
+    data_yaml = os.path.join(dataset_root, "dataset.yaml")
+
+    # 2. Train the student
+    from train_yolo import train_model
+    model_name = args.student or student_config(os.path.join(DISTILL_ROOT, "yolov8-student.yaml"),
+                                                args.width, args.depth)
+    results = train_model(model_name=model_name, data=data_yaml, imgsz=args.imgsz, epochs=args.epochs,
+                          batch=args.batch, project=DISTILL_ROOT, name="student")
+    shutil.copy2(os.path.join(str(results.save_dir), "weights", "best.pt"), args.output)
+    print(f"📦 Student exported to {args.output}")
+
+    # 3. Compare student and teacher on the same held-out val images
+    val_dir = dataset_split_dirs(data_yaml)["val"]
+    report = {
+        "teacher": {"name": "teacher", "path": args.teacher, "imgsz": args.teacher_imgsz,
+                    **evaluate(args.teacher, val_dir, args.teacher_imgsz)},
+        "student": {"name": "student", "path": args.output, "imgsz": args.imgsz,
+                    **evaluate(args.output, val_dir, args.imgsz)},
+        "student_config": {"model": model_name, "width": args.width, "depth": args.depth,
+                           "pseudo_conf": args.pseudo_conf},
+    }
+    t, s = report["teacher"], report["student"]
+    if t["recall"] is not None and s["recall"] is not None:
+        report["recall_drop"] = round(t["recall"] - s["recall"], 3)
+    if t["latency_ms"] and s["latency_ms"]:
+        report["speedup"] = round(t["latency_ms"] / s["latency_ms"], 2)
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    update_registry([t, s])
+
+    print(f"\n{'model':<10}{'recall':>8}{'precision':>11}{'latency':>10}")
+    for name in ("teacher", "student"):
+        r = report[name]
+        print(f"{name:<10}{str(r['recall']):>8}{str(r['precision']):>11}{r['latency_ms']:>8}ms")
+    print(f"\n📝 Report saved to {args.report}; registry {MODEL_REGISTRY} updated")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
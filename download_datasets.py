@@ -5,8 +5,8 @@ Download and prepare dental datasets for training
 import os
 import requests
 import zipfile
-import shutil
 from pathlib import Path
+from src.materialize import manifest_from_dir, materialize_dataset
 
 def download_roboflow_dataset():
     """Download the Roboflow dental caries dataset"""
@@ -20,7 +20,7 @@ def download_roboflow_dataset():
     print("2. Click 'Download Dataset'")
     print("3. Choose 'YOLO v8' format")
     print("4. Download the ZIP file")
-    print("5. Extract it to 'datasets/roboflow/'")
+    print("5. Import it: python3 import_dataset.py <downloaded zip> --out datasets/roboflow")
     
     return False
 
@@ -34,18 +34,10 @@ def download_sample_dataset():
     os.makedirs('datasets/sample/labels/train', exist_ok=True)
     os.makedirs('datasets/sample/labels/val', exist_ok=True)
     
-    # Copy existing images to sample dataset
-    if os.path.exists('data/images/train'):
-        for img in os.listdir('data/images/train'):
-            if img.endswith(('.jpg', '.png', '.jpeg')):
-                shutil.copy(f'data/images/train/{img}', f'datasets/sample/images/train/{img}')
-                print(f"   Copied: {img}")
-    
-    if os.path.exists('data/images/val'):
-        for img in os.listdir('data/images/val'):
-            if img.endswith(('.jpg', '.png', '.jpeg')):
-                shutil.copy(f'data/images/val/{img}', f'datasets/sample/images/val/{img}')
-                print(f"   Copied: {img}")
+    # Link existing images into the dataset (reflink/hardlink, copy only as a fallback)
+    items = manifest_from_dir('data', splits=('train', 'val'), labels=False)
+    counts = materialize_dataset(items, 'datasets/sample', clean=False)
+    print(f"   Placed {len(items)} images: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
     
     print("✅ Sample dataset created in datasets/sample/")
     return True
@@ -77,7 +69,7 @@ def download_tufts_dataset():
     print("1. Go to: https://www.ncbi.nlm.nih.gov/pmc/articles/PMC11412602/")
     print("2. Follow the data access instructions")
     print("3. Request access to the dataset")
-    print("4. Download and extract to 'datasets/tufts/'")
+    print("4. Download, then import: python3 import_dataset.py <archive> --out datasets/tufts")
     
     return False
 
@@ -88,7 +80,7 @@ def download_children_dataset():
     print("1. Go to: https://www.ncbi.nlm.nih.gov/pmc/articles/PMC10267170/")
     print("2. Follow the data access instructions")
     print("3. Download the dataset")
-    print("4. Extract to 'datasets/children/'")
+    print("4. Import it: python3 import_dataset.py <archive> --out datasets/children")
     
     return False
 
@@ -191,7 +183,7 @@ def main():
     print("\n🎉 Dataset setup completed!")
     print("\n📋 Next steps:")
     print("1. Download datasets from the URLs above")
-    print("2. Extract them to the datasets/ directory")
+    print("2. Import them: python3 import_dataset.py <archive> --out datasets/<name>")
     print("3. Run: python3 simple_train.py --data datasets/sample/dataset.yaml")
     print("4. Or use your own dataset by following the guide")
 
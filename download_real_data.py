@@ -5,8 +5,8 @@ Download real dental datasets for training
 import os
 import requests
 import zipfile
-import shutil
 from pathlib import Path
+from src.materialize import manifest_from_dir, materialize_dataset
 
 def download_roboflow_dataset():
     """Download the Roboflow dental caries dataset"""
@@ -17,7 +17,7 @@ def download_roboflow_dataset():
     print("2. Click 'Download Dataset'")
     print("3. Choose 'YOLO v8' format")
     print("4. Download the ZIP file")
-    print("5. Extract it to 'datasets/roboflow/'")
+    print("5. Import it: python3 import_dataset.py <downloaded zip> --out datasets/roboflow")
     print("6. Run: python3 quick_train.py --data datasets/roboflow/dataset.yaml")
     return False
 
@@ -29,7 +29,7 @@ def download_children_dataset():
     print("1. Go to: https://www.ncbi.nlm.nih.gov/pmc/articles/PMC10267170/")
     print("2. Follow the data access instructions")
     print("3. Download the dataset")
-    print("4. Extract to 'datasets/children/'")
+    print("4. Import it: python3 import_dataset.py <archive> --out datasets/children")
     print("5. Convert to YOLO format if needed")
     return False
 
@@ -41,7 +41,7 @@ def download_annotated_intraoral_dataset():
     print("1. Go to: https://www.ncbi.nlm.nih.gov/pmc/articles/PMC12297690/")
     print("2. Follow the data access instructions")
     print("3. Download the 6,313 annotated intraoral images")
-    print("4. Extract to 'datasets/intraoral/'")
+    print("4. Import it: python3 import_dataset.py <archive> --out datasets/intraoral")
     print("5. Convert to YOLO format if needed")
     return False
 
@@ -55,18 +55,10 @@ def create_enhanced_sample_dataset():
     os.makedirs('datasets/enhanced/labels/train', exist_ok=True)
     os.makedirs('datasets/enhanced/labels/val', exist_ok=True)
     
-    # Copy existing images
-    if os.path.exists('data/images/train'):
-        for img in os.listdir('data/images/train'):
-            if img.endswith(('.jpg', '.png', '.jpeg')):
-                shutil.copy(f'data/images/train/{img}', f'datasets/enhanced/images/train/{img}')
-                print(f"   Copied: {img}")
-    
-    if os.path.exists('data/images/val'):
-        for img in os.listdir('data/images/val'):
-            if img.endswith(('.jpg', '.png', '.jpeg')):
-                shutil.copy(f'data/images/val/{img}', f'datasets/enhanced/images/val/{img}')
-                print(f"   Copied: {img}")
+    # Link existing images into the dataset (reflink/hardlink, copy only as a fallback)
+    items = manifest_from_dir('data', splits=('train', 'val'), labels=False)
+    counts = materialize_dataset(items, 'datasets/enhanced', clean=False)
+    print(f"   Placed {len(items)} images: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
     
     # Create some sample annotations (simulated caries)
     print("📝 Creating sample annotations...")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Measure the latency/recall tradeoff of tiled inference on the validation split
+"""
+import argparse
+import glob
+import json
+import os
+import time
+import numpy as np
+from PIL import Image
+from src.detect import Detector
+from src.tiling import box_iou
+
+def load_yolo_labels(label_path, img_size):
+    """Read a YOLO label file into pixel xyxy boxes"""
+    W, H = img_size
+    if not os.path.exists(label_path) or os.path.getsize(label_path) == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    rows = np.loadtxt(label_path, ndmin=2, dtype=np.float32)
+    cx, cy, w, h = rows[:, 1] * W, rows[:, 2] * H, rows[:, 3] * W, rows[:, 4] * H
+    return np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+def evaluate(detector, images, iou_thr=0.3, repeats=3):
+    """Return mean latency (ms) and lesion recall for one detector configuration"""
+    latencies, hits, total = [], 0, 0
+    for img_path in images:
+        img = Image.open(img_path).convert("RGB")
+        label_path = img_path.replace('images', 'labels').rsplit('.', 1)[0] + '.txt'
+        gt = load_yolo_labels(label_path, img.size)
+
+        detector.detect(img)  # warmup
+        start = time.perf_counter()
+        for _ in range(repeats):
+            dets = detector.detect(img)
+        latencies.append((time.perf_counter() - start) / repeats * 1000)
+
+        total += len(gt)
+        if len(gt) and dets:
+            pred = np.array([d["bbox"] for d in dets], dtype=np.float32)
+            hits += int((box_iou(gt, pred).max(axis=1) >= iou_thr).sum())
+
+    return {
+        "latency_ms": round(float(np.mean(latencies)), 1) if latencies else 0.0,
+        "recall": round(hits / total, 3) if total else None,
+        "lesions": total,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiled inference latency/recall report")
+    parser.add_argument("--weights", default="weights/best.pt")
+    parser.add_argument("--images", default="data/images/val")
+    parser.add_argument("--tile-sizes", default="640,960")
+    parser.add_argument("--overlap", type=float, default=0.2)
+    parser.add_argument("--max-tiles", type=int, default=12)
+    parser.add_argument("--merge", choices=["nms", "wbf"], default="nms")
+    parser.add_argument("--output", default=".outputs/tiling_report.json")
+    args = parser.parse_args()
+
+    images = sorted(glob.glob(f"{args.images}/*.jpg") + glob.glob(f"{args.images}/*.png"))
+    if not images:
+        print(f"❌ No images found in {args.images}")
+        return
+
+    print("🦷 Tiled Inference Evaluation")
+    print("=" * 50)
+
+    configs = [("full-image", Detector(args.weights, mock_ok=False))]
+    for size in args.tile_sizes.split(","):
+        configs.append((f"tiled-{size}", Detector(args.weights, mock_ok=False, tiled=True,
+                                                  tile_size=int(size), tile_overlap=args.overlap,
+                                                  max_tiles=args.max_tiles, merge=args.merge)))
+
+    if configs[0][1].use_mock:
+        print("⚠️  No trained model loaded - numbers below come from mock detections")
+
+    report = {}
+    for name, detector in configs:
+        report[name] = evaluate(detector, images)
+        print(f"   {name:<12} latency {report[name]['latency_ms']:>8} ms   recall {report[name]['recall']}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Report saved: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,59 @@
 #!/usr/bin/env python3
 """
 Flask-based dental app that actually works and places detections on real teeth
+
+Heavy dependencies (openai, smtplib/email, twilio, ultralytics/torch and the
+detector) are imported on first use so that a new worker starts quickly.
 """
 import json, os
 from flask import Flask, render_template, request, jsonify
 from PIL import Image, ImageDraw, ImageFont
 import io
 import base64
-import openai
+from collections import OrderedDict
 from dotenv import load_dotenv
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.image import MIMEImage
-from src.detect import Detector
-from src.tooth_numbering import grid_tooth_map
-from src.postprocess import assign_lesions_to_teeth_and_format
+from src.runtime import configure_runtime, describe_runtime
+from src.metrics import stage_timer, record_model_load, record_cache, render_metrics, CONTENT_TYPE_LATEST
+import time
 
 app = Flask(__name__)
-detector = Detector()
-os.makedirs(".outputs", exist_ok=True)
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
-if not openai.api_key:
+# Limit inference threads per worker before any model is loaded
+configure_runtime()
+print(describe_runtime())
+
+os.makedirs(".outputs", exist_ok=True)
+
+# Created on first use by get_detector()
+_detector = None
+
+# A full-mouth series is 4-18 bitewings/periapicals
+MAX_SERIES_IMAGES = 18
+
+def get_detector():
+    """Return the shared Detector, importing and creating it on first use.
+
+    Its options (tiling, ROI crop, INT8, latency budget, cascade) come from
+    the environment through src.detect.detector_settings().
+    """
+    global _detector
+    record_cache("yolo_model", _detector is not None)
+    if _detector is None:
+        from src.detect import Detector, detector_settings
+        start = time.perf_counter()
+        _detector = Detector(mock_ok=False, **detector_settings())
+        if _detector.use_mock:
+            record_model_load("yolo", "missing" if not os.path.exists(_detector.weights_path) else "failed")
+        else:
+            record_model_load("yolo", "loaded", time.perf_counter() - start)
+    return _detector
+
+# Configure OpenAI (the client library is imported when a chat request needs it)
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+if not OPENAI_API_KEY:
     print("⚠️ Warning: OPENAI_API_KEY not found in .env file. Chatbot will use fallback responses.")
 else:
     print("✅ OpenAI API key loaded successfully!")
@@ -53,101 +80,187 @@ if not TWILIO_ACCOUNT_SID or not TWILIO_AUTH_TOKEN:
 else:
     print("✅ SMS configuration loaded successfully!")
 
-# Realistic tooth positions for panoramic X-rays
-TOOTH_POSITIONS = {
-    # Upper arch (teeth 1-16)
-    1: {"x": 0.05, "y": 0.15, "width": 0.06, "height": 0.12},  # Wisdom tooth
-    2: {"x": 0.12, "y": 0.12, "width": 0.06, "height": 0.12},  # Molar
-    3: {"x": 0.19, "y": 0.10, "width": 0.06, "height": 0.12},  # Molar
-    4: {"x": 0.26, "y": 0.08, "width": 0.06, "height": 0.12},  # Premolar
-    5: {"x": 0.33, "y": 0.06, "width": 0.06, "height": 0.12},  # Premolar
-    6: {"x": 0.40, "y": 0.05, "width": 0.05, "height": 0.10},  # Canine
-    7: {"x": 0.46, "y": 0.04, "width": 0.05, "height": 0.10},  # Incisor
-    8: {"x": 0.52, "y": 0.04, "width": 0.05, "height": 0.10},  # Incisor
-    9: {"x": 0.58, "y": 0.04, "width": 0.05, "height": 0.10},  # Incisor
-    10: {"x": 0.64, "y": 0.04, "width": 0.05, "height": 0.10}, # Incisor
-    11: {"x": 0.70, "y": 0.05, "width": 0.05, "height": 0.10}, # Canine
-    12: {"x": 0.76, "y": 0.06, "width": 0.06, "height": 0.12}, # Premolar
-    13: {"x": 0.83, "y": 0.08, "width": 0.06, "height": 0.12}, # Premolar
-    14: {"x": 0.90, "y": 0.10, "width": 0.06, "height": 0.12}, # Molar
-    15: {"x": 0.97, "y": 0.12, "width": 0.06, "height": 0.12}, # Molar
-    16: {"x": 0.04, "y": 0.15, "width": 0.06, "height": 0.12}, # Wisdom tooth
-    
-    # Lower arch (teeth 17-32)
-    17: {"x": 0.05, "y": 0.85, "width": 0.06, "height": 0.12}, # Wisdom tooth
-    18: {"x": 0.12, "y": 0.88, "width": 0.06, "height": 0.12}, # Molar
-    19: {"x": 0.19, "y": 0.90, "width": 0.06, "height": 0.12}, # Molar
-    20: {"x": 0.26, "y": 0.92, "width": 0.06, "height": 0.12}, # Premolar
-    21: {"x": 0.33, "y": 0.94, "width": 0.06, "height": 0.12}, # Premolar
-    22: {"x": 0.40, "y": 0.95, "width": 0.05, "height": 0.10}, # Canine
-    23: {"x": 0.46, "y": 0.96, "width": 0.05, "height": 0.10}, # Incisor
-    24: {"x": 0.52, "y": 0.96, "width": 0.05, "height": 0.10}, # Incisor
-    25: {"x": 0.58, "y": 0.96, "width": 0.05, "height": 0.10}, # Incisor
-    26: {"x": 0.64, "y": 0.96, "width": 0.05, "height": 0.10}, # Incisor
-    27: {"x": 0.70, "y": 0.95, "width": 0.05, "height": 0.10}, # Canine
-    28: {"x": 0.76, "y": 0.94, "width": 0.06, "height": 0.12}, # Premolar
-    29: {"x": 0.83, "y": 0.92, "width": 0.06, "height": 0.12}, # Premolar
-    30: {"x": 0.90, "y": 0.90, "width": 0.06, "height": 0.12}, # Molar
-    31: {"x": 0.97, "y": 0.88, "width": 0.06, "height": 0.12}, # Molar
-    32: {"x": 0.04, "y": 0.85, "width": 0.06, "height": 0.12}, # Wisdom tooth
-}
-
-def get_realistic_detections(img):
-    """Generate detections using trained model or fallback to realistic mock"""
+# Default operating point; clinics can override it in operating_points.json
+DEFAULT_CONF_THR = 0.5
+
+# Raw detections of every analyzed image, created by get_detection_store()
+_detection_store = None
+
+# Detection worker processes fed through shared memory, when INFERENCE_PROCESSES > 0
+_inference_pool = None
+INFERENCE_TIMEOUT = 120
+
+# Base64 of recently returned case images by SHA-1 (most recent last), filled by encoded_image()
+_encoded_images = OrderedDict()
+ENCODED_IMAGE_CACHE = 8
+
+# Tooth boxes of every analyzed image, created by get_tooth_store(), and the locator that finds them
+_tooth_store = None
+_tooth_locator = None
+
+def get_detection_store():
+    """Return the shared raw detection store (keyed by image SHA-1), creating it on first use"""
+    global _detection_store
+    if _detection_store is None:
+        from src.detection_store import DetectionStore
+        _detection_store = DetectionStore()
+    return _detection_store
+
+def get_inference_pool():
+    """Return the shared InferencePool, or None when detection runs in this process.
+
+    With INFERENCE_PROCESSES=N, N worker processes each load the Detector once
+    and decoded uploads reach them through shared-memory slots instead of
+    being pickled.
+    """
+    global _inference_pool
+    processes = int(os.getenv("INFERENCE_PROCESSES", "0"))
+    if _inference_pool is None and processes > 0:
+        import atexit
+        from src.shm_transport import InferencePool
+        _inference_pool = InferencePool(processes)
+        atexit.register(_inference_pool.close)
+    return _inference_pool
+
+def get_tooth_store():
+    """Return the store of located tooth boxes (keyed by image SHA-1), creating it on first use"""
+    global _tooth_store
+    if _tooth_store is None:
+        from src.detection_store import DetectionStore
+        from src.tooth_locator import TOOTH_STORE
+        _tooth_store = DetectionStore(TOOTH_STORE)
+    return _tooth_store
+
+def get_tooth_locator():
+    """Return the shared ToothLocator, creating it on first use"""
+    global _tooth_locator
+    if _tooth_locator is None:
+        from src.tooth_locator import ToothLocator
+        _tooth_locator = ToothLocator()
+    return _tooth_locator
+
+def get_tooth_map(digest, img=None, image_path=None):
+    """ToothMap of an image; teeth are located once per image and kept in the tooth store"""
+    import numpy as np
+    from src.tooth_numbering import ToothMap
+    store = get_tooth_store()
+    stored = store.get(digest)
+    if stored is not None:
+        return ToothMap(stored[0], stored[2].astype(np.int64) + 1)
+    if img is None:
+        img = Image.open(image_path).convert('RGB')
+    with stage_timer("analyze", "tooth_location"):
+        boxes, tooth_ids, source = get_tooth_locator().locate(img)
+    store.put(digest, boxes, np.ones(len(boxes), dtype=np.float32), tooth_ids - 1, model=source)
+    store.flush()
+    return ToothMap(boxes, tooth_ids)
+
+def get_raw_detections(img, teeth=None):
+    """Every box above RAW_CONF_FLOOR as float32 (xyxy, conf) arrays plus their source.
+
+    The source is 'model', or 'mock' when there is no trained model or it
+    finds nothing and realistic mock detections (placed on the teeth of
+    the ToothMap) are used instead.
+    """
+    import numpy as np
+    from src.detection_store import RAW_CONF_FLOOR
     w, h = img.size
-    results = []
     
     # Try to use trained model first
-    try:
-        if os.path.exists('weights/best.pt'):
-            from ultralytics import YOLO
-            model = YOLO('weights/best.pt')
-            yolo_results = model(img)
-            
-            for result in yolo_results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        conf = float(box.conf[0].cpu().numpy())
-                        cls = int(box.cls[0].cpu().numpy())
-                        
-                        if conf > 0.5:  # Confidence threshold
-                            # Map to tooth position
-                            center_x = (x1 + x2) / 2
-                            center_y = (y1 + y2) / 2
-                            
-                            # Find closest tooth
-                            tooth_id = find_closest_tooth(center_x, center_y, w, h)
-                            
-                            results.append({
-                                "bbox": [int(x1), int(y1), int(x2), int(y2)],
-                                "conf": round(conf, 2),
-                                "cls": "caries",
-                                "tooth_id": tooth_id
-                            })
-            
-            if results:
-                print(f"✅ Used trained model: {len(results)} detections")
-                return results
-        else:
-            print("⚠️  No trained model found, using mock detections")
-    except Exception as e:
-        print(f"⚠️  Model inference failed: {e}, using mock detections")
+    pool = get_inference_pool()
+    if pool is not None:
+        # A timeout or a lost worker fails the request instead of passing mock findings off as results
+        from src.shm_transport import HandlerError
+        try:
+            with stage_timer("analyze", "detection"):
+                raw = pool.submit(img).result(INFERENCE_TIMEOUT)
+            if raw is not None and len(raw[1]):
+                print(f"✅ Used trained model in an inference worker: {len(raw[1])} raw detections")
+                return raw[0], raw[1], "model"
+            if raw is None:
+                print("⚠️  No trained model in the inference workers, using mock detections")
+        except HandlerError as e:
+            print(f"⚠️  Model inference failed: {e}, using mock detections")
+    else:
+        try:
+            detector = get_detector()
+            if not detector.use_mock:
+                with stage_timer("analyze", "detection"):
+                    xyxy, conf, _ = detector.detect_raw(img)
+                if len(conf):
+                    print(f"✅ Used trained model: {len(conf)} raw detections")
+                    return xyxy, conf, "model"
+            else:
+                print("⚠️  No trained model found, using mock detections")
+        except Exception as e:
+            print(f"⚠️  Model inference failed: {e}, using mock detections")
     
     # Fallback to realistic mock detections
+    with stage_timer("analyze", "detection"):
+        return _mock_arrays(teeth or get_tooth_map_for(img), w, h)
+
+def get_raw_detections_batch(images, teeth):
+    """get_raw_detections() for a series: one batched forward pass, mock detections without a model"""
+    detector = get_detector()
+    if not detector.use_mock:
+        try:
+            return [(boxes, conf, "model") for boxes, conf, _ in detector.detect_batch_raw(images)]
+        except Exception as e:
+            print(f"⚠️  Batched detection failed: {e}, using mock detections")
+    return [_mock_arrays(tooth_map, *img.size) for img, tooth_map in zip(images, teeth)]
+
+def _mock_arrays(teeth, w, h):
+    """Mock detections as (xyxy, conf, 'mock') arrays"""
+    import numpy as np
+    mock = _mock_detections(teeth, w, h)
+    return (np.array([d["bbox"] for d in mock], dtype=np.float32).reshape(-1, 4),
+            np.array([d["conf"] for d in mock], dtype=np.float32), "mock")
+
+def get_tooth_map_for(img):
+    """ToothMap of an image that is not in the tooth store"""
+    from src.tooth_numbering import ToothMap
+    boxes, tooth_ids, _ = get_tooth_locator().locate(img)
+    return ToothMap(boxes, tooth_ids)
+
+def filter_detections(boxes, conf, teeth, conf_thr=DEFAULT_CONF_THR, iou_thr=None):
+    """Detections at an operating point (conf_thr, optional NMS), assigned to the tooth containing them"""
+    from src.detection_store import apply_operating_point
+    boxes, conf, _ = apply_operating_point(boxes, conf, conf_thr=conf_thr, iou_thr=iou_thr)
+    results = []
+    with stage_timer("analyze", "tooth_assignment"):
+        for (x1, y1, x2, y2), c, (tooth_id, region) in zip(boxes.tolist(), conf.tolist(), teeth.assign(boxes)):
+            results.append({
+                "bbox": [int(x1), int(y1), int(x2), int(y2)],
+                "conf": round(c, 2),
+                "cls": "caries",
+                "tooth_id": tooth_id,
+                "region": region
+            })
+    return results
+
+def get_realistic_detections(img, conf_thr=DEFAULT_CONF_THR):
+    """Generate detections using trained model or fallback to realistic mock"""
+    teeth = get_tooth_map_for(img)
+    boxes, conf, _ = get_raw_detections(img, teeth)
+    return filter_detections(boxes, conf, teeth, conf_thr)
+
+def _mock_detections(teeth, w, h):
+    """Random cavities on the crowns of the teeth in a ToothMap"""
     import random
+    results = []
     num_cavities = random.choice([0, 1, 2, 3])
-    affected_teeth = random.sample(list(TOOTH_POSITIONS.keys()), num_cavities)
+    affected = random.sample(range(len(teeth.boxes)), min(num_cavities, len(teeth.boxes)))
     
-    for tooth_id in affected_teeth:
-        pos = TOOTH_POSITIONS[tooth_id]
+    for index in affected:
+        tooth_id = int(teeth.tooth_ids[index])
+        tx1, ty1, tx2, ty2 = teeth.boxes[index].tolist()
         
-        # Convert relative positions to absolute coordinates
-        x1 = int(pos["x"] * w)
-        y1 = int(pos["y"] * h)
-        x2 = int((pos["x"] + pos["width"]) * w)
-        y2 = int((pos["y"] + pos["height"]) * h)
+        # Lesion on the crown, the end of the tooth box next to the occlusal plane
+        crown = (ty2 - ty1) * 0.35
+        x1 = int(tx1 + (tx2 - tx1) * 0.15)
+        x2 = int(tx2 - (tx2 - tx1) * 0.15)
+        y1 = int(ty2 - crown if tooth_id <= 16 else ty1)
+        y2 = int(ty2 if tooth_id <= 16 else ty1 + crown)
         
         # Add small random variation to make it look more realistic
         variation_x = random.randint(-10, 10)
@@ -169,26 +282,10 @@ def get_realistic_detections(img):
     
     return results
 
-def find_closest_tooth(center_x, center_y, img_width, img_height):
-    """Find the closest tooth to a detection center"""
-    # Convert to relative coordinates
-    rel_x = center_x / img_width
-    rel_y = center_y / img_height
-    
-    closest_tooth = 1
-    min_distance = float('inf')
-    
-    for tooth_id, pos in TOOTH_POSITIONS.items():
-        tooth_center_x = pos["x"] + pos["width"] / 2
-        tooth_center_y = pos["y"] + pos["height"] / 2
-        
-        distance = ((rel_x - tooth_center_x) ** 2 + (rel_y - tooth_center_y) ** 2) ** 0.5
-        
-        if distance < min_distance:
-            min_distance = distance
-            closest_tooth = tooth_id
-    
-    return closest_tooth
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint"""
+    return render_metrics(), 200, {'Content-Type': CONTENT_TYPE_LATEST}
 
 @app.route('/')
 def index():
@@ -234,35 +331,40 @@ def patient_portal(patient_id):
 def chat_api():
     """Handle chatbot API requests using OpenAI with personalized responses"""
     try:
-        data = request.get_json()
-        user_message = data.get('message', '').strip()
-        patient_name = data.get('patient_name', 'Patient')
-        patient_age = data.get('patient_age', '')
-        patient_history = data.get('patient_history', '')
-        insurance_provider = data.get('insurance_provider', '')
-        findings = data.get('findings', [])
+        with stage_timer("chat", "parse"):
+            data = request.get_json()
+            user_message = data.get('message', '').strip()
+            patient_name = data.get('patient_name', 'Patient')
+            patient_age = data.get('patient_age', '')
+            patient_history = data.get('patient_history', '')
+            insurance_provider = data.get('insurance_provider', '')
+            findings = data.get('findings', [])
         
         if not user_message:
             return jsonify({'response': 'Please enter a message.'})
         
         # Create personalized context
-        context = f"Patient: {patient_name}"
-        if patient_age:
-            context += f", Age: {patient_age}"
-        if patient_history:
-            context += f", Medical History: {patient_history}"
-        if insurance_provider:
-            context += f", Insurance: {insurance_provider.replace('_', ' ').title()}"
-        if findings:
-            context += f", Current Findings: {findings}"
+        with stage_timer("chat", "context"):
+            context = f"Patient: {patient_name}"
+            if patient_age:
+                context += f", Age: {patient_age}"
+            if patient_history:
+                context += f", Medical History: {patient_history}"
+            if insurance_provider:
+                context += f", Insurance: {insurance_provider.replace('_', ' ').title()}"
+            if findings:
+                context += f", Current Findings: {findings}"
         
         # Use OpenAI if API key is available, otherwise fallback to local responses
-        if openai.api_key:
-            response = get_personalized_openai_response(user_message, context, findings)
+        if OPENAI_API_KEY:
+            with stage_timer("chat", "openai_response"):
+                response = get_personalized_openai_response(user_message, context, findings)
         else:
-            response = get_personalized_dental_response(user_message, patient_name, findings)
+            with stage_timer("chat", "local_response"):
+                response = get_personalized_dental_response(user_message, patient_name, findings)
         
-        return jsonify({'response': response})
+        with stage_timer("chat", "json_encode"):
+            return jsonify({'response': response})
         
     except Exception as e:
         return jsonify({'response': f'Sorry, I encountered an error: {str(e)}'})
@@ -282,7 +384,8 @@ def get_openai_response(message):
 Keep responses concise but helpful (2-3 sentences typically)."""
 
         # Use the new OpenAI API syntax
-        client = openai.OpenAI(api_key=openai.api_key)
+        import openai
+        client = openai.OpenAI(api_key=OPENAI_API_KEY)
         response = client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
@@ -320,7 +423,8 @@ You should:
 Keep responses concise but helpful (2-3 sentences typically)."""
 
         # Use the new OpenAI API syntax
-        client = openai.OpenAI(api_key=openai.api_key)
+        import openai
+        client = openai.OpenAI(api_key=OPENAI_API_KEY)
         response = client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
@@ -504,6 +608,11 @@ def send_patient_email(patient_email, patient_name, findings, overlay_image_path
         return False
     
     try:
+        import smtplib
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.image import MIMEImage
+
         # Create message
         msg = MIMEMultipart()
         msg['From'] = EMAIL_FROM
@@ -613,8 +722,197 @@ For questions about this report, please contact our office directly.
         print(f"❌ Error sending email: {e}")
         return False
 
+def render_overlay(img, detections):
+    """Draw detections on a copy of the image and build the findings list"""
+    overlay = img.copy()
+    draw = ImageDraw.Draw(overlay)
+
+    # Try to use a better font
+    try:
+        font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 16)
+    except:
+        try:
+            font = ImageFont.truetype("arial.ttf", 16)
+        except:
+            font = ImageFont.load_default()
+
+    findings = []
+    for det in detections:
+        x1, y1, x2, y2 = det["bbox"]
+        conf = det["conf"]
+        tooth_id = det["tooth_id"]
+        region = det.get("region", "MO")
+
+        # Draw bounding box
+        draw.rectangle([x1, y1, x2, y2], outline=(255, 0, 0), width=3)
+
+        # Draw label
+        label_text = f"#{tooth_id} {region} ({conf:.2f})"
+
+        # Get text size for background
+        bbox = draw.textbbox((0, 0), label_text, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+
+        # Draw background rectangle for text
+        text_bg = [x1 + 2, y1 + 2, x1 + 2 + text_width + 4, y1 + 2 + text_height + 4]
+        draw.rectangle(text_bg, fill=(255, 255, 255, 180))
+
+        # Draw text
+        draw.text((x1 + 4, y1 + 4), label_text, fill=(255, 0, 0), font=font)
+
+        findings.append({
+            "tooth_id": tooth_id,
+            "region": region,
+            "conf": conf,
+            "bbox": [x1, y1, x2, y2],
+            "cls": "caries"
+        })
+
+    return overlay, findings
+
+def build_report(findings):
+    """Plain-text summary of the findings for the doctor view, email and SMS"""
+    if not findings:
+        return "✅ No cavities detected - your teeth look healthy!"
+    report = "🔍 Cavity Detection Results:\n"
+    for finding in findings:
+        report += f"• Tooth #{finding['tooth_id']} - Confidence: {finding['conf']:.2f}\n"
+    return report
+
+# Patient details stored in .outputs/patient_<id>.json
+PATIENT_FIELDS = ("patient_name", "patient_age", "patient_email", "patient_phone",
+                  "patient_history", "insurance_provider")
+
+def patient_form():
+    """Patient details and notification choices from the submitted form"""
+    return {
+        **{field: request.form.get(field, '') for field in PATIENT_FIELDS},
+        "patient_name": request.form.get('patient_name', 'Patient'),
+        "send_email": request.form.get('send_email', 'false').lower() == 'true',
+        "send_sms": request.form.get('send_sms', 'false').lower() == 'true',
+    }
+
+def notify_patient(patient, findings, overlay_path, report, patient_id):
+    """Send the requested email/SMS once and report what happened for the UI"""
+    send_email, send_sms = patient['send_email'], patient['send_sms']
+    patient_email, patient_phone = patient['patient_email'], patient['patient_phone']
+
+    # Send email to patient if requested and email credentials are configured
+    email_sent = False
+    if send_email and patient_email and EMAIL_USERNAME and EMAIL_PASSWORD:
+        email_sent = send_patient_email(patient_email, patient['patient_name'], findings, overlay_path, report, patient_id)
+
+    # Send SMS to patient if requested and SMS credentials are configured
+    sms_sent = False
+    if send_sms and patient_phone and TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
+        sms_sent = send_patient_sms(patient_phone, patient['patient_name'], findings, report, patient_id)
+
+    # Determine status for better user feedback
+    email_status = 'sent' if email_sent else 'not_configured' if send_email and patient_email and (not EMAIL_USERNAME or not EMAIL_PASSWORD) else 'not_requested'
+    sms_status = 'sent' if sms_sent else 'not_configured' if send_sms and patient_phone and (not TWILIO_ACCOUNT_SID or not TWILIO_AUTH_TOKEN) else 'not_requested'
+    return {'email_sent': email_sent, 'email_status': email_status, 'sms_sent': sms_sent, 'sms_status': sms_status}
+
+def image_digest(data):
+    """Content hash identifying the image of a case"""
+    import hashlib
+    return hashlib.sha1(data).hexdigest()
+
+def load_case(case_id):
+    """Stored patient record for a case id, or None"""
+    if not case_id or not case_id.replace('-', '').isalnum():
+        return None
+    try:
+        with open(f'.outputs/patient_{case_id}.json') as f:
+            case = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Records without a stored image (e.g. series) cannot be updated incrementally
+    return case if 'image_sha1' in case and os.path.exists(case.get('image_path', '')) else None
+
+def encoded_image(digest, image_path, png=None):
+    """Base64 of a case's PNG for the response, encoded once and kept for resubmissions of the image.
+
+    png is the file's content when the caller has just written it.
+    """
+    cached = _encoded_images.pop(digest, None)
+    record_cache("encoded_image", cached is not None)
+    if cached is None:
+        if png is None:
+            with open(image_path, 'rb') as f:
+                png = f.read()
+        cached = base64.b64encode(png).decode()
+    _encoded_images[digest] = cached
+    while len(_encoded_images) > ENCODED_IMAGE_CACHE:
+        try:
+            _encoded_images.popitem(last=False)
+        except KeyError:
+            break
+    return cached
+
+def track_previous_visit(patient, current):
+    """Lesion progression against the patient's latest earlier case with a stored image, or None"""
+    from src.findings_index import load_findings_index, patient_key
+    from src.tracking import track_lesions
+    for case_id, _ in reversed(load_findings_index().visits(patient_key(patient))):
+        previous = load_case(case_id) if case_id != current['patient_id'] else None
+        if previous:
+            try:
+                return track_lesions(previous, current)
+            except Exception as e:
+                print(f"⚠️  Lesion tracking failed: {e}")
+                return None
+    return None
+
+def estimate_pricing(findings, insurance_provider):
+    """CDT codes and insurance estimate for the findings under the patient's plan"""
+    from src.insurance import map_findings_to_cdt, calculate_insurance_estimate, get_available_plans
+    wanted = insurance_provider.replace('_', ' ').lower()
+    plan = next((p for p in get_available_plans() if wanted and wanted in p.lower()), "No Insurance")
+    return calculate_insurance_estimate(map_findings_to_cdt(findings), plan)
+
+def decode_series(files):
+    """Decode uploaded images on a thread pool (PIL releases the GIL while decoding).
+
+    Returns the images and their SHA-1 digests (the DetectionStore keys).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    payloads = [f.read() for f in files]
+
+    def decode(data):
+        return Image.open(io.BytesIO(data)).convert('RGB')
+
+    with ThreadPoolExecutor(max_workers=min(len(payloads), 8)) as pool:
+        return list(pool.map(decode, payloads)), [image_digest(data) for data in payloads]
+
+def build_tooth_chart(series_findings):
+    """Merge per-image findings into one finding per tooth.
+
+    A tooth seen on several images (bitewings overlap) keeps its most confident
+    finding; 'images' lists every image index it was found on.
+    """
+    chart = {}
+    for index, findings in enumerate(series_findings):
+        for finding in findings:
+            tooth = chart.get(finding['tooth_id'])
+            images = tooth['images'] if tooth else []
+            if index not in images:
+                images.append(index)
+            if tooth is None or finding['conf'] > tooth['conf']:
+                chart[finding['tooth_id']] = {**finding, 'image_index': index, 'images': images}
+    return [chart[t] for t in sorted(chart)]
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
+    """Analyze one X-ray, or update an existing case.
+
+    A resubmission with case_id (the patient id) and the same image reuses the
+    stored case: a changed operating point (conf_thr, or the clinic's from
+    operating_points.json) only re-filters the raw detections kept in the
+    DetectionStore and redraws the overlay, and a metadata-only change just
+    re-renders report and pricing. A different image sent with a case_id
+    starts a new case, so the earlier visit stays in the history.
+    """
     try:
         # Get uploaded image and patient info
         if 'image' not in request.files:
@@ -625,139 +923,301 @@ def analyze():
             return jsonify({'error': 'No image selected'})
         
         # Get enhanced patient information
-        patient_name = request.form.get('patient_name', 'Patient')
-        patient_age = request.form.get('patient_age', '')
-        patient_email = request.form.get('patient_email', '')
-        patient_phone = request.form.get('patient_phone', '')
-        patient_history = request.form.get('patient_history', '')
-        insurance_provider = request.form.get('insurance_provider', '')
-        send_email = request.form.get('send_email', 'false').lower() == 'true'
-        send_sms = request.form.get('send_sms', 'false').lower() == 'true'
-        
-        # Open and process image
-        img = Image.open(file.stream)
-        img = img.convert('RGB')
-        
-        # Get realistic detections
-        detections = get_realistic_detections(img)
-        
-        # Create overlay
-        overlay = img.copy()
-        draw = ImageDraw.Draw(overlay)
-        
-        # Try to use a better font
-        try:
-            font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 16)
-        except:
-            try:
-                font = ImageFont.truetype("arial.ttf", 16)
-            except:
-                font = ImageFont.load_default()
-        
-        findings = []
-        for det in detections:
-            x1, y1, x2, y2 = det["bbox"]
-            conf = det["conf"]
-            tooth_id = det["tooth_id"]
-            
-            # Draw bounding box
-            draw.rectangle([x1, y1, x2, y2], outline=(255, 0, 0), width=3)
-            
-            # Draw label
-            label_text = f"#{tooth_id} ({conf:.2f})"
-            
-            # Get text size for background
-            bbox = draw.textbbox((0, 0), label_text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            
-            # Draw background rectangle for text
-            text_bg = [x1 + 2, y1 + 2, x1 + 2 + text_width + 4, y1 + 2 + text_height + 4]
-            draw.rectangle(text_bg, fill=(255, 255, 255, 180))
-            
-            # Draw text
-            draw.text((x1 + 4, y1 + 4), label_text, fill=(255, 0, 0), font=font)
-            
-            findings.append({
-                "tooth_id": tooth_id,
-                "region": "MO",  # Simplified for demo
-                "conf": conf,
-                "bbox": [x1, y1, x2, y2],
-                "cls": "caries"
-            })
+        patient = patient_form()
+        patient_name = patient['patient_name']
         
-        # Convert original image to base64 for web display (no red boxes)
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        img_str = base64.b64encode(buffer.getvalue()).decode()
+        # Operating point: clinic default, overridable per request
+        from src.detection_store import operating_point
+        clinic = request.form.get('clinic', '')
+        point = operating_point(clinic)
+        conf_thr = float(request.form.get('conf_thr', point['conf_thr']))
+        iou_thr = float(request.form['iou_thr']) if request.form.get('iou_thr') else point['iou_thr']
         
-        # Generate report
-        if not findings:
-            report = "✅ No cavities detected - your teeth look healthy!"
-        else:
-            report = "🔍 Cavity Detection Results:\n"
-            for finding in findings:
-                report += f"• Tooth #{finding['tooth_id']} - Confidence: {finding['conf']:.2f}\n"
+        data = file.read()
+        digest = image_digest(data)
+        case = load_case(request.form.get('case_id', ''))
+        same_image = case is not None and case.get('image_sha1') == digest
+        reused = []
         
-        # Save results
-        result = {"findings": findings}
-        with open(".outputs/last_result.json", "w") as f:
-            json.dump(result, f, indent=2)
+        # A case is the same image under the same case id; a new image sent with an
+        # existing case id is a new visit, so the earlier record and portal link stay intact
+        import uuid
+        patient_id = case['patient_id'] if same_image else str(uuid.uuid4())[:8]
+        image_path = f'.outputs/patient_{patient_id}_image.png'
+        overlay_path = f'.outputs/patient_{patient_id}_overlay.png'
         
-        # Save overlay image for email attachment
-        overlay_path = ".outputs/overlay_result.png"
-        overlay.save(overlay_path)
+        img = img_str = overlay = None
+        if not same_image:
+            # Open and process image
+            with stage_timer("analyze", "decode"):
+                img = Image.open(io.BytesIO(data))
+                img = img.convert('RGB')
+            
+            # Keep the original as PNG for web display (no red boxes); encoded once per case
+            with stage_timer("analyze", "encode"):
+                png = io.BytesIO()
+                img.save(png, format='PNG')
+                with open(image_path, 'wb') as f:
+                    f.write(png.getvalue())
+                img_str = encoded_image(digest, image_path, png.getvalue())
+        w, h = img.size if img is not None else case['image_size']
         
-        # Always generate patient ID and save results for portal access
-        import uuid
-        patient_id = str(uuid.uuid4())[:8]
+        # Raw detections of this image, from any earlier case, are in the store;
+        # mock detections are only reused while there is still no trained model
+        store = get_detection_store()
+        stored = store.get(digest)
+        fresh = stored is not None and (stored[3] == "model" or not os.path.exists('weights/best.pt'))
         
-        # Save enhanced patient results with ID for the portal
-        patient_results = {
-            "patient_id": patient_id,
-            "patient_name": patient_name,
-            "patient_age": patient_age,
-            "patient_email": patient_email,
-            "patient_phone": patient_phone,
-            "patient_history": patient_history,
-            "insurance_provider": insurance_provider,
-            "findings": findings,
-            "report": report,
-            "overlay_path": overlay_path
-        }
-        with open(f'.outputs/patient_{patient_id}.json', 'w') as f:
-            json.dump(patient_results, f, indent=2)
+        if fresh and same_image and (case.get('conf_thr'), case.get('iou_thr')) == (conf_thr, iou_thr):
+            # Metadata-only resubmission: nothing that depends on the image is redone
+            findings = case['findings']
+            reused += ['detections', 'findings', 'overlay']
+        else:
+            # Teeth are located once per image and reused by every later case
+            teeth = get_tooth_map(digest, img, image_path)
+            if fresh:
+                boxes, conf = stored[0], stored[1]
+                reused.append('detections')
+            else:
+                if img is None:
+                    with stage_timer("analyze", "decode"):
+                        img = Image.open(image_path).convert('RGB')
+                boxes, conf, source = get_raw_detections(img, teeth)
+                store.put(digest, boxes, conf, model=source)
+                store.flush()
+            
+            # Re-filter the raw detections at the requested operating point
+            detections = filter_detections(boxes, conf, teeth, conf_thr, iou_thr)
+            if img is None:
+                with stage_timer("analyze", "decode"):
+                    img = Image.open(image_path).convert('RGB')
+            # Draw boxes and labels on a copy for the email attachment (saved with the record)
+            with stage_timer("analyze", "overlay"):
+                overlay, findings = render_overlay(img, detections)
         
-        # Send email to patient if requested and email credentials are configured
-        email_sent = False
-        if send_email and patient_email and EMAIL_USERNAME and EMAIL_PASSWORD:
-            email_sent = send_patient_email(patient_email, patient_name, findings, overlay_path, report, patient_id)
+        if img_str is None:
+            with stage_timer("analyze", "encode"):
+                img_str = encoded_image(digest, image_path)
         
-        # Send SMS to patient if requested and SMS credentials are configured
-        sms_sent = False
-        if send_sms and patient_phone and TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
-            sms_sent = send_patient_sms(patient_phone, patient_name, findings, report, patient_id)
+        from src.findings_index import patient_key
+        if 'findings' in reused and 'tracking' in case and patient_key(patient) == patient_key(case):
+            # Same findings and same patient: the comparison with the previous visit still holds
+            tracking = case['tracking']
+            reused.append('tracking')
+        else:
+            # Compare with the patient's previous radiograph (registration is cached per image pair)
+            with stage_timer("analyze", "tracking"):
+                tracking = track_previous_visit(patient, {
+                    "patient_id": patient_id, "image_path": image_path, "image_sha1": digest,
+                    "image_size": [w, h], "findings": findings
+                })
+        
+        # Report and pricing depend on findings and metadata only
+        report = build_report(findings)
+        pricing = estimate_pricing(findings, patient['insurance_provider'])
+        
+        with stage_timer("analyze", "persist"):
+            if overlay is not None:
+                overlay.save(overlay_path)
+            
+            # Save results
+            result = {"findings": findings}
+            with open(".outputs/last_result.json", "w") as f:
+                json.dump(result, f, indent=2)
+            
+            # Save enhanced patient results with ID for the portal (doubles as the case record)
+            patient_results = {
+                "patient_id": patient_id,
+                **{field: patient[field] for field in PATIENT_FIELDS},
+                "analyzed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "findings": findings,
+                "report": report,
+                "pricing": pricing,
+                "tracking": tracking,
+                "overlay_path": overlay_path,
+                "image_path": image_path,
+                "image_sha1": digest,
+                "image_size": [w, h],
+                "clinic": clinic,
+                "conf_thr": conf_thr,
+                "iou_thr": iou_thr
+            }
+            with open(f'.outputs/patient_{patient_id}.json', 'w') as f:
+                json.dump(patient_results, f, indent=2)
+            # Longitudinal queries see the new visit without rescanning the records
+            from src.findings_index import record_findings
+            record_findings(patient_results)
         
-        # Determine status for better user feedback
-        email_status = 'sent' if email_sent else 'not_configured' if send_email and patient_email and (not EMAIL_USERNAME or not EMAIL_PASSWORD) else 'not_requested'
-        sms_status = 'sent' if sms_sent else 'not_configured' if send_sms and patient_phone and (not TWILIO_ACCOUNT_SID or not TWILIO_AUTH_TOKEN) else 'not_requested'
+        with stage_timer("analyze", "notify"):
+            notifications = notify_patient(patient, findings, overlay_path, report, patient_id)
         
         return jsonify({
             'success': True,
             'overlay_image': img_str,
             'report': report,
             'findings': findings,
-            'email_sent': email_sent,
-            'email_status': email_status,
-            'sms_sent': sms_sent,
-            'sms_status': sms_status,
+            'pricing': pricing,
+            'tracking': tracking,
+            **notifications,
             'patient_name': patient_name,
+            'case_id': patient_id,
+            'reused': reused,
             'patient_portal_link': f"http://127.0.0.1:8080/patient/{patient_id}" if patient_id else None
         })
         
     except Exception as e:
         return jsonify({'error': f'Processing failed: {str(e)}'})
 
+@app.route('/analyze/series', methods=['POST'])
+def analyze_series():
+    """Analyze a full-mouth series (all images of one visit) under a single patient record"""
+    try:
+        files = [f for f in request.files.getlist('images') if f.filename]
+        if not files:
+            return jsonify({'error': 'No images uploaded'})
+        if len(files) > MAX_SERIES_IMAGES:
+            return jsonify({'error': f'A series can have at most {MAX_SERIES_IMAGES} images'})
+        views = request.form.getlist('views')
+        patient = patient_form()
+
+        # Operating point, as for /analyze
+        from src.detection_store import operating_point
+        from src.tooth_numbering import ToothMap
+        clinic = request.form.get('clinic', '')
+        point = operating_point(clinic)
+        conf_thr = float(request.form.get('conf_thr', point['conf_thr']))
+        iou_thr = float(request.form['iou_thr']) if request.form.get('iou_thr') else point['iou_thr']
+
+        with stage_timer("analyze_series", "decode"):
+            images, digests = decode_series(files)
+
+        # Teeth of the whole series in one forward pass of the tooth model
+        with stage_timer("analyze_series", "tooth_location"):
+            teeth = [ToothMap(boxes, ids) for boxes, ids, _ in get_tooth_locator().locate_batch(images)]
+
+        # One batched forward pass for the whole series; raw boxes are kept so the
+        # series can be re-thresholded later like any other image
+        with stage_timer("analyze_series", "detection"):
+            raw = get_raw_detections_batch(images, teeth)
+        store = get_detection_store()
+        for digest, (boxes, conf, source) in zip(digests, raw):
+            store.put(digest, boxes, conf, model=source)
+        store.flush()
+
+        detections = [filter_detections(boxes, conf, tooth_map, conf_thr, iou_thr)
+                      for (boxes, conf, _), tooth_map in zip(raw, teeth)]
+
+        import uuid
+        patient_id = str(uuid.uuid4())[:8]
+
+        with stage_timer("analyze_series", "overlay"):
+            series = []
+            for index, (img, dets) in enumerate(zip(images, detections)):
+                overlay, findings = render_overlay(img, dets)
+                overlay_path = f".outputs/patient_{patient_id}_{index}.png"
+                overlay.save(overlay_path)
+                series.append({
+                    "index": index,
+                    "filename": files[index].filename,
+                    "view": views[index] if index < len(views) else "",
+                    "image_size": list(img.size),
+                    "image_sha1": digests[index],
+                    "findings": findings,
+                    "overlay_path": overlay_path,
+                })
+
+        chart = build_tooth_chart([item["findings"] for item in series])
+        report = build_report(chart)
+        # The email attaches the overlay with the most findings
+        overlay_path = max(series, key=lambda item: len(item["findings"]))["overlay_path"]
+
+        with stage_timer("analyze_series", "persist"):
+            patient_results = {
+                "patient_id": patient_id,
+                **{field: patient[field] for field in PATIENT_FIELDS},
+                "analyzed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "findings": chart,
+                "series": series,
+                "report": report,
+                "overlay_path": overlay_path,
+                "clinic": clinic,
+                "conf_thr": conf_thr,
+                "iou_thr": iou_thr
+            }
+            with open(f'.outputs/patient_{patient_id}.json', 'w') as f:
+                json.dump(patient_results, f, indent=2)
+            # Longitudinal queries see the new visit without rescanning the records
+            from src.findings_index import record_findings
+            record_findings(patient_results)
+
+        # One notification per visit, not per image
+        with stage_timer("analyze_series", "notify"):
+            notifications = notify_patient(patient, chart, overlay_path, report, patient_id)
+
+        return jsonify({
+            'success': True,
+            'report': report,
+            'findings': chart,
+            'series': [{k: item[k] for k in ("index", "filename", "view", "findings")} for item in series],
+            **notifications,
+            'patient_id': patient_id,
+            'patient_name': patient['patient_name'],
+            'patient_portal_link': f"http://127.0.0.1:8080/patient/{patient_id}"
+        })
+
+    except Exception as e:
+        return jsonify({'error': f'Processing failed: {str(e)}'})
+
+def date_range_args():
+    """(since, until, error) from the query string; dates are ISO (YYYY-MM-DD, a time part is ignored)"""
+    import datetime
+    dates = []
+    for name in ('since', 'until'):
+        value = request.args.get(name) or None
+        if value is not None:
+            try:
+                datetime.date.fromisoformat(value[:10])
+            except ValueError:
+                return None, None, f'{name} must be an ISO date (YYYY-MM-DD), got {value!r}'
+        dates.append(value)
+    return dates[0], dates[1], None
+
+@app.route('/findings/history')
+def findings_history():
+    """Prior findings of one patient, optionally for one tooth/surface and date range"""
+    from src.findings_index import load_findings_index, patient_key
+    patient = request.args.get('patient', '')
+    if patient.startswith('case:'):
+        # Look the patient up from one of their cases
+        case = load_case(patient[len('case:'):])
+        patient = patient_key(case) if case else ''
+    if not patient:
+        return jsonify({'error': 'patient is required (email:..., phone:..., name:... or case:<id>)'})
+    since, until, error = date_range_args()
+    if error:
+        return jsonify({'error': error})
+    index = load_findings_index()
+    tooth = request.args.get('tooth', type=int)
+    return jsonify({
+        'patient': patient,
+        'findings': index.history(patient, tooth, request.args.get('surface'), since, until)
+    })
+
+@app.route('/findings/stats')
+def findings_stats():
+    """Clinic-wide lesion counts per tooth (and surface) and the bbox-center heatmap"""
+    from src.findings_index import load_findings_index
+    since, until, error = date_range_args()
+    if error:
+        return jsonify({'error': error})
+    index = load_findings_index()
+    return jsonify({
+        'findings': len(index),
+        'per_tooth': index.tooth_counts(since, until),
+        'per_tooth_surface': index.tooth_counts(since, until, by_surface=True),
+        'heatmap': index.heatmap(since, until).tolist() if request.args.get('heatmap') == 'true' else None
+    })
+
 if __name__ == '__main__':
     print("🚀 Starting Flask Dental App...")
     print("🌐 Open your browser to: http://127.0.0.1:8080")
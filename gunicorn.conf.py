@@ -0,0 +1,28 @@
+# gunicorn.conf.py
+# Run with: gunicorn -c gunicorn.conf.py flask_app:app
+import os
+from src.runtime import configure_runtime, describe_runtime
+
+bind = "0.0.0.0:8080"
+workers = int(os.getenv("INFERENCE_WORKERS", "2"))
+os.environ["INFERENCE_WORKERS"] = str(workers)
+
+# Inference slot (core share) of every live worker by worker age; the hooks below run in the arbiter
+_slots = {}
+
+def pre_fork(server, worker):
+    """Hand the new worker the lowest slot no live worker holds, so a restarted worker takes over the freed cores"""
+    taken = set(_slots.values())
+    worker.inference_slot = next(i for i in range(len(taken) + 1) if i not in taken)
+    _slots[worker.age] = worker.inference_slot
+
+def child_exit(server, worker):
+    """Free the slot of a worker that exited"""
+    _slots.pop(worker.age, None)
+
+def post_fork(server, worker):
+    """Give each worker its share of threads (and cores, if INFERENCE_PIN_CPUS=true)"""
+    index = worker.inference_slot
+    os.environ["INFERENCE_WORKER_INDEX"] = str(index)
+    configure_runtime(workers=workers, worker_index=index)
+    server.log.info(describe_runtime())
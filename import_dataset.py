@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Import downloaded dental datasets from local archives
+
+Takes the zip/tar files you downloaded by hand (Roboflow YOLO exports, Tufts
+segmentation masks, the Children's dataset, COCO or Pascal VOC exports) and
+streams them straight into a YOLO dataset: no temporary extraction, masks and
+VOC files converted on a process pool, bounded memory.
+
+    python3 import_dataset.py ~/Downloads/dental-caries.v1i.yolov8.zip --out datasets/roboflow
+    python3 import_dataset.py ~/Downloads/tufts.tar.gz --out datasets/tufts --mask-class caries
+"""
+import argparse
+import os
+import time
+from src.importer import import_archive
+from src.labels import build_label_index
+from src.materialize import write_dataset_yaml, write_manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream-import dataset archives into YOLO format")
+    parser.add_argument("archives", nargs="+", help="zip, tar(.gz/.bz2/.xz) or an extracted directory")
+    parser.add_argument("--out", required=True, help="dataset root to create, e.g. datasets/roboflow")
+    parser.add_argument("--val-fraction", type=float, default=0.2, help="used when an archive has no splits")
+    parser.add_argument("--mask-class", default="caries", help="class name for segmentation mask regions")
+    parser.add_argument("--mask-values-as-classes", action="store_true",
+                        help="one class per mask pixel value instead of a single class")
+    parser.add_argument("--min-mask-area", type=int, default=16, help="ignore mask blobs smaller than this (pixels)")
+    parser.add_argument("--workers", type=int, default=None, help="conversion processes (default: all CPUs)")
+    args = parser.parse_args()
+
+    print("🦷 Dataset Importer")
+    print("=" * 40)
+    items, names = [], []
+    for archive in args.archives:
+        start = time.perf_counter()
+        imported, names = import_archive(archive, args.out, args.val_fraction, args.mask_class,
+                                         args.min_mask_area, args.workers, names, args.mask_values_as_classes)
+        labeled = sum(1 for i in imported if i['label'])
+        print(f"📦 {archive}: {len(imported)} images, {labeled} with labels "
+              f"in {time.perf_counter() - start:.1f}s")
+        items += imported
+
+    if not items:
+        print("❌ No images found in the archives")
+        return 1
+
+    splits = sorted({i['split'] for i in items})
+    write_dataset_yaml(args.out, splits, names)
+    write_manifest(os.path.join(args.out, 'manifest.csv'), items)
+    print(f"📝 Classes: {names}")
+    print(f"✅ {args.out}/dataset.yaml and manifest.csv written")
+
+    errors = 0
+    for split in splits:
+        index = build_label_index(os.path.join(args.out, 'images', split), nc=len(names))
+        stats = index.stats()
+        errors += len(index.errors())
+        print(f"   {split}: {stats['images']} images, {stats['boxes']} boxes, {len(index.errors())} label errors")
+    print(f"💡 Train with: python3 quick_train.py --data {args.out}/dataset.yaml")
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
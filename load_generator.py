@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Synthetic load generator for the doctor → patient workflow
+
+Replays a mix of X-ray uploads (/analyze), patient portal views (/patient/<id>)
+and chat messages (/chat/api) against a running server and reports throughput,
+latency percentiles and error rates per endpoint.
+
+Open-loop mode (default) sends requests on a Poisson schedule regardless of how
+fast the server answers, and measures latency from the *scheduled* send time, so
+queueing delay shows up instead of being hidden by coordinated omission.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+from PIL import Image
+
+CHAT_MESSAGES = [
+    "Hello!",
+    "What do my results mean?",
+    "Is the cavity on my tooth serious?",
+    "What treatments might I need?",
+    "How much will a filling cost with insurance?",
+    "How can I prevent more cavities?",
+]
+
+INSURANCE = ["blue_cross", "aetna", "cigna", "delta_dental", ""]
+
+def synthetic_radiographs(sizes, per_size=3, seed=0):
+    """PNG payloads of panoramic-like noise at each size"""
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for w, h in sizes:
+        for _ in range(per_size):
+            a = rng.normal(60, 25, (h, w))
+            a[int(h * 0.3):int(h * 0.7), int(w * 0.1):int(w * 0.9)] += rng.uniform(80, 140)
+            buf = io.BytesIO()
+            Image.fromarray(np.clip(a, 0, 255).astype(np.uint8)).save(buf, format="PNG")
+            payloads.append(((w, h), buf.getvalue()))
+    return payloads
+
+class Workload:
+    """Builds and sends one request of each kind; remembers patient IDs for portal views"""
+
+    def __init__(self, base_url, payloads, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.payloads = payloads
+        self.timeout = timeout
+        self.patient_ids = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def session(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def analyze(self):
+        (w, h), data = random.choice(self.payloads)
+        resp = self.session().post(f"{self.base_url}/analyze", timeout=self.timeout, files={
+            "image": (f"xray_{w}x{h}.png", data, "image/png"),
+        }, data={
+            "patient_name": f"Load Patient {random.randint(1, 10000)}",
+            "patient_age": str(random.randint(8, 90)),
+            "insurance_provider": random.choice(INSURANCE),
+        })
+        body = resp.json()
+        if resp.status_code != 200 or not body.get("success"):
+            raise RuntimeError(body.get("error", f"HTTP {resp.status_code}"))
+        link = body.get("patient_portal_link")
+        if link:
+            with self.lock:
+                self.patient_ids.append(link.rsplit("/", 1)[-1])
+
+    def portal(self):
+        with self.lock:
+            patient_id = random.choice(self.patient_ids) if self.patient_ids else "unknown"
+        resp = self.session().get(f"{self.base_url}/patient/{patient_id}", timeout=self.timeout)
+        if resp.status_code != 200:
+            raise RuntimeError(f"HTTP {resp.status_code}")
+
+    def chat(self):
+        resp = self.session().post(f"{self.base_url}/chat/api", timeout=self.timeout, json={
+            "message": random.choice(CHAT_MESSAGES),
+            "patient_name": "Load Patient",
+            "findings": [{"tooth_id": random.randint(1, 32), "region": "MO", "conf": 0.85}],
+        })
+        if resp.status_code != 200 or "error" in resp.json().get("response", "").lower()[:40]:
+            raise RuntimeError(f"HTTP {resp.status_code}")
+
+class Recorder:
+    """Thread-safe latency and error collection per endpoint"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, endpoint, latency_ms, error=None):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(latency_ms)
+            if error is not None:
+                self.errors.setdefault(endpoint, {})
+                key = str(error)[:80]
+                self.errors[endpoint][key] = self.errors[endpoint].get(key, 0) + 1
+
+    def report(self, elapsed):
+        report = {}
+        for endpoint, lat in sorted(self.latencies.items()):
+            lat = np.asarray(lat)
+            errors = sum(self.errors.get(endpoint, {}).values())
+            report[endpoint] = {
+                "requests": int(len(lat)),
+                "throughput_rps": round(len(lat) / elapsed, 2),
+                "error_rate": round(errors / len(lat), 4),
+                "p50_ms": round(float(np.percentile(lat, 50)), 1),
+                "p90_ms": round(float(np.percentile(lat, 90)), 1),
+                "p99_ms": round(float(np.percentile(lat, 99)), 1),
+                "max_ms": round(float(lat.max()), 1),
+                "errors": self.errors.get(endpoint, {}),
+            }
+        return report
+
+def parse_mix(mix):
+    """'analyze=1,portal=3,chat=6' -> (names, normalized weights)"""
+    pairs = [item.split("=") for item in mix.split(",")]
+    names = [name.strip() for name, _ in pairs]
+    weights = np.array([float(w) for _, w in pairs])
+    return names, weights / weights.sum()
+
+def execute(workload, recorder, endpoint, scheduled):
+    """Send one request; latency counts from its scheduled time, not when a thread got to it"""
+    error = None
+    try:
+        getattr(workload, endpoint)()
+    except Exception as e:
+        error = e
+    recorder.record(endpoint, (time.perf_counter() - scheduled) * 1000, error)
+
+def run_open_loop(workload, recorder, names, weights, rate, duration, max_in_flight):
+    """Poisson arrivals at `rate` req/s, independent of response times"""
+    rng = np.random.default_rng()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        start = time.perf_counter()
+        next_at = start
+        while next_at - start < duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            endpoint = names[rng.choice(len(names), p=weights)]
+            pool.submit(execute, workload, recorder, endpoint, next_at)
+            next_at += rng.exponential(1.0 / rate)
+    return time.perf_counter() - start
+
+def run_closed_loop(workload, recorder, names, weights, users, duration, think_time):
+    """`users` virtual users, each waiting for its response before sending the next"""
+    deadline = time.perf_counter() + duration
+
+    def user(seed):
+        rng = np.random.default_rng(seed)
+        while time.perf_counter() < deadline:
+            execute(workload, recorder, names[rng.choice(len(names), p=weights)], time.perf_counter())
+            if think_time:
+                time.sleep(rng.exponential(think_time))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(user, range(users)))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the doctor → patient workflow")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--mode", choices=["open", "closed"], default="open")
+    parser.add_argument("--rate", type=float, default=5.0, help="open loop: total requests per second")
+    parser.add_argument("--users", type=int, default=8, help="closed loop: concurrent virtual users")
+    parser.add_argument("--think-time", type=float, default=0.5, help="closed loop: mean seconds between requests")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--mix", default="analyze=1,portal=3,chat=6", help="relative weight per endpoint")
+    parser.add_argument("--sizes", default="800x400,1500x750,2964x1464", help="synthetic radiograph sizes")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="open loop: client thread cap")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", default=".outputs/load_report.json")
+    args = parser.parse_args()
+
+    names, weights = parse_mix(args.mix)
+    sizes = [tuple(int(v) for v in s.split("x")) for s in args.sizes.split(",")]
+
+    print("🦷 Doctor → Patient Load Generator")
+    print("=" * 60)
+    print(f"🎯 {args.url}  mode={args.mode}  duration={args.duration:.0f}s  mix={args.mix}")
+
+    workload = Workload(args.url, synthetic_radiographs(sizes), args.timeout)
+    recorder = Recorder()
+
+    # Seed a few patients so portal views have real IDs to hit
+    for _ in range(3):
+        try:
+            workload.analyze()
+        except Exception as e:
+            print(f"⚠️  Seeding /analyze failed: {e}")
+
+    if args.mode == "open":
+        print(f"📈 Open loop at {args.rate} req/s")
+        elapsed = run_open_loop(workload, recorder, names, weights, args.rate, args.duration, args.max_in_flight)
+    else:
+        print(f"👥 Closed loop with {args.users} users")
+        elapsed = run_closed_loop(workload, recorder, names, weights, args.users, args.duration, args.think_time)
+
+    report = recorder.report(elapsed)
+    print(f"\n{'endpoint':<10}{'reqs':>7}{'rps':>8}{'err%':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)")
+    for endpoint, r in report.items():
+        print(f"{endpoint:<10}{r['requests']:>7}{r['throughput_rps']:>8}{r['error_rate'] * 100:>7.1f}%"
+              f"{r['p50_ms']:>9}{r['p90_ms']:>9}{r['p99_ms']:>9}{r['max_ms']:>9}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"args": vars(args), "elapsed_s": round(elapsed, 2), "endpoints": report}, f, indent=2)
+    print(f"\n✅ Report saved: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -125,74 +125,12 @@ def create_sample_annotations():
     print("⚠️  IMPORTANT: Replace sample annotations with real bounding box coordinates!")
 
 def create_visualization_tool():
-    """Create a tool to visualize annotations"""
-    viz_tool = '''#!/usr/bin/env python3
-"""
-Annotation Visualization Tool
-Shows bounding boxes on your dental X-rays
-"""
-import os
-from PIL import Image, ImageDraw, ImageFont
-import glob
-
-def visualize_annotations():
-    """Visualize annotations on images"""
-    print("🔍 Visualizing annotations...")
-    
-    # Get all images
-    images = glob.glob('data/images/**/*.jpg', recursive=True) + \
-             glob.glob('data/images/**/*.png', recursive=True)
-    
-    if not images:
-        print("❌ No images found")
+    """Point to the annotation visualizer, which ships with the repo as visualize_annotations.py"""
+    tool = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'visualize_annotations.py')
+    if not os.path.exists(tool):
+        print(f"⚠️  Visualization tool not found at {tool}")
         return
-    
-    for img_path in images:
-        # Load image
-        img = Image.open(img_path)
-        draw = ImageDraw.Draw(img)
-        
-        # Get corresponding label file
-        label_path = img_path.replace('images', 'labels').rsplit('.', 1)[0] + '.txt'
-        
-        if os.path.exists(label_path):
-            # Read annotations
-            with open(label_path, 'r') as f:
-                lines = f.readlines()
-            
-            # Draw bounding boxes
-            for line in lines:
-                parts = line.strip().split()
-                if len(parts) == 5:
-                    class_id, center_x, center_y, width, height = map(float, parts)
-                    
-                    # Convert normalized coordinates to pixel coordinates
-                    img_width, img_height = img.size
-                    x1 = int((center_x - width/2) * img_width)
-                    y1 = int((center_y - height/2) * img_height)
-                    x2 = int((center_x + width/2) * img_width)
-                    y2 = int((center_y + height/2) * img_height)
-                    
-                    # Draw rectangle
-                    draw.rectangle([x1, y1, x2, y2], outline='red', width=3)
-                    
-                    # Draw label
-                    draw.text((x1, y1-20), f'Caries {class_id}', fill='red')
-        
-        # Save visualization
-        output_path = img_path.replace('images', 'visualizations')
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        img.save(output_path)
-        print(f"   Saved: {output_path}")
-
-if __name__ == "__main__":
-    visualize_annotations()
-'''
-    
-    with open('visualize_annotations.py', 'w') as f:
-        f.write(viz_tool)
-    
-    print("🔍 Visualization tool created: visualize_annotations.py")
+    print(f"🔍 Visualization tool ready: {os.path.relpath(tool)}")
 
 def create_training_script():
     """Create a simplified training script"""
@@ -200,14 +138,14 @@ def create_training_script():
 """
 Simplified Training Script
 """
-from ultralytics import YOLO
-import torch
+from src.runtime import select_device
 
 def train():
     """Train YOLO model"""
     print("🚀 Starting training...")
     
-    # Load model
+    # Load model (ultralytics pulls in torch, so import it only when training)
+    from ultralytics import YOLO
     model = YOLO('yolov8n.pt')
     
     # Train
@@ -216,7 +154,7 @@ def train():
         epochs=50,
         imgsz=640,
         batch=8,
-        device='cuda' if torch.cuda.is_available() else 'cpu',
+        device=select_device(),
         project='runs/train',
         name='caries_detection'
     )
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+INT8 post-training quantization of the caries model with an accuracy gate
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+import numpy as np
+from PIL import Image
+from src.detect import int8_weights_path
+
+def letterbox(img, imgsz=640):
+    """Resize keeping aspect ratio and pad to a square, matching YOLO preprocessing"""
+    img = img.convert("RGB")
+    scale = imgsz / max(img.size)
+    w, h = int(round(img.width * scale)), int(round(img.height * scale))
+    canvas = Image.new("RGB", (imgsz, imgsz), (114, 114, 114))
+    canvas.paste(img.resize((w, h), Image.BILINEAR), ((imgsz - w) // 2, (imgsz - h) // 2))
+    x = np.asarray(canvas, dtype=np.float32) / 255.0
+    return x.transpose(2, 0, 1)[None]
+
+def make_calibration_reader(images, input_name, imgsz=640):
+    """Feed calibration images to onnxruntime one at a time"""
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter(images)
+
+        def get_next(self):
+            path = next(self.paths, None)
+            if path is None:
+                return None
+            return {input_name: letterbox(Image.open(path), imgsz)}
+
+    return _Reader()
+
+def export_fp32_onnx(weights, imgsz=640):
+    """Export the PyTorch weights to a static-shape FP32 ONNX graph"""
+    from ultralytics import YOLO
+    print(f"📦 Exporting {weights} to ONNX...")
+    return YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True)
+
+def quantize(fp32_onnx, int8_onnx, calib_images, imgsz=640):
+    """Static QDQ quantization: per-channel INT8 weights, UINT8 activations"""
+    import onnxruntime as ort
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    print(f"🔧 Quantizing with {len(calib_images)} calibration images...")
+    prepped = fp32_onnx.replace(".onnx", "_prep.onnx")
+    quant_pre_process(fp32_onnx, prepped)
+    input_name = ort.InferenceSession(prepped, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    quantize_static(
+        prepped,
+        int8_onnx,
+        make_calibration_reader(calib_images, input_name, imgsz),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        weight_type=QuantType.QInt8,
+        activation_type=QuantType.QUInt8,
+    )
+    os.remove(prepped)
+
+def measure_map(model_path):
+    """mAP on the val split, computed exactly like train_yolo.validate_model"""
+    from train_yolo import validate_model
+    results = validate_model(model_path)
+    return {"map50": float(results.box.map50), "map50_95": float(results.box.map)}
+
+def measure_latency(model_path, images, imgsz=640, repeats=5):
+    """Mean CPU predict latency in ms over the given images"""
+    from ultralytics import YOLO
+    model = YOLO(model_path, task="detect")
+    frames = [Image.open(p).convert("RGB") for p in images]
+    model(frames[0], imgsz=imgsz, device="cpu", verbose=False)  # warmup
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for frame in frames:
+            model(frame, imgsz=imgsz, device="cpu", verbose=False)
+    return (time.perf_counter() - start) / (repeats * len(frames)) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Create and gate an INT8 caries model")
+    parser.add_argument("--weights", default="weights/best.pt")
+    parser.add_argument("--calib", default="data/images/train")
+    parser.add_argument("--val-images", default="data/images/val")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--tolerance", type=float, default=0.02,
+                        help="max allowed mAP50 drop versus FP32 (absolute)")
+    parser.add_argument("--report", default="weights/quantization_report.json")
+    args = parser.parse_args()
+
+    print("🦷 INT8 Quantization")
+    print("=" * 50)
+
+    if not os.path.exists(args.weights):
+        print(f"❌ Weights not found: {args.weights}")
+        return 1
+
+    calib_images = sorted(glob.glob(f"{args.calib}/*.jpg") + glob.glob(f"{args.calib}/*.png"))
+    val_images = sorted(glob.glob(f"{args.val_images}/*.jpg") + glob.glob(f"{args.val_images}/*.png"))
+    if not calib_images:
+        print(f"❌ No calibration images found in {args.calib}")
+        return 1
+
+    fp32_onnx = export_fp32_onnx(args.weights, args.imgsz)
+    candidate = fp32_onnx.replace(".onnx", "_int8_candidate.onnx")
+    quantize(fp32_onnx, candidate, calib_images, args.imgsz)
+
+    print("\n🔍 Evaluating FP32 and INT8 on the val split...")
+    fp32_acc = measure_map(args.weights)
+    int8_acc = measure_map(candidate)
+    drop = fp32_acc["map50"] - int8_acc["map50"]
+
+    report = {
+        "weights": args.weights,
+        "calibration_images": len(calib_images),
+        "tolerance": args.tolerance,
+        "fp32": dict(fp32_acc, latency_ms=round(measure_latency(args.weights, val_images, args.imgsz), 1)),
+        "int8": dict(int8_acc, latency_ms=round(measure_latency(candidate, val_images, args.imgsz), 1)),
+        "map50_drop": round(drop, 4),
+        "published": drop <= args.tolerance,
+    }
+
+    if report["published"]:
+        target = int8_weights_path(args.weights)
+        shutil.move(candidate, target)
+        report["int8_path"] = target
+        print(f"✅ mAP50 drop {drop:.4f} within tolerance {args.tolerance} - published {target}")
+    else:
+        os.remove(candidate)
+        print(f"❌ mAP50 drop {drop:.4f} exceeds tolerance {args.tolerance} - INT8 model NOT published")
+
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"⚡ Latency FP32 {report['fp32']['latency_ms']} ms vs INT8 {report['int8']['latency_ms']} ms")
+    print(f"📊 Report saved: {args.report}")
+    return 0 if report["published"] else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,8 +4,8 @@ Quick training script using available datasets
 """
 import os
 import sys
-from ultralytics import YOLO
-import torch
+from src.labels import check_labels
+from src.runtime import select_device
 
 def check_dataset(dataset_path):
     """Check if dataset exists and is properly formatted"""
@@ -31,10 +31,16 @@ def check_dataset(dataset_path):
         print("❌ No training images found")
         return False
     
+    # Validate labels in bulk (index is cached next to the images)
+    dataset_yaml = os.path.join(dataset_path, "dataset.yaml")
+    if os.path.exists(dataset_yaml) and not check_labels(dataset_yaml):
+        print(f"❌ Label errors in {dataset_path}")
+        return False
+    
     return True
 
-def train_with_dataset(dataset_path, epochs=50):
-    """Train YOLO model with specified dataset"""
+def train_with_dataset(dataset_path, epochs=50, use_image_cache=True):
+    """Train YOLO model with specified dataset (images read from a memory-mapped cache)"""
     print(f"🚀 Training with dataset: {dataset_path}")
     
     # Check dataset
@@ -42,35 +48,51 @@ def train_with_dataset(dataset_path, epochs=50):
         return False
     
     # Check device
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    device = select_device()
     print(f"🖥️  Using device: {device}")
     
-    # Load model
-    model = YOLO('yolov8n.pt')  # Use nano model for faster training
+    # Load model (ultralytics pulls in torch, so import it only when training)
+    from ultralytics import YOLO
+    from src.image_cache import cached_trainer
+    from src.training import EpochTimer, find_resumable_run, mark_complete
+    
+    # Pick up an interrupted run on the same dataset instead of starting over
+    checkpoint = find_resumable_run('runs/train/caries_detection*', f'{dataset_path}/dataset.yaml')
+    model = YOLO(checkpoint or 'yolov8n.pt')  # Use nano model for faster training
+    for event, callback in EpochTimer().callbacks().items():
+        model.add_callback(event, callback)
+    trainer = cached_trainer() if use_image_cache else None
+    
+    train_args = dict(
+        data=f'{dataset_path}/dataset.yaml',
+        epochs=epochs,
+        imgsz=640,
+        batch=8,
+        device=device,
+        project='runs/train',
+        name='caries_detection',
+        save=True,
+        save_period=10,
+        patience=20,
+        lr0=0.01,
+        weight_decay=0.0005,
+        warmup_epochs=3,
+        box=7.5,
+        cls=0.5,
+        dfl=1.5,
+        val=True,
+        plots=True,
+        verbose=True
+    )
     
     # Train
     try:
-        results = model.train(
-            data=f'{dataset_path}/dataset.yaml',
-            epochs=epochs,
-            imgsz=640,
-            batch=8,
-            device=device,
-            project='runs/train',
-            name='caries_detection',
-            save=True,
-            save_period=10,
-            patience=20,
-            lr0=0.01,
-            weight_decay=0.0005,
-            warmup_epochs=3,
-            box=7.5,
-            cls=0.5,
-            dfl=1.5,
-            val=True,
-            plots=True,
-            verbose=True
-        )
+        if checkpoint:
+            print(f"♻️  Resuming interrupted run from {checkpoint}")
+            results = model.train(trainer=trainer, resume=True)
+        else:
+            results = model.train(trainer=trainer, **train_args)
+        mark_complete(results.save_dir)
         
         print("✅ Training completed!")
         print(f"📁 Model saved to: {results.save_dir}")
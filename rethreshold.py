@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Re-threshold every stored image at a new operating point without running the model
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from src.detection_store import DetectionStore, DETECTION_STORE, operating_point
+
+def backfill(store, image_dirs, weights, processes=0):
+    """Run the model once over images that are not in the store yet.
+
+    With processes > 0, detection runs in that many worker processes and the
+    decoded images reach them through shared memory (src.shm_transport).
+    """
+    from PIL import Image
+    todo = []
+    for path in sorted(p for d in image_dirs for p in glob.glob(f"{d}/*.jpg") + glob.glob(f"{d}/*.png")):
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        if digest not in store:
+            todo.append((path, digest))
+    if not todo:
+        return 0
+    if processes:
+        return _backfill_pool(store, todo, weights, processes)
+
+    from src.detect import Detector
+    detector = Detector(weights, mock_ok=False)
+    if detector.use_mock:
+        print("❌ No trained model loaded - nothing to backfill with")
+        return 0
+    added = 0
+    for path, digest in todo:
+        store.put(digest, *detector.detect_raw(Image.open(path).convert("RGB")), model="model")
+        added += 1
+        if added % 100 == 0:
+            store.flush()
+    store.flush()
+    return added
+
+def _backfill_pool(store, todo, weights, processes):
+    """backfill() through an InferencePool; images are decoded here and handed over in shared memory"""
+    from functools import partial
+    from PIL import Image
+    from src.shm_transport import InferencePool, detector_handler
+    added = 0
+    with InferencePool(processes, partial(detector_handler, weights)) as pool:
+        # Submitting waits for a free slot, so only a few decoded images are in flight
+        pending = [(digest, pool.submit(Image.open(path).convert("RGB"))) for path, digest in todo]
+        for digest, future in pending:
+            raw = future.result()
+            if raw is None:
+                print("❌ No trained model loaded in the workers - nothing to backfill with")
+                break
+            store.put(digest, *raw, model="model")
+            added += 1
+            if added % 100 == 0:
+                store.flush()
+    store.flush()
+    return added
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the raw detection store at an operating point")
+    parser.add_argument("--store", default=DETECTION_STORE)
+    parser.add_argument("--clinic", default=None, help="use this clinic's entry in operating_points.json")
+    parser.add_argument("--conf", type=float, default=None, help="confidence threshold (overrides --clinic)")
+    parser.add_argument("--iou", type=float, default=None, help="NMS IoU applied at query time")
+    parser.add_argument("--backfill", nargs="*", default=None, metavar="DIR",
+                        help="first store raw detections for images in these directories")
+    parser.add_argument("--weights", default="weights/best.pt")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="backfill in this many worker processes (images passed through shared memory)")
+    parser.add_argument("--compact", action="store_true", help="merge all segments into one file")
+    parser.add_argument("--output", default=None, help="write per-image counts as JSON")
+    args = parser.parse_args()
+
+    print("🦷 Detection Store Re-threshold")
+    print("=" * 50)
+
+    store = DetectionStore(args.store)
+    if args.backfill:
+        print(f"🧮 Backfilled {backfill(store, args.backfill, args.weights, args.processes)} images")
+    if args.compact:
+        print(f"🗜️  Compacted {store.compact()} segments")
+
+    point = operating_point(args.clinic)
+    conf_thr = point["conf_thr"] if args.conf is None else args.conf
+    iou_thr = point["iou_thr"] if args.iou is None else args.iou
+
+    start = time.perf_counter()
+    keys, counts, max_conf = store.rethreshold(conf_thr, iou_thr)
+    elapsed = time.perf_counter() - start
+    if not len(keys):
+        print(f"⚠️  Store {args.store} is empty")
+        return 1
+
+    print(f"📊 conf > {conf_thr}, NMS IoU {iou_thr}: {int(counts.sum())} detections on "
+          f"{int((counts > 0).sum())}/{len(keys)} images ({elapsed * 1000:.1f} ms)")
+    print(f"   detections per flagged image: {np.mean(counts[counts > 0]) if counts.any() else 0:.2f}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"conf_thr": conf_thr, "iou_thr": iou_thr,
+                       "images": {k: {"detections": int(c), "max_conf": round(float(m), 3)}
+                                  for k, c, m in zip(keys.tolist(), counts, max_conf)}}, f, indent=1)
+        print(f"📝 Saved {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,14 +2,14 @@
 """
 Simplified Training Script
 """
-from ultralytics import YOLO
-import torch
+from src.runtime import select_device
 
 def train():
     """Train YOLO model"""
     print("🚀 Starting training...")
     
-    # Load model
+    # Load model (ultralytics pulls in torch, so import it only when training)
+    from ultralytics import YOLO
     model = YOLO('yolov8n.pt')
     
     # Train
@@ -18,7 +18,7 @@ def train():
         epochs=50,
         imgsz=640,
         batch=8,
-        device='cuda' if torch.cuda.is_available() else 'cpu',
+        device=select_device(),
         project='runs/train',
         name='caries_detection'
     )
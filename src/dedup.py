@@ -0,0 +1,206 @@
+# src/dedup.py
+# Perceptual hashing, duplicate grouping and split-leakage detection for image datasets
+import hashlib
+import os
+import numpy as np
+
+IMG_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+SIDECAR = '.image_hashes.npz'
+
+
+def phash(img_path, hash_size=8, highfreq_factor=4):
+    """64-bit DCT perceptual hash; robust to re-encoding (jpg vs png), resizing and mild contrast changes"""
+    import cv2
+    from PIL import Image
+    size = hash_size * highfreq_factor
+    with Image.open(img_path) as img:
+        # JPEG decodes at reduced scale directly
+        img.draft('L', (size * 4, size * 4))
+        small = np.asarray(img.convert('L').resize((size, size), Image.LANCZOS), dtype=np.float32)
+    low = cv2.dct(small)[:hash_size, :hash_size]
+    bits = (low > np.median(low)).reshape(-1)
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def hash_file(img_path):
+    """Worker: (sha1 of the bytes, perceptual hash) for one image"""
+    with open(img_path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    return digest, phash(img_path)
+
+
+def dataset_images(root):
+    """(path, split) for every image under <root>/images/<split>/"""
+    found = []
+    images_dir = os.path.join(root, 'images')
+    if not os.path.isdir(images_dir):
+        return found
+    for split in sorted(os.listdir(images_dir)):
+        split_dir = os.path.join(images_dir, split)
+        if not os.path.isdir(split_dir):
+            continue
+        found += [(os.path.join(split_dir, f), split) for f in sorted(os.listdir(split_dir))
+                  if f.lower().endswith(IMG_EXTENSIONS)]
+    return found
+
+
+def hash_dataset(root, workers=None, force=False):
+    """Hash every image of a dataset root, reusing the sidecar for unchanged files.
+
+    Returns a dict of arrays: paths, splits, sha1, phash (uint64). The sidecar at
+    <root>/.image_hashes.npz is keyed on path, size and mtime.
+    """
+    from multiprocessing import Pool
+
+    sidecar = os.path.join(root, SIDECAR)
+    images = dataset_images(root)
+    paths = [p for p, _ in images]
+    stats = [os.stat(p) for p in paths]
+    keys = [f"{p}:{st.st_size}:{st.st_mtime_ns}" for p, st in zip(paths, stats)]
+
+    cached = {}
+    if not force and os.path.exists(sidecar):
+        old = np.load(sidecar)
+        cached = {k: (s, int(h)) for k, s, h in zip(old['keys'], old['sha1'], old['phash'])}
+
+    todo = [i for i, k in enumerate(keys) if k not in cached]
+    results = {keys[i]: cached[keys[i]] for i in range(len(keys)) if keys[i] in cached}
+    if todo:
+        workers = min(workers or os.cpu_count() or 1, len(todo))
+        with Pool(workers) as pool:
+            for i, result in zip(todo, pool.imap(hash_file, [paths[i] for i in todo], chunksize=8)):
+                results[keys[i]] = result
+
+    sha1 = np.array([results[k][0] for k in keys], dtype='U40')
+    hashes = np.array([results[k][1] for k in keys], dtype=np.uint64)
+    if todo or len(cached) != len(keys):
+        np.savez(sidecar, keys=np.array(keys, dtype=str), sha1=sha1, phash=hashes)
+    return {
+        'paths': np.array(paths, dtype=str),
+        'splits': np.array([s for _, s in images], dtype=str),
+        'sha1': sha1,
+        'phash': hashes,
+        'hashed': len(todo),
+    }
+
+
+def hamming_pairs(hashes, max_distance, block=512):
+    """(i, j, distance) for all i < j whose hashes differ in at most max_distance bits"""
+    bits = np.unpackbits(hashes.astype('>u8').view(np.uint8).reshape(-1, 8), axis=1).astype(np.int32)
+    ones = bits.sum(1)
+    pairs = []
+    for start in range(0, len(bits), block):
+        # popcount(a xor b) = |a| + |b| - 2 a.b on 0/1 vectors
+        a = bits[start:start + block]
+        dist = ones[start:start + block, None] + ones[None, :] - 2 * (a @ bits.T)
+        i, j = np.nonzero(dist <= max_distance)
+        i += start
+        keep = i < j
+        pairs.append(np.stack([i[keep], j[keep], dist[i[keep] - start, j[keep]]], axis=1))
+    return np.concatenate(pairs) if pairs else np.zeros((0, 3), dtype=np.int64)
+
+
+def group_duplicates(n, pairs):
+    """Union-find over duplicate pairs; returns a group id per image"""
+    parent = np.arange(n)
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j, _ in pairs:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return np.array([find(i) for i in range(n)])
+
+
+def leakage_report(records, max_distance=6):
+    """Exact/near duplicate groups across splits and datasets.
+
+    records: list of (dataset root, hash_dataset() result). Every group with
+    more than one image is listed; a group is leakage when it spans several
+    splits of one dataset.
+    """
+    roots = np.concatenate([[root] * len(r['paths']) for root, r in records]) if records else np.array([])
+    paths = np.concatenate([r['paths'] for _, r in records]) if records else np.array([])
+    splits = np.concatenate([r['splits'] for _, r in records]) if records else np.array([])
+    sha1 = np.concatenate([r['sha1'] for _, r in records]) if records else np.array([])
+    hashes = np.concatenate([r['phash'] for _, r in records]) if records else np.zeros(0, np.uint64)
+
+    pairs = hamming_pairs(hashes, max_distance)
+    groups = group_duplicates(len(paths), pairs)
+
+    report = {'images': int(len(paths)), 'max_distance': max_distance, 'groups': [],
+              'leaking_groups': 0, 'cross_dataset_groups': 0}
+    for g in np.unique(groups):
+        members = np.flatnonzero(groups == g)
+        if len(members) < 2:
+            continue
+        datasets = sorted(set(roots[members].tolist()))
+        leak = any(len(set(splits[members[roots[members] == d]].tolist())) > 1 for d in datasets)
+        report['groups'].append({
+            'exact': len(set(sha1[members].tolist())) == 1,
+            'leaks_across_splits': leak,
+            'datasets': datasets,
+            'images': [{'path': str(paths[m]), 'split': str(splits[m])} for m in members],
+        })
+        report['leaking_groups'] += leak
+        report['cross_dataset_groups'] += len(datasets) > 1
+    report['duplicate_groups'] = len(report['groups'])
+    return report
+
+
+def _label_path(img_path):
+    sa, sb = f"{os.sep}images{os.sep}", f"{os.sep}labels{os.sep}"
+    return sb.join(img_path.rsplit(sa, 1)).rsplit('.', 1)[0] + '.txt'
+
+
+def plan_grouped_splits(result, max_distance=6, val_fraction=0.2, test_fraction=0.0, seed=0):
+    """New split for every image so duplicate groups never straddle splits.
+
+    Whole groups are shuffled and assigned until each split reaches its share of
+    images. Returns a list of (path, old split, new split).
+    """
+    groups = group_duplicates(len(result['paths']), hamming_pairs(result['phash'], max_distance))
+    sizes = np.bincount(groups, minlength=len(groups))
+    ids = np.unique(groups)
+    np.random.default_rng(seed).shuffle(ids)
+    n = len(groups)
+    targets = [('test', test_fraction * n), ('val', val_fraction * n)]
+    assignment, filled = {}, {'test': 0, 'val': 0}
+    for g in ids:
+        size = int(sizes[g])
+        split = next((s for s, t in targets if filled[s] + size <= t + 0.5 * size), 'train')
+        if split != 'train':
+            filled[split] += size
+        assignment[g] = split
+    return [(str(p), str(s), assignment[g]) for p, s, g in zip(result['paths'], result['splits'], groups)]
+
+
+def apply_split_plan(root, plan):
+    """Move images and their labels into <root>/{images,labels}/<new split>/.
+
+    A file whose stem is already taken in the target split (train/100.jpg and
+    val/100.png share 100.txt) is renamed <old split>_<name>.
+    """
+    moved = 0
+    for path, old, new in plan:
+        if old == new:
+            continue
+        label = _label_path(path)
+        name = os.path.basename(path)
+        stem = os.path.splitext(name)[0]
+        taken = any(os.path.splitext(f)[0] == stem for f in os.listdir(os.path.join(root, 'images', new))) \
+            if os.path.isdir(os.path.join(root, 'images', new)) else False
+        if taken or os.path.exists(os.path.join(root, 'labels', new, stem + '.txt')):
+            name, stem = f"{old}_{name}", f"{old}_{stem}"
+        for src, dst in ((path, os.path.join(root, 'images', new, name)),
+                         (label, os.path.join(root, 'labels', new, stem + '.txt'))):
+            if os.path.exists(src):
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                os.replace(src, dst)
+        moved += 1
+    return moved
@@ -3,23 +3,140 @@
 from PIL import Image
 import random
 import os
+import numpy as np
+from src.tiling import tile_grid, merge_detections
+from src.roi import find_dental_arch_roi, shift_detections
+from src.runtime import runtime_settings, apply_torch_threads, onnx_session_options
+from src.metrics import record_screen
+from src.detection_store import RAW_CONF_FLOOR, apply_operating_point
+
+# Written by distill_model.py: path, input size, recall and CPU latency per model
+MODEL_REGISTRY = "weights/models.json"
+
+def select_model(latency_budget_ms, registry_path=MODEL_REGISTRY):
+    """Registry entry with the best caries recall that fits the latency budget.
+
+    If no model is fast enough, the fastest one is returned; None without a registry.
+    """
+    import json
+    if not os.path.exists(registry_path):
+        return None
+    with open(registry_path) as f:
+        models = [m for m in json.load(f).get("models", []) if os.path.exists(m["path"])]
+    if not models:
+        return None
+    fitting = [m for m in models if (m.get("latency_ms") or 0) <= latency_budget_ms]
+    if fitting:
+        return max(fitting, key=lambda m: (m.get("recall") or 0, -(m.get("latency_ms") or 0)))
+    return min(models, key=lambda m: m.get("latency_ms") or 0)
+
+def _no_boxes():
+    return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int16)
+
+def _result_arrays(result):
+    """(xyxy, conf, cls) float32/int16 arrays from one ultralytics result"""
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return _no_boxes()
+    return (boxes.xyxy.cpu().numpy().astype(np.float32), boxes.conf.cpu().numpy().astype(np.float32),
+            boxes.cls.cpu().numpy().astype(np.int16))
+
+def int8_weights_path(weights_path):
+    """Location of the INT8 model published by quantize_model.py for these weights"""
+    return os.path.splitext(weights_path)[0] + "_int8.onnx"
+
+def detector_settings():
+    """Detector keyword arguments of this deployment, read from the environment.
+
+    DETECTOR_TILED and DETECTOR_ROI_CROP ("true"/"false"), DETECTOR_PRECISION
+    ("fp32" or "int8"), LATENCY_BUDGET_MS, CASCADE_THRESHOLD (from
+    tune_cascade.py; enables the screening stage) and CASCADE_SCREEN_WEIGHTS.
+    The web app and the inference pool workers build their Detector from
+    these, so every serving path runs the same pipeline.
+    """
+    budget = os.getenv("LATENCY_BUDGET_MS")
+    screen_thr = os.getenv("CASCADE_THRESHOLD")
+    return {
+        "tiled": os.getenv("DETECTOR_TILED", "false").lower() == "true",
+        "roi_crop": os.getenv("DETECTOR_ROI_CROP", "false").lower() == "true",
+        "precision": os.getenv("DETECTOR_PRECISION", "fp32"),
+        "latency_budget_ms": float(budget) if budget else None,
+        "cascade": bool(screen_thr),
+        "screen_thr": float(screen_thr) if screen_thr else 0.1,
+        "screen_weights": os.getenv("CASCADE_SCREEN_WEIGHTS"),
+    }
 
 class Detector:
-    """YOLO detector with mock fallback for demo purposes."""
-    def __init__(self, weights_path="weights/best.pt", mock_ok=True):
+    """YOLO detector with mock fallback for demo purposes.
+
+    With tiled=True, images larger than tile_size are sliced into overlapping
+    tiles that go through the model as one batch, so small interproximal
+    lesions are not lost when a ~3000px panoramic is downsized to 640.
+    With roi_crop=True, only the dental-arch region found by src.roi is passed
+    to the model and boxes are mapped back to full-image coordinates.
+    With precision="int8", the quantized ONNX model next to weights_path is
+    loaded instead of the FP32 PyTorch weights.
+    With latency_budget_ms, weights_path is replaced by the most accurate model
+    in weights/models.json (teacher or distilled student) that meets the budget.
+    With cascade=True, a cheap screening pass (the same model at screen_imgsz,
+    or screen_weights such as the distilled student) scores the image first and
+    full detection only runs when its caries probability reaches screen_thr;
+    tune the threshold with tune_cascade.py.
+    """
+    def __init__(self, weights_path="weights/best.pt", mock_ok=True,
+                 tiled=False, tile_size=640, tile_overlap=0.2, max_tiles=12,
+                 merge="nms", iou_thr=0.5, conf_thr=0.5, roi_crop=False,
+                 precision="fp32", latency_budget_ms=None,
+                 cascade=False, screen_weights=None, screen_imgsz=320, screen_thr=0.1):
+        self.model_name = None
+        self.imgsz = None
+        if latency_budget_ms is not None:
+            choice = select_model(latency_budget_ms)
+            if choice:
+                weights_path, self.imgsz, self.model_name = choice["path"], choice.get("imgsz"), choice["name"]
+                print(f"Using {choice['name']} model ({choice.get('latency_ms')} ms) "
+                      f"for a {latency_budget_ms} ms budget")
+        if precision == "int8":
+            weights_path = int8_weights_path(weights_path)
         self.weights_path = weights_path
+        self.precision = precision
         self.mock_ok = mock_ok
         self.yolo = None
         self.use_mock = True
+
+        # Tiled inference settings
+        self.tiled = tiled
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.max_tiles = max_tiles
+        self.merge = merge
+        self.iou_thr = iou_thr
+        self.conf_thr = conf_thr
+
+        # Crop to the dental arch before detection
+        self.roi_crop = roi_crop
+
+        # Two-stage cascade: cheap screen, full detection only for likely positives
+        self.cascade = cascade
+        self.screen_weights = screen_weights
+        self.screen_imgsz = screen_imgsz
+        self.screen_thr = screen_thr
+        self.screener = None
         
         # Try to load YOLO model
         if not mock_ok:
             try:
+                runtime_settings()
                 from ultralytics import YOLO
+                apply_torch_threads()
                 if os.path.exists(weights_path):
-                    self.yolo = YOLO(weights_path)
+                    self.yolo = YOLO(weights_path, task="detect")
                     self.use_mock = False
+                    if weights_path.endswith(".onnx"):
+                        self._apply_onnx_threads()
                     print(f"Loaded YOLO model from {weights_path}")
+                    if cascade:
+                        self._load_screener()
                 else:
                     print(f"YOLO weights not found at {weights_path}, using mock mode")
             except ImportError:
@@ -27,41 +144,146 @@ class Detector:
             except Exception as e:
                 print(f"Error loading YOLO model: {e}, using mock mode")
 
+    def _load_screener(self):
+        """Separate screening weights if given and present, else the main model"""
+        from ultralytics import YOLO
+        self.screener = self.yolo
+        if self.screen_weights and os.path.exists(self.screen_weights):
+            self.screener = YOLO(self.screen_weights, task="detect")
+            print(f"Loaded screening model from {self.screen_weights}")
+
+    def screen(self, img: Image.Image):
+        """Image-level caries probability: the highest box confidence of the screening pass"""
+        try:
+            results = self.screener(img, imgsz=self.screen_imgsz, conf=0.01, verbose=False)
+        except Exception as e:
+            # e.g. a static-shape ONNX model that only accepts its export size
+            print(f"Screening failed: {e}, running full detection")
+            return 1.0
+        boxes = results[0].boxes
+        return float(boxes.conf.max()) if boxes is not None and len(boxes) else 0.0
+
+    def _apply_onnx_threads(self):
+        """Rebuild the onnxruntime session with the configured thread counts.
+
+        ultralytics creates its session lazily with default options (one thread
+        per core), so run a tiny warmup to build it and then swap it out.
+        """
+        try:
+            import onnxruntime as ort
+            self.yolo(Image.new("RGB", (64, 64)), verbose=False)
+            backend = self.yolo.predictor.model
+            if hasattr(backend, "session"):
+                backend.session = ort.InferenceSession(self.weights_path, sess_options=onnx_session_options(),
+                                                       providers=["CPUExecutionProvider"])
+        except Exception as e:
+            print(f"Could not apply ONNX thread settings: {e}")
+
     def detect(self, img: Image.Image):
         """Detect caries in the image"""
         if self.use_mock or self.yolo is None:
             return self._mock_detect(img)
-        else:
-            return self._yolo_detect(img)
-    
-    def _yolo_detect(self, img: Image.Image):
-        """Use YOLO model for detection"""
         try:
-            results = self.yolo(img)
-            detections = []
-            
-            for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        conf = float(box.conf[0].cpu().numpy())
-                        cls = int(box.cls[0].cpu().numpy())
-                        
-                        # Map class to caries
-                        if conf > 0.5:  # Confidence threshold
-                            detections.append({
-                                "bbox": [int(x1), int(y1), int(x2), int(y2)],
-                                "conf": round(conf, 2),
-                                "cls": "caries"
-                            })
-            
-            return detections
-            
+            return self._to_detections(*self.detect_raw(img)[:2])
         except Exception as e:
             print(f"YOLO detection failed: {e}, falling back to mock")
             return self._mock_detect(img)
-    
+
+    def detect_raw(self, img: Image.Image):
+        """Every box above RAW_CONF_FLOOR as float32 (xyxy, conf, cls) arrays in image coordinates.
+
+        ROI crop, cascade screen and tiling apply as configured, but the
+        operating point (conf_thr) does not, so these can go to the
+        DetectionStore and be re-thresholded without running the model again.
+        """
+        if self.roi_crop:
+            x1, y1, x2, y2 = find_dental_arch_roi(img)
+            boxes, conf, cls = self._raw_image(img.crop((x1, y1, x2, y2)))
+            return boxes + np.array([x1, y1, x1, y1], dtype=np.float32), conf, cls
+        return self._raw_image(img)
+
+    def _raw_image(self, img: Image.Image):
+        """Dispatch to the cascade screen and tiled or full-image detection"""
+        if not self._screen_passes(img):
+            return _no_boxes()
+        if self.tiled and max(img.size) > self.tile_size:
+            return self._tiled_raw(img)
+        return self._full_raw(img)
+
+    def _full_raw(self, img: Image.Image):
+        kwargs = {"imgsz": self.imgsz} if self.imgsz else {}
+        return _result_arrays(self.yolo(img, conf=RAW_CONF_FLOOR, verbose=False, **kwargs)[0])
+
+    def _screen_passes(self, img: Image.Image):
+        """Whether full detection should run (always, unless the cascade is on)"""
+        if not self.cascade or self.screener is None:
+            return True
+        passed = self.screen(img) >= self.screen_thr
+        record_screen(passed)
+        return passed
+
+    def _to_detections(self, boxes, conf):
+        """Caries detections above conf_thr"""
+        boxes, conf, _ = apply_operating_point(boxes, conf, conf_thr=self.conf_thr)
+        return [{
+            "bbox": [int(x1), int(y1), int(x2), int(y2)],
+            "conf": round(float(c), 2),
+            "cls": "caries"
+        } for (x1, y1, x2, y2), c in zip(boxes, conf)]
+
+    def detect_batch_raw(self, imgs):
+        """detect_raw() for several images (e.g. a full-mouth series) with one forward pass.
+
+        Tiled and ROI-cropped detection already work per image, so those run
+        image by image; with the cascade on, only images that pass the screen
+        go into the batch.
+        """
+        if self.tiled or self.roi_crop:
+            return [self.detect_raw(img) for img in imgs]
+        out = [_no_boxes() for _ in imgs]
+        todo = [i for i in range(len(imgs)) if self._screen_passes(imgs[i])]
+        if todo:
+            kwargs = {"imgsz": self.imgsz} if self.imgsz else {}
+            results = self.yolo([imgs[i] for i in todo], conf=RAW_CONF_FLOOR, verbose=False, **kwargs)
+            for i, result in zip(todo, results):
+                out[i] = _result_arrays(result)
+        return out
+
+    def detect_batch(self, imgs):
+        """Detect caries in several images with one forward pass (see detect_batch_raw)"""
+        if self.use_mock or self.yolo is None:
+            return [self._mock_detect(img) for img in imgs]
+        try:
+            return [self._to_detections(*raw[:2]) for raw in self.detect_batch_raw(imgs)]
+        except Exception as e:
+            print(f"Batched detection failed: {e}, detecting one image at a time")
+            return [self.detect(img) for img in imgs]
+
+    def _tiled_raw(self, img: Image.Image):
+        """Run overlapping tiles through one batched forward pass and merge boxes across tiles"""
+        try:
+            windows = tile_grid(img.size, self.tile_size, self.tile_overlap, self.max_tiles)
+            tiles = [img.crop(win) for win in windows]
+            results = self.yolo(tiles, imgsz=self.tile_size, conf=RAW_CONF_FLOOR, verbose=False)
+
+            all_boxes, all_scores = [], []
+            for (x0, y0, _, _), result in zip(windows, results):
+                xyxy, conf, _ = _result_arrays(result)
+                all_boxes.append(xyxy + np.array([x0, y0, x0, y0], dtype=np.float32))
+                all_scores.append(conf)
+            boxes, scores = np.concatenate(all_boxes), np.concatenate(all_scores)
+            if not len(scores):
+                return _no_boxes()
+
+            # Merging only removes duplicates from overlapping tiles; the threshold comes later
+            boxes, scores = merge_detections(boxes, scores, method=self.merge, iou_thr=self.iou_thr)
+            return (np.asarray(boxes, dtype=np.float32).reshape(-1, 4), np.asarray(scores, dtype=np.float32),
+                    np.zeros(len(scores), dtype=np.int16))
+
+        except Exception as e:
+            print(f"Tiled detection failed: {e}, falling back to full-image detection")
+            return self._full_raw(img)
+
     def _mock_detect(self, img: Image.Image):
         """Mock detection for demo purposes with realistic tooth positions"""
         w, h = img.size
@@ -0,0 +1,235 @@
+# src/detection_store.py
+# Columnar store of raw detections (float32 boxes/conf, int16 class) with query-time thresholds
+import json
+import os
+import time
+import numpy as np
+from src.tiling import nms
+
+# Boxes below this are never kept; every operating point must sit above it
+RAW_CONF_FLOOR = 0.05
+DETECTION_STORE = ".outputs/detections"
+OPERATING_POINTS = "operating_points.json"
+# flush() merges segments once there are more than this many
+MAX_SEGMENTS = 16
+DEFAULT_OPERATING_POINT = {"conf_thr": 0.5, "iou_thr": None}
+
+
+def apply_operating_point(boxes, conf, cls=None, conf_thr=0.5, iou_thr=None):
+    """Boxes with conf > conf_thr, optionally NMS'd at iou_thr; returns (boxes, conf, cls)"""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+    cls = np.zeros(len(conf), dtype=np.int16) if cls is None else np.asarray(cls).reshape(-1)
+    keep = conf > conf_thr
+    boxes, conf, cls = boxes[keep], conf[keep], cls[keep]
+    if iou_thr and len(conf) > 1:
+        keep = nms(boxes, conf, iou_thr)
+        boxes, conf, cls = boxes[keep], conf[keep], cls[keep]
+    return boxes, conf, cls
+
+
+def operating_point(clinic=None, path=OPERATING_POINTS):
+    """conf_thr/iou_thr for a clinic from operating_points.json, else its 'default' entry.
+
+    The file maps clinic ids to {"conf_thr": ..., "iou_thr": ...}.
+    """
+    point = dict(DEFAULT_OPERATING_POINT)
+    if os.path.exists(path):
+        with open(path) as f:
+            points = json.load(f)
+        point.update(points.get("default", {}))
+        point.update(points.get(clinic, {}) if clinic else {})
+    return point
+
+
+class DetectionStore:
+    """Raw boxes above RAW_CONF_FLOOR for many images, stored as columns.
+
+    Each flush writes one segment (<root>/seg_*.npz) holding the concatenated
+    boxes, conf and class of its images plus per-image offsets, like the label
+    index. Segments are loaded once each and cached, so a new segment costs
+    only its own read; lookups check segments newest first (later writes win).
+    Once there are more than max_segments, flush() merges the newer segments
+    into one, folding in the oldest too when they have grown as large as it,
+    so the number of files stays bounded and each row is rewritten only a
+    logarithmic number of times. Whole-archive reads (rethreshold) merge all
+    segments into one set of arrays; compact() folds everything into one file.
+    """
+
+    def __init__(self, root=DETECTION_STORE, floor=RAW_CONF_FLOOR, max_segments=MAX_SEGMENTS):
+        self.root = root
+        self.floor = floor
+        self.max_segments = max_segments
+        self._pending = []
+        self._cache = {}
+        self._merged = (None, None)
+
+    def put(self, key, boxes, conf, cls=None, model=""):
+        """Queue the raw detections of one image (key is usually its content hash)"""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        cls = np.zeros(len(conf), dtype=np.int16) if cls is None else np.asarray(cls, dtype=np.int16).reshape(-1)
+        keep = conf >= self.floor
+        self._pending.append((key, model, boxes[keep], conf[keep], cls[keep]))
+
+    def flush(self):
+        """Write queued images as a new segment; returns its file name or None"""
+        if not self._pending:
+            return None
+        keys, models, boxes, conf, cls = zip(*self._pending)
+        name = self._write(np.array(keys, dtype=str), np.array(models, dtype=str),
+                           np.concatenate([[0], np.cumsum([len(c) for c in conf])]).astype(np.int64),
+                           np.concatenate(boxes), np.concatenate(conf), np.concatenate(cls))
+        self._pending = []
+        if len(self._segment_names()) > self.max_segments:
+            self._auto_compact()
+        return name
+
+    def _write(self, keys, models, offsets, boxes, conf, cls, name=None):
+        os.makedirs(self.root, exist_ok=True)
+        # Names sort by write time, which is the merge order
+        name = name or f"seg_{time.time_ns():020d}_{os.getpid()}.npz"
+        tmp = os.path.join(self.root, name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, keys=keys, models=models, offsets=offsets, boxes=boxes, conf=conf, cls=cls)
+        os.replace(tmp, os.path.join(self.root, name))
+        return name
+
+    def _segment_names(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(f for f in os.listdir(self.root) if f.startswith("seg_") and f.endswith(".npz"))
+
+    def _segments(self):
+        """(names, segments) currently on disk; only segments not seen before are read"""
+        names = self._segment_names()
+        for name in names:
+            if name not in self._cache:
+                try:
+                    with np.load(os.path.join(self.root, name)) as seg:
+                        data = {k: seg[k] for k in ("keys", "models", "offsets", "boxes", "conf", "cls")}
+                except FileNotFoundError:
+                    # Compacted away by another process between listing and reading
+                    return self._segments()
+                data["index"] = {k: i for i, k in enumerate(data["keys"].tolist())}
+                self._cache[name] = data
+        for name in set(self._cache) - set(names):
+            del self._cache[name]
+        return names, [self._cache[name] for name in names]
+
+    @staticmethod
+    def _merge(segments):
+        """One set of columns from several segments (in write order; latest write of each key wins)"""
+        if not segments:
+            return {"keys": np.zeros(0, dtype=str), "models": np.zeros(0, dtype=str),
+                    "offsets": np.zeros(1, dtype=np.int64), "boxes": np.zeros((0, 4), np.float32),
+                    "conf": np.zeros(0, np.float32), "cls": np.zeros(0, np.int16)}
+        keys, models, starts, counts, base = [], [], [], [], 0
+        for seg in segments:
+            offsets = seg["offsets"]
+            keys.append(seg["keys"])
+            models.append(seg["models"])
+            starts.append(offsets[:-1] + base)
+            counts.append(np.diff(offsets))
+            base += int(offsets[-1])
+        keys, models = np.concatenate(keys), np.concatenate(models)
+        starts, counts = np.concatenate(starts), np.concatenate(counts)
+        _, first_rev = np.unique(keys[::-1], return_index=True)
+        latest = np.sort(len(keys) - 1 - first_rev)
+        counts = counts[latest]
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        rows = np.repeat(starts[latest] - offsets[:-1], counts) + np.arange(offsets[-1])
+        return {"keys": keys[latest], "models": models[latest], "offsets": offsets,
+                "boxes": np.concatenate([seg["boxes"] for seg in segments])[rows],
+                "conf": np.concatenate([seg["conf"] for seg in segments])[rows],
+                "cls": np.concatenate([seg["cls"] for seg in segments])[rows]}
+
+    def _load(self):
+        """All segments merged into one set of columns (for whole-archive reads)"""
+        names, segments = self._segments()
+        if self._merged[0] != names:
+            self._merged = (names, self._merge(segments))
+        return self._merged[1]
+
+    def __len__(self):
+        return len(self._load()["keys"])
+
+    def __contains__(self, key):
+        return any(key in seg["index"] for seg in self._segments()[1])
+
+    def get(self, key):
+        """(boxes, conf, cls, model) stored for key, or None"""
+        for seg in reversed(self._segments()[1]):
+            i = seg["index"].get(key)
+            if i is not None:
+                a, b = seg["offsets"][i], seg["offsets"][i + 1]
+                return seg["boxes"][a:b], seg["conf"][a:b], seg["cls"][a:b], str(seg["models"][i])
+        return None
+
+    def query(self, key, conf_thr=0.5, iou_thr=None):
+        """Detections of one image at an operating point; (boxes, conf, cls) or None"""
+        stored = self.get(key)
+        if stored is None:
+            return None
+        return apply_operating_point(*stored[:3], conf_thr=conf_thr, iou_thr=iou_thr)
+
+    def rethreshold(self, conf_thr=0.5, iou_thr=None):
+        """Detections per image for the whole archive at an operating point.
+
+        Returns (keys, counts, max_conf); without NMS this is a single pass
+        over the columns.
+        """
+        data = self._load()
+        n = len(data["keys"])
+        image = np.repeat(np.arange(n), np.diff(data["offsets"]))
+        keep = data["conf"] > conf_thr
+        if iou_thr:
+            for i in np.unique(image[keep]):
+                a, b = data["offsets"][i], data["offsets"][i + 1]
+                rows = a + np.flatnonzero(keep[a:b])
+                if len(rows) > 1:
+                    survivors = rows[nms(data["boxes"][rows], data["conf"][rows], iou_thr)]
+                    keep[rows] = False
+                    keep[survivors] = True
+        counts = np.bincount(image[keep], minlength=n)
+        max_conf = np.zeros(n, dtype=np.float32)
+        np.maximum.at(max_conf, image[keep], data["conf"][keep])
+        return data["keys"], counts, max_conf
+
+    def _compact_segments(self, names):
+        """Merge consecutive segments into one file named right after the newest of them"""
+        if len(names) <= 1:
+            return 0
+        by_name = dict(zip(*self._segments()))
+        data = self._merge([by_name[name] for name in names])
+        # Sorts right after the newest merged segment, so segments written meanwhile still win
+        self._write(data["keys"], data["models"], data["offsets"], data["boxes"], data["conf"], data["cls"],
+                    name=names[-1][:-len(".npz")] + "_c.npz")
+        for name in names:
+            os.remove(os.path.join(self.root, name))
+        return len(names)
+
+    def _auto_compact(self):
+        """Merge the newer segments; include the oldest (largest) once they are as large as it"""
+        # One compaction at a time across worker processes; a stale lock is taken over
+        lock = os.path.join(self.root, "compact.lock")
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if time.time() - os.path.getmtime(lock) < 60:
+                return
+            fd = os.open(lock, os.O_CREAT | os.O_WRONLY)
+        try:
+            names = self._segment_names()
+            sizes = [os.path.getsize(os.path.join(self.root, name)) for name in names]
+            self._compact_segments(names if sum(sizes[1:]) >= sizes[0] else names[1:])
+        except (FileNotFoundError, KeyError):
+            # Segments changed underneath; the next flush tries again
+            pass
+        finally:
+            os.close(fd)
+            os.remove(lock)
+
+    def compact(self):
+        """Merge every segment into one file; returns the number of segments removed"""
+        return self._compact_segments(self._segment_names())
@@ -0,0 +1,406 @@
+# src/findings_index.py
+# Columnar findings index over .outputs/patient_*.json for longitudinal and aggregate queries
+import datetime
+import glob
+import json
+import os
+import numpy as np
+
+FINDINGS_INDEX = ".outputs/findings_index.npz"
+# Records written since the last full build, one JSON line each, replayed on top of the index file
+FINDINGS_JOURNAL = ".outputs/findings_index.jsonl"
+GRID = 64           # grid cells per axis over normalized bbox centers
+NUM_TEETH = 33      # universal numbering 1-32; 0 = unknown
+EPOCH = datetime.date(2000, 1, 1)
+
+# Indexes already loaded in this process, by path
+_loaded = {}
+
+
+def patient_key(record):
+    """Stable patient identity across visits: email, else phone, else name (normalized).
+
+    The form's default name 'Patient' identifies nobody, so such records fall
+    back to their own case id.
+    """
+    for field in ("patient_email", "patient_phone", "patient_name"):
+        value = str(record.get(field) or "").strip().lower()
+        if field == "patient_phone":
+            value = "".join(ch for ch in value if ch.isdigit())
+        if value and not (field == "patient_name" and value == "patient"):
+            return f"{field.split('_')[1]}:{value}"
+    return f"id:{record.get('patient_id', '')}"
+
+
+def _record_date(record, path):
+    """Visit date as days since 2000-01-01 (analyzed_at, else the file's mtime)"""
+    try:
+        day = datetime.date.fromisoformat(str(record["analyzed_at"])[:10])
+    except (KeyError, ValueError):
+        day = datetime.date.fromtimestamp(os.path.getmtime(path)) if path else datetime.date.today()
+    return (day - EPOCH).days
+
+
+def _day_number(value):
+    if value is None or isinstance(value, (int, np.integer)):
+        return value
+    return (datetime.date.fromisoformat(str(value)[:10]) - EPOCH).days
+
+
+def _record_findings(record):
+    """(finding, image size or None) for every finding of a single-image or series record"""
+    sizes = {item.get("index"): item.get("image_size") for item in record.get("series", [])}
+    for finding in record.get("findings", []):
+        size = sizes.get(finding.get("image_index")) if sizes else record.get("image_size")
+        yield finding, size
+
+
+def record_entry(record, path=None):
+    """What the index keeps of one patient record, as a JSON-serializable dict.
+
+    Bbox centers and sizes are normalized by the image size (NaN without one).
+    """
+    findings = []
+    for finding, size in _record_findings(record):
+        x1, y1, x2, y2 = finding.get("bbox", (float("nan"),) * 4)
+        w, h = size if size else (float("nan"), float("nan"))
+        tooth = int(finding.get("tooth_id") or 0)
+        findings.append([tooth if 0 < tooth < NUM_TEETH else 0, str(finding.get("region", "")),
+                         float(finding.get("conf", 0.0)), (x1 + x2) / 2 / w, (y1 + y2) / 2 / h,
+                         (x2 - x1) / w, (y2 - y1) / h])
+    return {
+        "case": str(record.get("patient_id", os.path.basename(path or ""))),
+        "patient": patient_key(record),
+        "date": _record_date(record, path),
+        "analyzed_at": str(record.get("analyzed_at", "")),
+        "findings": findings,
+    }
+
+
+def build_findings_index(outputs_dir=".outputs", index_path=FINDINGS_INDEX, journal_path=FINDINGS_JOURNAL):
+    """Parse every patient record into a fresh index file and start a new journal (offline rebuild).
+
+    The web app never calls this: records written by /analyze reach the
+    index through record_findings(). Journal lines appended while the
+    records were being parsed are carried over to the new journal.
+    """
+    start = os.path.getsize(journal_path) if os.path.exists(journal_path) else 0
+    entries = []
+    for path in sorted(glob.glob(os.path.join(outputs_dir, "patient_*.json"))):
+        try:
+            with open(path) as f:
+                entries.append(record_entry(json.load(f), path))
+        except (OSError, ValueError):
+            continue
+    index = FindingsIndex()
+    index.apply(entries)
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    with _journal(journal_path) as journal:
+        journal.seek(start)
+        tail = journal.read()
+        index.save(index_path)
+        tmp = f"{journal_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(tail)
+        os.replace(tmp, journal_path)
+    _loaded.pop(index_path, None)
+    return index
+
+
+def record_findings(record, path=None, journal_path=FINDINGS_JOURNAL):
+    """Add a just-written patient record to the index (one journal line, replayed by every process)"""
+    line = (json.dumps(record_entry(record, path)) + "\n").encode()
+    with _journal(journal_path) as journal:
+        journal.seek(0, os.SEEK_END)
+        journal.write(line)
+
+
+class _journal:
+    """The journal file opened for appending under an exclusive lock.
+
+    A rebuild replaces the file while holding the lock, so a writer that was
+    waiting reopens the new file instead of appending to the old one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        import fcntl
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        while True:
+            self.file = open(self.path, "a+b")
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+            if os.path.exists(self.path) and os.fstat(self.file.fileno()).st_ino == os.stat(self.path).st_ino:
+                return self.file
+            self.file.close()
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+
+def load_findings_index(outputs_dir=".outputs", index_path=FINDINGS_INDEX, journal_path=FINDINGS_JOURNAL):
+    """The findings index of this process, brought up to date with the journal.
+
+    Costs two stat() calls when nothing changed; new journal lines are
+    applied incrementally, and the index file is reloaded only after an
+    offline rebuild. Without an index file one is built from the records once.
+    """
+    if not os.path.exists(index_path):
+        build_findings_index(outputs_dir, index_path, journal_path)
+    st = os.stat(index_path)
+    loaded = _loaded.get(index_path)
+    if loaded is None or loaded.stamp != (st.st_mtime_ns, st.st_size):
+        loaded = FindingsIndex(index_path)
+        loaded.stamp = (st.st_mtime_ns, st.st_size)
+        _loaded[index_path] = loaded
+    try:
+        jst = os.stat(journal_path)
+    except FileNotFoundError:
+        return loaded
+    if loaded.journal_inode != jst.st_ino:
+        # Replaying is idempotent (the latest entry of a case wins), so a new journal starts over
+        loaded.journal_inode, loaded.journal_offset = jst.st_ino, 0
+    if jst.st_size > loaded.journal_offset:
+        with open(journal_path, "rb") as f:
+            f.seek(loaded.journal_offset)
+            data = f.read(jst.st_size - loaded.journal_offset)
+        # Only complete lines; a line being written is picked up next time
+        data = data[:data.rfind(b"\n") + 1]
+        loaded.apply([json.loads(line) for line in data.splitlines() if line.strip()])
+        loaded.journal_offset += len(data)
+    return loaded
+
+
+def pack_key(patient, tooth, surface, date):
+    """int64 sort key: patient (31 bits) | tooth (8) | surface (8) | days since 2000 (16)"""
+    return ((np.asarray(patient, dtype=np.int64) << 32) | (np.asarray(tooth, dtype=np.int64) << 24)
+            | (np.asarray(surface, dtype=np.int64) << 16) | np.clip(np.asarray(date, dtype=np.int64), 0, 0xFFFF))
+
+
+def _cells(cx, cy):
+    ok = np.isfinite(cx) & np.isfinite(cy)
+    gx = np.clip((np.nan_to_num(cx) * GRID).astype(np.int64), 0, GRID - 1)
+    gy = np.clip((np.nan_to_num(cy) * GRID).astype(np.int64), 0, GRID - 1)
+    return np.where(ok, gy * GRID + gx, -1)
+
+
+class FindingsIndex:
+    """Findings of all patient records as sorted columns.
+
+    Rows are sorted by (patient, tooth, surface, date) through a packed int64
+    key, so a longitudinal query is two binary searches. Bbox centers are
+    bucketed into a GRID x GRID grid stored as CSR (cell_order, cell_offsets),
+    and per-tooth and per-tooth/surface histograms are kept for dashboards;
+    both are recomputed on first use after apply(). Every record is also
+    listed as a visit sorted by (patient, date).
+    """
+
+    COLUMNS = ("patient", "tooth", "surface", "date", "case", "conf", "cx", "cy", "bw", "bh", "key")
+    DTYPES = (np.int32, np.int16, np.int16, np.int32, np.int32, np.float32, np.float32, np.float32, np.float32,
+              np.float32, np.int64)
+    DERIVED = ("cell_order", "cell_offsets", "tooth_hist", "tooth_surface_hist")
+
+    def __init__(self, index_path=None):
+        """Load an index file, or start empty without one"""
+        self.path = index_path
+        self.stamp = None
+        self.journal_inode, self.journal_offset = None, 0
+        if index_path is None:
+            for name, dtype in zip(self.COLUMNS, self.DTYPES):
+                setattr(self, name, np.zeros(0, dtype=dtype))
+            self.cell = np.zeros(0, dtype=np.int64)
+            self.patients, self.surfaces, self.cases = [], [], []
+            self.visit_rows = np.zeros((0, 3), dtype=np.int32)
+            self._derived = False
+        else:
+            with np.load(index_path) as data:
+                for name in self.COLUMNS + ("cell",) + self.DERIVED:
+                    setattr(self, name, data[name])
+                self.patients = data["patients"].tolist()
+                self.surfaces = data["surfaces"].tolist()
+                self.cases = data["cases"].tolist()
+                self.visit_rows = data["visits"]
+            self._derived = True
+        self._patient_ids = {p: i for i, p in enumerate(self.patients)}
+        self._surface_ids = {s: i for i, s in enumerate(self.surfaces)}
+        self._case_ids = {c: i for i, c in enumerate(self.cases)}
+
+    @staticmethod
+    def _vocab_id(values, ids, value):
+        if value not in ids:
+            ids[value] = len(values)
+            values.append(value)
+        return ids[value]
+
+    def apply(self, entries):
+        """Replace the rows and visit of each entry's case with the entry (record_entry() dicts).
+
+        Entries are applied in order and the latest one of a case wins, so
+        replaying an entry twice changes nothing. Cost is one pass over the
+        columns to drop the cases' old rows plus a sorted insert of the new ones.
+        """
+        latest = {}
+        for entry in entries:
+            latest[entry["case"]] = entry
+        if not latest:
+            return
+        new = sorted(latest.values(), key=lambda e: (e["date"], e["analyzed_at"]))
+        cases = np.array([self._vocab_id(self.cases, self._case_ids, e["case"]) for e in new], dtype=np.int32)
+        patients = [self._vocab_id(self.patients, self._patient_ids, e["patient"]) for e in new]
+
+        rows = [(p, f[0], self._vocab_id(self.surfaces, self._surface_ids, f[1]), e["date"], c, *f[2:])
+                for e, p, c in zip(new, patients, cases.tolist()) for f in e["findings"]]
+        added = {name: np.array([r[i] for r in rows], dtype=dtype)
+                 for i, (name, dtype) in enumerate(zip(self.COLUMNS[:-1], self.DTYPES[:-1]))}
+        added["key"] = pack_key(added["patient"], added["tooth"], added["surface"], added["date"])
+        order = np.argsort(added["key"], kind="stable")
+        added = {k: v[order] for k, v in added.items()}
+        added["cell"] = _cells(added["cx"], added["cy"])
+
+        keep = ~np.isin(self.case, cases)
+        key = self.key[keep]
+        at = np.searchsorted(key, added["key"], side="right")
+        for name in self.COLUMNS + ("cell",):
+            setattr(self, name, np.insert(getattr(self, name)[keep], at, added[name]))
+
+        # Same-day visits stay in the order they were analyzed
+        visits = self.visit_rows[~np.isin(self.visit_rows[:, 1], cases)]
+        visits = np.concatenate([visits, np.array([(p, c, e["date"]) for e, p, c in zip(new, patients, cases)],
+                                                  dtype=np.int32).reshape(-1, 3)])
+        self.visit_rows = visits[np.lexsort((visits[:, 2], visits[:, 0]))]
+        self._derived = False
+
+    def _derive(self):
+        """Grid CSR and histograms, recomputed after apply(); findings without an image size have cell -1"""
+        located = self.cell >= 0
+        self.cell_order = np.flatnonzero(located)[np.argsort(self.cell[located], kind="stable")].astype(np.int64)
+        self.cell_offsets = np.concatenate([[0], np.cumsum(np.bincount(self.cell[located],
+                                                                         minlength=GRID * GRID))]).astype(np.int64)
+        n_surfaces = max(len(self.surfaces), 1)
+        self.tooth_hist = np.bincount(self.tooth, minlength=NUM_TEETH)
+        self.tooth_surface_hist = np.bincount(self.tooth.astype(np.int64) * n_surfaces + self.surface,
+                                              minlength=NUM_TEETH * n_surfaces).reshape(NUM_TEETH, n_surfaces)
+        self._derived = True
+
+    def save(self, index_path):
+        if not self._derived:
+            self._derive()
+        tmp = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **{name: getattr(self, name) for name in self.COLUMNS + ("cell",) + self.DERIVED},
+                     patients=np.array(self.patients, dtype=str), surfaces=np.array(self.surfaces, dtype=str),
+                     cases=np.array(self.cases, dtype=str), visits=self.visit_rows)
+        os.replace(tmp, index_path)
+
+    def __len__(self):
+        return len(self.key)
+
+    def rows(self, idx):
+        """Findings at row indices as dicts"""
+        return [{
+            "patient": self.patients[self.patient[i]],
+            "case_id": self.cases[self.case[i]],
+            "tooth_id": int(self.tooth[i]),
+            "surface": self.surfaces[self.surface[i]],
+            "date": str(EPOCH + datetime.timedelta(days=int(self.date[i]))),
+            "conf": round(float(self.conf[i]), 3),
+            "center": None if self.cell[i] < 0 else [round(float(self.cx[i]), 4), round(float(self.cy[i]), 4)],
+        } for i in np.asarray(idx, dtype=np.int64)]
+
+    def _key_range(self, patient, tooth=None, surface=None):
+        lo = hi = int(patient) << 32
+        if tooth is None:
+            hi += 1 << 32
+        else:
+            lo = hi = lo | (int(tooth) << 24)
+            if surface is None:
+                hi += 1 << 24
+            else:
+                lo = hi = lo | (int(surface) << 16)
+                hi += 1 << 16
+        return np.searchsorted(self.key, lo), np.searchsorted(self.key, hi)
+
+    def history(self, patient, tooth_id=None, surface=None, since=None, until=None):
+        """A patient's findings (optionally one tooth/surface and date range) in date order.
+
+        patient is a patient_key() or a patient record.
+        """
+        if isinstance(patient, dict):
+            patient = patient_key(patient)
+        p = self._patient_ids.get(patient)
+        s = None if surface is None else self._surface_ids.get(surface)
+        if p is None or (surface is not None and s is None):
+            return []
+        a, b = self._key_range(p, tooth_id, s)
+        idx = np.arange(a, b)
+        if tooth_id is None and s is not None:
+            idx = idx[self.surface[idx] == s]
+        since, until = _day_number(since), _day_number(until)
+        if since is not None:
+            idx = idx[self.date[idx] >= since]
+        if until is not None:
+            idx = idx[self.date[idx] <= until]
+        return self.rows(idx[np.argsort(self.date[idx], kind="stable")])
+
+    def visits(self, patient):
+        """(case id, date) of every visit of a patient, oldest first"""
+        if isinstance(patient, dict):
+            patient = patient_key(patient)
+        p = self._patient_ids.get(patient)
+        if p is None:
+            return []
+        a, b = np.searchsorted(self.visit_rows[:, 0], [p, p + 1])
+        return [(self.cases[c], str(EPOCH + datetime.timedelta(days=int(d)))) for _, c, d in self.visit_rows[a:b]]
+
+    def in_region(self, x1, y1, x2, y2, tooth_id=None):
+        """Row indices whose normalized bbox center falls inside the rectangle (grid lookup)"""
+        if not self._derived:
+            self._derive()
+        gx1, gy1 = max(int(x1 * GRID), 0), max(int(y1 * GRID), 0)
+        gx2, gy2 = min(int(x2 * GRID), GRID - 1), min(int(y2 * GRID), GRID - 1)
+        if gx1 > gx2 or gy1 > gy2:
+            return np.zeros(0, dtype=np.int64)
+        cells = (np.arange(gy1, gy2 + 1)[:, None] * GRID + np.arange(gx1, gx2 + 1)[None, :]).ravel()
+        starts, ends = self.cell_offsets[cells], self.cell_offsets[cells + 1]
+        counts = ends - starts
+        idx = self.cell_order[np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+        keep = (self.cx[idx] >= x1) & (self.cx[idx] <= x2) & (self.cy[idx] >= y1) & (self.cy[idx] <= y2)
+        if tooth_id is not None:
+            keep &= self.tooth[idx] == tooth_id
+        return np.sort(idx[keep])
+
+    def heatmap(self, since=None, until=None):
+        """GRID x GRID counts of bbox centers (clinic-wide), optionally within a date range"""
+        keep = self.cell >= 0
+        since, until = _day_number(since), _day_number(until)
+        if since is not None:
+            keep &= self.date >= since
+        if until is not None:
+            keep &= self.date <= until
+        return np.bincount(self.cell[keep], minlength=GRID * GRID).reshape(GRID, GRID)
+
+    def tooth_counts(self, since=None, until=None, by_surface=False):
+        """Findings per tooth (precomputed unless a date range is given)"""
+        if not self._derived:
+            self._derive()
+        if since is None and until is None:
+            hist = self.tooth_surface_hist if by_surface else self.tooth_hist
+        else:
+            since, until = _day_number(since), _day_number(until)
+            keep = np.ones(len(self), dtype=bool)
+            if since is not None:
+                keep &= self.date >= since
+            if until is not None:
+                keep &= self.date <= until
+            n_surfaces = max(len(self.surfaces), 1)
+            if by_surface:
+                hist = np.bincount(self.tooth[keep].astype(np.int64) * n_surfaces + self.surface[keep],
+                                   minlength=NUM_TEETH * n_surfaces).reshape(NUM_TEETH, n_surfaces)
+            else:
+                hist = np.bincount(self.tooth[keep], minlength=NUM_TEETH)
+        if by_surface:
+            return {t: {s: int(hist[t, j]) for j, s in enumerate(self.surfaces) if hist[t, j]}
+                    for t in range(1, NUM_TEETH) if hist[t].any()}
+        return {t: int(hist[t]) for t in range(1, NUM_TEETH) if hist[t]}
+
@@ -0,0 +1,269 @@
+# src/image_cache.py
+# Pre-decoded, memory-mapped training image cache (decode + resize once, read zero-copy)
+import hashlib
+import os
+import numpy as np
+
+IMG_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def label_path_for(img_path):
+    """YOLO convention: .../images/<split>/x.jpg -> .../labels/<split>/x.txt"""
+    sa, sb = f"{os.sep}images{os.sep}", f"{os.sep}labels{os.sep}"
+    return sb.join(img_path.rsplit(sa, 1)).rsplit('.', 1)[0] + '.txt'
+
+
+def cache_prefix_for(image_dir, imgsz):
+    """Where the cache for an image directory lives, e.g. data/images/train_640.imgcache"""
+    return f"{os.path.normpath(image_dir)}_{imgsz}.imgcache"
+
+
+def _fingerprint(img_files, imgsz, interpolation):
+    """Hash of every image/label path, size and mtime plus the resize settings"""
+    h = hashlib.sha1(f"{imgsz}:{interpolation}".encode())
+    for f in img_files:
+        for p in (f, label_path_for(f)):
+            try:
+                st = os.stat(p)
+                h.update(f"{p}:{st.st_size}:{st.st_mtime_ns}".encode())
+            except FileNotFoundError:
+                h.update(f"{p}:missing".encode())
+    return h.hexdigest()
+
+
+def _read_labels(label_path):
+    """(N, 5) float32 array of class, cx, cy, w, h"""
+    if not os.path.exists(label_path) or os.path.getsize(label_path) == 0:
+        return np.zeros((0, 5), dtype=np.float32)
+    return np.loadtxt(label_path, ndmin=2, dtype=np.float32).reshape(-1, 5)
+
+
+def _resized_shape(h0, w0, imgsz):
+    """Long side to imgsz, aspect kept (same rule as ultralytics load_image)"""
+    r = imgsz / max(h0, w0)
+    if r == 1:
+        return h0, w0
+    return min(int(np.ceil(h0 * r)), imgsz), min(int(np.ceil(w0 * r)), imgsz)
+
+
+def build_image_cache(img_files, cache_prefix, imgsz=640, augment=True, force=False):
+    """Decode and resize every image once into <prefix>.u8 with an index in <prefix>.npz.
+
+    Images are stored BGR uint8, resized so the long side equals imgsz, exactly as
+    ultralytics would produce them each epoch. Images that cannot be decoded are
+    reported and left out (ImageCache.unreadable), so the data loader handles
+    them as it would without a cache. Returns the opened ImageCache; an
+    existing cache is reused unless any image, label or setting changed.
+
+    Processes building the same prefix (parallel sweep trials) take turns on an
+    exclusive lock on <prefix>.lock, so only the first one builds and the others
+    reuse its result. Both files are written under process-unique tmp names
+    and moved into place while the lock is held, so the .u8 and .npz that a
+    caller opens always belong together.
+    """
+    import fcntl
+
+    os.makedirs(os.path.dirname(cache_prefix) or ".", exist_ok=True)
+    with open(cache_prefix + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return _build_image_cache(sorted(img_files), cache_prefix, imgsz, augment, force)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _build_image_cache(img_files, cache_prefix, imgsz, augment, force):
+    import cv2
+    from PIL import Image
+
+    interpolation = "linear" if augment else "area"
+    fingerprint = _fingerprint(img_files, imgsz, interpolation)
+
+    if not force and os.path.exists(cache_prefix + ".npz") and os.path.exists(cache_prefix + ".u8"):
+        cache = ImageCache(cache_prefix)
+        if cache.fingerprint == fingerprint:
+            return cache
+        cache.close()
+        print(f"♻️  Source images or labels changed, rebuilding {cache_prefix}")
+
+    # First pass reads only headers to size the memory map; unreadable images are left out
+    orig_shapes = np.zeros((len(img_files), 2), dtype=np.int32)
+    shapes = np.zeros((len(img_files), 3), dtype=np.int32)
+    ok = np.ones(len(img_files), dtype=bool)
+    for i, f in enumerate(img_files):
+        try:
+            with Image.open(f) as im:
+                w0, h0 = im.size
+        except (OSError, ValueError):
+            ok[i] = False
+            continue
+        orig_shapes[i] = (h0, w0)
+        shapes[i] = (*_resized_shape(h0, w0, imgsz), 3)
+    sizes = shapes.prod(axis=1).astype(np.int64)
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+
+    tmp = f"{cache_prefix}.u8.{os.getpid()}.tmp"
+    data = np.memmap(tmp, dtype=np.uint8, mode="w+", shape=(max(int(sizes.sum()), 1),))
+    interp = cv2.INTER_LINEAR if augment else cv2.INTER_AREA
+    for i, f in enumerate(img_files):
+        im = cv2.imread(f) if ok[i] else None
+        if im is None:
+            # A header PIL can read is no guarantee OpenCV can decode the pixels
+            ok[i] = False
+            continue
+        h, w = shapes[i][:2]
+        if im.shape[:2] != (h, w):
+            im = cv2.resize(im, (int(w), int(h)), interpolation=interp)
+        data[offsets[i]:offsets[i] + sizes[i]] = im.reshape(-1)
+    data.flush()
+    del data
+
+    unreadable = [f for f, good in zip(img_files, ok) if not good]
+    img_files = [f for f, good in zip(img_files, ok) if good]
+    labels = [_read_labels(label_path_for(f)) for f in img_files]
+    label_counts = np.array([len(l) for l in labels], dtype=np.int64)
+    index_tmp = f"{cache_prefix}.npz.{os.getpid()}.tmp"
+    with open(index_tmp, "wb") as f:
+        np.savez(
+            f,
+            files=np.array(img_files, dtype=str),
+            offsets=offsets[ok],
+            shapes=shapes[ok],
+            orig_shapes=orig_shapes[ok],
+            unreadable=np.array(unreadable, dtype=str),
+            labels=np.concatenate(labels) if labels else np.zeros((0, 5), dtype=np.float32),
+            label_offsets=np.concatenate([[0], np.cumsum(label_counts)]).astype(np.int64),
+            imgsz=np.int64(imgsz),
+            fingerprint=np.array(fingerprint),
+        )
+    os.replace(tmp, cache_prefix + ".u8")
+    os.replace(index_tmp, cache_prefix + ".npz")
+    print(f"✅ Cached {len(img_files)} images ({sizes[ok].sum() / 1e6:.1f} MB) at {cache_prefix}.u8")
+    if unreadable:
+        print(f"   ❌ Skipped {len(unreadable)} unreadable images (left to the data loader): "
+              + ", ".join(unreadable[:5]) + (" ..." if len(unreadable) > 5 else ""))
+    return ImageCache(cache_prefix)
+
+
+class ImageCache:
+    """Read-only view over a cache built by build_image_cache()"""
+
+    def __init__(self, cache_prefix):
+        self.prefix = cache_prefix
+        index = np.load(cache_prefix + ".npz")
+        self.files = [str(f) for f in index["files"]]
+        self.offsets = index["offsets"]
+        self.shapes = index["shapes"]
+        self.orig_shapes = index["orig_shapes"]
+        # Images that could not be decoded when the cache was built
+        self.unreadable = [str(f) for f in index["unreadable"]] if "unreadable" in index else []
+        self._labels = index["labels"]
+        self._label_offsets = index["label_offsets"]
+        self.imgsz = int(index["imgsz"])
+        self.fingerprint = str(index["fingerprint"])
+        self._positions = {os.path.abspath(f): i for i, f in enumerate(self.files)}
+        self.data = np.memmap(cache_prefix + ".u8", dtype=np.uint8, mode="r")
+
+    def __len__(self):
+        return len(self.files)
+
+    def index_of(self, img_path):
+        return self._positions.get(os.path.abspath(img_path))
+
+    def image(self, i):
+        """Zero-copy (h, w, 3) BGR view into the memory map"""
+        n = int(self.shapes[i].prod())
+        return self.data[self.offsets[i]:self.offsets[i] + n].reshape(self.shapes[i])
+
+    def labels(self, i):
+        return self._labels[self._label_offsets[i]:self._label_offsets[i + 1]]
+
+    def close(self):
+        self.data._mmap.close()
+
+
+def attach_image_cache(dataset, cache):
+    """Make an ultralytics dataset read images from the cache instead of decoding them"""
+    original_load_image = dataset.load_image
+
+    def load_image(i, rect_mode=True):
+        j = cache.index_of(dataset.im_files[i])
+        if j is None or not rect_mode or cache.imgsz != dataset.imgsz:
+            return original_load_image(i, rect_mode)
+        im = cache.image(j)
+        if dataset.augment:
+            # Mosaic samples partner images from this buffer
+            dataset.buffer.append(i)
+            if 1 < len(dataset.buffer) >= dataset.max_buffer_length:
+                dataset.buffer.pop(0)
+        return im, tuple(int(v) for v in cache.orig_shapes[j]), im.shape[:2]
+
+    dataset.load_image = load_image
+    return dataset
+
+
+def memoize_samples(dataset, max_mb=1024):
+    """Keep the final (letterboxed, tensorized) samples of a non-augmented dataset in memory.
+
+    Validation runs the same deterministic transforms every epoch, so after the
+    first pass each sample is served from memory. Samples beyond max_mb are
+    still transformed on every pass.
+    """
+    if dataset.augment:
+        return dataset
+    transforms = dataset.transforms
+    memo, budget = {}, [max_mb * 1024 * 1024]
+
+    def memoized(label):
+        key = label["im_file"]
+        sample = memo.get(key)
+        if sample is None:
+            sample = transforms(label)
+            size = sample["img"].numel() * sample["img"].element_size()
+            if size <= budget[0]:
+                memo[key] = sample
+                budget[0] -= size
+        # collate_fn offsets batch_idx in place, so hand out a fresh one
+        return dict(sample, batch_idx=sample["batch_idx"].clone())
+
+    dataset.transforms = memoized
+    return dataset
+
+
+def _cached_dataset(dataset, img_path, val_cache_mb):
+    image_dir = os.path.dirname(dataset.im_files[0]) if dataset.im_files else img_path
+    cache = build_image_cache(dataset.im_files, cache_prefix_for(image_dir, dataset.imgsz),
+                              imgsz=dataset.imgsz, augment=dataset.augment)
+    return memoize_samples(attach_image_cache(dataset, cache), val_cache_mb)
+
+
+def cached_trainer(val_cache_mb=1024):
+    """ultralytics DetectionTrainer whose datasets read from memory-mapped image caches.
+
+    The validation dataset additionally keeps its transformed samples in memory,
+    which makes the per-epoch validation pass cheap.
+    """
+    from ultralytics.models.yolo.detect import DetectionTrainer
+
+    class CachedDetectionTrainer(DetectionTrainer):
+        def build_dataset(self, img_path, mode="train", batch=None):
+            return _cached_dataset(super().build_dataset(img_path, mode, batch), img_path, val_cache_mb)
+
+    return CachedDetectionTrainer
+
+
+def cached_validator(val_cache_mb=1024):
+    """ultralytics DetectionValidator that reads val images from the memory-mapped cache"""
+    from ultralytics.models.yolo.detect import DetectionValidator
+
+    class CachedDetectionValidator(DetectionValidator):
+        def build_dataset(self, img_path, mode="val", batch=None):
+            return _cached_dataset(super().build_dataset(img_path, mode, batch), img_path, val_cache_mb)
+
+    return CachedDetectionValidator
+
+
+def image_files(image_dir):
+    """Image files directly inside a directory"""
+    return sorted(os.path.join(image_dir, f) for f in os.listdir(image_dir)
+                  if f.lower().endswith(IMG_EXTENSIONS))
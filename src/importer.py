@@ -0,0 +1,268 @@
+# src/importer.py
+# Stream-import downloaded dental dataset archives (YOLO, COCO, VOC, masks) into YOLO layout
+import json
+import os
+import shutil
+import tarfile
+import zipfile
+import zlib
+from collections import deque
+import numpy as np
+
+IMG_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+SPLIT_ALIASES = {'train': 'train', 'training': 'train', 'val': 'val', 'valid': 'val',
+                 'validation': 'val', 'test': 'test', 'testing': 'test'}
+MASK_DIRS = {'mask', 'masks', 'segmentation', 'segmentations', 'annotations_masks'}
+MASK_SUFFIXES = ('_mask', '-mask', '_seg', '-seg')
+
+
+def iter_archive(path):
+    """Yield (member name, readable file object) without extracting the archive.
+
+    Tar archives are read as a stream (r|*), so compressed tarballs are never
+    decompressed to disk; zip members are opened one at a time.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    with zf.open(info) as f:
+                        yield info.filename, f
+    elif os.path.isdir(path):
+        for dirpath, _, files in os.walk(path):
+            for name in sorted(files):
+                full = os.path.join(dirpath, name)
+                with open(full, 'rb') as f:
+                    yield os.path.relpath(full, path), f
+    else:
+        with tarfile.open(path, 'r|*') as tf:
+            for member in tf:
+                if member.isfile():
+                    yield member.name, tf.extractfile(member)
+
+
+def _path_split(parts):
+    """Split named by a directory in the path, or None"""
+    for part in parts:
+        if part.lower() in SPLIT_ALIASES:
+            return SPLIT_ALIASES[part.lower()]
+    return None
+
+
+def _split_of(parts, stem, val_fraction):
+    split = _path_split(parts)
+    if split:
+        return split
+    # No split in the archive: stable pseudo-random assignment by file stem
+    return 'val' if zlib.crc32(stem.encode()) % 1000 < val_fraction * 1000 else 'train'
+
+
+def _is_mask(parts, stem):
+    return any(p.lower() in MASK_DIRS for p in parts[:-1]) or stem.lower().endswith(MASK_SUFFIXES)
+
+
+def _mask_stem(stem):
+    for suffix in MASK_SUFFIXES:
+        if stem.lower().endswith(suffix):
+            return stem[:-len(suffix)]
+    return stem
+
+
+def voc_to_rows(xml_bytes):
+    """Worker: Pascal VOC XML -> (stem, [(class name, x1, y1, x2, y2)], (width, height))"""
+    import xml.etree.ElementTree as ET
+    root = ET.fromstring(xml_bytes)
+    filename = root.findtext('filename') or ''
+    size = root.find('size')
+    w = float(size.findtext('width', 0)) if size is not None else 0.0
+    h = float(size.findtext('height', 0)) if size is not None else 0.0
+    rows = []
+    for obj in root.iter('object'):
+        box = obj.find('bndbox')
+        x1, y1, x2, y2 = (float(box.findtext(k)) for k in ('xmin', 'ymin', 'xmax', 'ymax'))
+        rows.append((obj.findtext('name', 'object').strip(), x1, y1, x2, y2))
+    return os.path.splitext(os.path.basename(filename))[0], rows, (w, h)
+
+
+def mask_to_rows(task):
+    """Worker: mask image -> boxes of its connected components, one class per pixel value"""
+    import cv2
+    stem, mask_path, min_area = task
+    mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+    os.remove(mask_path)
+    if mask is None:
+        return stem, [], (0, 0)
+    h, w = mask.shape
+    rows = []
+    for value in np.unique(mask[mask > 0]):
+        n, _, stats, _ = cv2.connectedComponentsWithStats((mask == value).astype(np.uint8), connectivity=8)
+        for x, y, bw, bh, area in stats[1:]:
+            if area >= min_area:
+                rows.append((int(value), float(x), float(y), float(x + bw), float(y + bh)))
+    return stem, rows, (w, h)
+
+
+class _Pending:
+    """Pool submissions with a cap on in-flight work so memory stays bounded"""
+
+    def __init__(self, pool, limit, on_result):
+        self.pool, self.limit, self.on_result = pool, limit, on_result
+        self.queue = deque()
+
+    def submit(self, fn, arg, context=None):
+        """Run fn(arg) on the pool; on_result later gets (result, context)"""
+        self.queue.append((self.pool.apply_async(fn, (arg,)), context))
+        while len(self.queue) >= self.limit:
+            self._next()
+
+    def _next(self):
+        result, context = self.queue.popleft()
+        self.on_result(result.get(), context)
+
+    def drain(self):
+        while self.queue:
+            self._next()
+
+
+def import_archive(archive, out_root, val_fraction=0.2, mask_class='caries', min_mask_area=16,
+                   workers=None, class_names=None, mask_values_as_classes=False):
+    """Stream one archive (zip, tar[.gz|.bz2|.xz] or directory) into <out_root> in YOLO layout.
+
+    Images go straight from the archive to <out_root>/images/<split>/. YOLO txt
+    labels are passed through with their class ids mapped through the archive's
+    data.yaml names, so they match class_names from earlier archives. VOC XML,
+    COCO JSON and segmentation masks are converted to boxes, masks on a process
+    pool. Annotations are paired with images by split and file stem; an
+    annotation whose path names no split pairs with the image of that stem in
+    any split. Returns (items for the manifest, class names).
+    """
+    from multiprocessing import Pool
+    from PIL import Image
+
+    names = list(class_names or [])
+    class_id = {n: i for i, n in enumerate(names)}
+
+    def cls(name):
+        if name not in class_id:
+            class_id[name] = len(names)
+            names.append(name)
+        return class_id[name]
+
+    images = {}       # (split, source stem) -> {'name', 'path'}
+    boxes = {}        # (split or None, source stem) -> [(class, x1, y1, x2, y2)] in pixels
+    yolo_rows = {}    # (split, source stem) -> YOLO text (class ids from the archive's data.yaml)
+    sizes = {}        # (split or None, source stem) -> (w, h) from the annotation
+    coco_files = []
+    yolo_names = None
+    used = {}         # split -> output stems already taken
+    mask_dir = os.path.join(out_root, '.masks')
+    mask_count = 0
+
+    def add_boxes(result, split):
+        stem, rows, size = result
+        if rows:
+            boxes.setdefault((split, stem), []).extend(rows)
+        if size[0] and size[1]:
+            sizes[(split, stem)] = size
+
+    workers = workers or os.cpu_count() or 1
+    with Pool(workers) as pool:
+        pending = _Pending(pool, 4 * workers, add_boxes)
+        for member, f in iter_archive(archive):
+            parts = member.replace('\\', '/').split('/')
+            if any(p.startswith('.') or p == '__MACOSX' for p in parts):
+                continue
+            stem, ext = os.path.splitext(parts[-1])
+            ext = ext.lower()
+
+            if ext in IMG_EXTENSIONS and _is_mask(parts, stem):
+                # Masks are spooled to disk one at a time and deleted by the worker
+                os.makedirs(mask_dir, exist_ok=True)
+                path = os.path.join(mask_dir, f"{mask_count}{ext}")
+                mask_count += 1
+                with open(path, 'wb') as out:
+                    shutil.copyfileobj(f, out)
+                pending.submit(mask_to_rows, (_mask_stem(stem), path, min_mask_area), _path_split(parts[:-1]))
+            elif ext in IMG_EXTENSIONS:
+                split = _split_of(parts[:-1], stem, val_fraction)
+                split_dir = os.path.join(out_root, 'images', split)
+                if split not in used:
+                    # Earlier imports into the same dataset keep their files
+                    os.makedirs(split_dir, exist_ok=True)
+                    used[split] = {os.path.splitext(n)[0] for n in os.listdir(split_dir)}
+                name, n = parts[-1], 0
+                while os.path.splitext(name)[0] in used[split]:
+                    n += 1
+                    name = f"{parts[-2] if len(parts) > 1 else 'img'}_{n}_{parts[-1]}"
+                used[split].add(os.path.splitext(name)[0])
+                path = os.path.join(split_dir, name)
+                with open(path, 'wb') as out:
+                    shutil.copyfileobj(f, out)
+                images[(split, stem)] = {'name': name, 'path': path}
+            elif ext == '.txt' and 'labels' in [p.lower() for p in parts[:-1]]:
+                yolo_rows[(_split_of(parts[:-1], stem, val_fraction), stem)] = f.read().decode()
+            elif ext == '.xml':
+                pending.submit(voc_to_rows, f.read(), _path_split(parts[:-1]))
+            elif ext == '.json':
+                data = json.loads(f.read())
+                if isinstance(data, dict) and 'annotations' in data and 'images' in data:
+                    coco_files.append((_path_split(parts[:-1]), data))
+            elif ext in ('.yaml', '.yml') and parts[-1].lower() in ('data.yaml', 'dataset.yaml'):
+                import yaml
+                cfg = yaml.safe_load(f.read()) or {}
+                yolo_names = cfg.get('names')
+                if isinstance(yolo_names, dict):
+                    yolo_names = [yolo_names[k] for k in sorted(yolo_names)]
+        pending.drain()
+    shutil.rmtree(mask_dir, ignore_errors=True)
+
+    # COCO: absolute xywh boxes, sizes from the JSON
+    for split, data in coco_files:
+        categories = {c['id']: c['name'] for c in data.get('categories', [])}
+        by_id = {im['id']: im for im in data['images']}
+        for ann in data['annotations']:
+            im = by_id.get(ann['image_id'])
+            if im is None or 'bbox' not in ann:
+                continue
+            file_parts = im['file_name'].replace('\\', '/').split('/')
+            stem = os.path.splitext(file_parts[-1])[0]
+            key = (split or _path_split(file_parts[:-1]), stem)
+            x, y, w, h = ann['bbox']
+            boxes.setdefault(key, []).append((categories.get(ann['category_id'], 'object'), x, y, x + w, y + h))
+            sizes[key] = (im['width'], im['height'])
+
+    # YOLO pass-through: archive class ids -> ids in the combined class list
+    yolo_ids = {str(i): str(cls(name)) for i, name in enumerate(yolo_names or [])}
+
+    def remap(text):
+        rows = (line.split(None, 1) for line in text.strip().splitlines() if line.strip())
+        return "\n".join(" ".join([yolo_ids.get(row[0], row[0])] + row[1:]) for row in rows)
+
+    def class_of(c):
+        # Mask pixel values are ints; VOC/COCO give category names
+        if isinstance(c, (int, np.integer)):
+            return cls(f"{mask_class}_{c}" if mask_values_as_classes else mask_class)
+        return cls(c)
+
+    items = []
+    for (split, stem), image in images.items():
+        lines = []
+        if (split, stem) in yolo_rows:
+            lines.append(remap(yolo_rows[(split, stem)]))
+        key = (split, stem) if (split, stem) in boxes else (None, stem)
+        if key in boxes:
+            w, h = sizes.get(key) or Image.open(image['path']).size
+            rows = np.array([r[1:] for r in boxes[key]], dtype=np.float64) / [w, h, w, h]
+            rows = np.clip(rows, 0, 1)
+            ids = [class_of(r[0]) for r in boxes[key]]
+            lines += [f"{c} {(x1 + x2) / 2:.6f} {(y1 + y2) / 2:.6f} {x2 - x1:.6f} {y2 - y1:.6f}"
+                      for c, (x1, y1, x2, y2) in zip(ids, rows) if x2 > x1 and y2 > y1]
+        label = None
+        if any(lines):
+            label = os.path.join(out_root, 'labels', split, os.path.splitext(image['name'])[0] + '.txt')
+            os.makedirs(os.path.dirname(label), exist_ok=True)
+            with open(label, 'w') as out:
+                out.write("\n".join(l for l in lines if l) + "\n")
+        items.append({'image': image['path'], 'label': label, 'split': split, 'name': image['name']})
+
+    return items, names or [mask_class]
@@ -0,0 +1,234 @@
+# src/labels.py
+# Bulk YOLO label parsing, validation and a compact .npz label index
+import hashlib
+import os
+import numpy as np
+
+IMG_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Boxes may poke this far outside the image before they count as invalid
+EDGE_TOLERANCE = 0.01
+
+
+def _dataset_config(dataset_yaml):
+    import yaml
+    with open(dataset_yaml) as f:
+        return yaml.safe_load(f)
+
+
+def dataset_split_dirs(dataset_yaml):
+    """Image directories for the train/val/test splits listed in a dataset.yaml"""
+    cfg = _dataset_config(dataset_yaml)
+    root = cfg.get('path', '')
+    dirs = {}
+    for split in ('train', 'val', 'test'):
+        if cfg.get(split):
+            path = os.path.join(root, cfg[split])
+            if os.path.isdir(path):
+                dirs[split] = path
+    return dirs
+
+
+def _label_dir_for(image_dir):
+    parts = os.path.normpath(image_dir).split(os.sep)
+    if 'images' in parts:
+        parts[len(parts) - 1 - parts[::-1].index('images')] = 'labels'
+    return os.sep.join(parts)
+
+
+def _fingerprint(paths):
+    h = hashlib.sha1()
+    for p in paths:
+        st = os.stat(p)
+        h.update(f"{p}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def _parse_bulk(label_files):
+    """Read every label file and convert all numbers in one NumPy call.
+
+    Returns (rows, counts, bad) where rows is (M, 5) float32, counts the number
+    of rows per file and bad the indices of files whose token count is not a
+    multiple of five.
+    """
+    tokens, counts, bad = [], np.zeros(len(label_files), dtype=np.int64), []
+    for i, path in enumerate(label_files):
+        with open(path, 'rb') as f:
+            parts = f.read().split()
+        if len(parts) % 5:
+            bad.append(i)
+            continue
+        counts[i] = len(parts) // 5
+        tokens.extend(parts)
+    try:
+        rows = np.array(tokens, dtype=np.float32).reshape(-1, 5)
+    except ValueError:
+        # Some file has a non-numeric token; find it the slow way
+        rows, good = [], np.zeros(0, dtype=np.float32)
+        for i, path in enumerate(label_files):
+            if i in bad or counts[i] == 0:
+                continue
+            try:
+                rows.append(np.loadtxt(path, ndmin=2, dtype=np.float32).reshape(-1, 5))
+            except ValueError:
+                bad.append(i)
+                counts[i] = 0
+        rows = np.concatenate(rows) if rows else good.reshape(0, 5)
+    return rows, counts, sorted(bad)
+
+
+def validate_rows(rows, nc):
+    """Boolean masks of rows with a bad class id or out-of-range coordinates"""
+    cls = rows[:, 0]
+    bad_class = (cls != np.round(cls)) | (cls < 0) | (cls >= nc)
+    cx, cy, w, h = rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4]
+    t = EDGE_TOLERANCE
+    bad_coords = ((w <= 0) | (h <= 0) | (cx - w / 2 < -t) | (cx + w / 2 > 1 + t)
+                  | (cy - h / 2 < -t) | (cy + h / 2 > 1 + t))
+    return bad_class, bad_coords
+
+
+def build_label_index(image_dir, nc=1, index_path=None, force=False):
+    """Parse, validate and index all labels for one split.
+
+    The index is cached at <image_dir>.labels.npz and reused while no label file
+    was added, removed or modified. Returns a LabelIndex.
+    """
+    from PIL import Image
+
+    index_path = index_path or os.path.normpath(image_dir) + '.labels.npz'
+    label_dir = _label_dir_for(image_dir)
+    images = sorted(f for f in os.listdir(image_dir) if f.lower().endswith(IMG_EXTENSIONS))
+    labels = sorted(f for f in os.listdir(label_dir) if f.endswith('.txt')) if os.path.isdir(label_dir) else []
+
+    image_paths = [os.path.join(image_dir, f) for f in images]
+    label_paths = [os.path.join(label_dir, f) for f in labels]
+    fingerprint = f"{nc}:" + _fingerprint(image_paths + label_paths)
+
+    if not force and os.path.exists(index_path):
+        index = LabelIndex(index_path)
+        if index.fingerprint == fingerprint:
+            return index
+
+    # Pair images with labels by file stem
+    stems = {os.path.splitext(f)[0]: i for i, f in enumerate(images)}
+    label_stems = [os.path.splitext(f)[0] for f in labels]
+    paired = [p for p, s in zip(label_paths, label_stems) if s in stems]
+    paired_img = np.array([stems[s] for s in label_stems if s in stems], dtype=np.int64)
+    orphans = [p for p, s in zip(label_paths, label_stems) if s not in stems]
+    unlabeled = sorted(set(range(len(images))) - set(paired_img.tolist()))
+
+    rows, counts, bad_files = _parse_bulk(paired)
+    row_img = np.repeat(paired_img, counts)
+
+    # Rows grouped by image in image order
+    order = np.argsort(row_img, kind='stable')
+    rows, row_img = rows[order], row_img[order]
+    per_image = np.bincount(row_img, minlength=len(images)) if len(images) else np.zeros(0, dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(per_image)]).astype(np.int64)
+
+    bad_class, bad_coords = validate_rows(rows, nc)
+    sizes = np.zeros((len(images), 2), dtype=np.int32)
+    for i, p in enumerate(image_paths):
+        with Image.open(p) as im:
+            sizes[i] = im.size
+
+    np.savez(
+        index_path,
+        image_files=np.array(image_paths),
+        image_sizes=sizes,
+        boxes=rows,
+        offsets=offsets,
+        bad_class_rows=np.flatnonzero(bad_class),
+        bad_coord_rows=np.flatnonzero(bad_coords),
+        malformed_files=np.array([paired[i] for i in bad_files], dtype=str),
+        orphan_labels=np.array(orphans, dtype=str),
+        unlabeled_images=np.array([image_paths[i] for i in unlabeled], dtype=str),
+        fingerprint=np.array(fingerprint),
+    )
+    return LabelIndex(index_path)
+
+
+class LabelIndex:
+    """Labels of one split loaded from the .npz index"""
+
+    def __init__(self, index_path):
+        data = np.load(index_path)
+        self.path = index_path
+        self.image_files = [str(f) for f in data['image_files']]
+        self.image_sizes = data['image_sizes']
+        self.boxes = data['boxes']
+        self.offsets = data['offsets']
+        self.bad_class_rows = data['bad_class_rows']
+        self.bad_coord_rows = data['bad_coord_rows']
+        self.malformed_files = [str(f) for f in data['malformed_files']]
+        self.orphan_labels = [str(f) for f in data['orphan_labels']]
+        self.unlabeled_images = [str(f) for f in data['unlabeled_images']]
+        self.fingerprint = str(data['fingerprint'])
+
+    def __len__(self):
+        return len(self.image_files)
+
+    def labels(self, i):
+        """(N, 5) class, cx, cy, w, h rows for image i"""
+        return self.boxes[self.offsets[i]:self.offsets[i + 1]]
+
+    def pixel_boxes(self, i):
+        """(N, 4) xyxy pixel boxes for image i"""
+        rows = self.labels(i)
+        w, h = self.image_sizes[i]
+        cx, cy, bw, bh = rows[:, 1] * w, rows[:, 2] * h, rows[:, 3] * w, rows[:, 4] * h
+        return np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+
+    def errors(self):
+        """Human-readable list of problems that should block training"""
+        row_image = np.searchsorted(self.offsets, np.arange(len(self.boxes)), side='right') - 1
+        errors = [f"malformed label file: {f}" for f in self.malformed_files]
+        errors += [f"bad class id {self.boxes[r, 0]:g} in {self.image_files[row_image[r]]}"
+                   for r in self.bad_class_rows]
+        errors += [f"box out of range {[round(float(v), 3) for v in self.boxes[r, 1:]]} in {self.image_files[row_image[r]]}"
+                   for r in self.bad_coord_rows]
+        return errors
+
+    def warnings(self):
+        """Problems ultralytics tolerates but that usually mean a broken import"""
+        return ([f"label without image: {f}" for f in self.orphan_labels]
+                + [f"image without label (background): {f}" for f in self.unlabeled_images])
+
+    def stats(self):
+        """Summary numbers for dashboards and the CLI"""
+        per_image = np.diff(self.offsets)
+        return {
+            "images": len(self.image_files),
+            "boxes": int(len(self.boxes)),
+            "unlabeled_images": len(self.unlabeled_images),
+            "boxes_per_image_mean": round(float(per_image.mean()), 2) if len(per_image) else 0.0,
+            "boxes_per_image_max": int(per_image.max()) if len(per_image) else 0,
+            "box_area_mean": round(float((self.boxes[:, 3] * self.boxes[:, 4]).mean()), 4) if len(self.boxes) else 0.0,
+            "class_counts": {int(c): int(n) for c, n in zip(*np.unique(self.boxes[:, 0], return_counts=True))},
+        }
+
+
+def index_dataset(dataset_yaml, force=False):
+    """Build (or reuse) the label index for every split of a dataset"""
+    cfg = _dataset_config(dataset_yaml)
+    nc = len(cfg.get('names') or []) or int(cfg.get('nc', 1))
+    return {split: build_label_index(image_dir, nc=nc, force=force)
+            for split, image_dir in dataset_split_dirs(dataset_yaml).items()}
+
+
+def check_labels(dataset_yaml, verbose=True):
+    """Validate all labels of a dataset before training; False if any split has errors"""
+    ok = True
+    for split, index in index_dataset(dataset_yaml).items():
+        stats, errors, warnings = index.stats(), index.errors(), index.warnings()
+        ok = ok and not errors
+        if not verbose:
+            continue
+        print(f"   {split}: {stats['images']} images, {stats['boxes']} boxes, "
+              f"{len(errors)} errors, {len(warnings)} warnings")
+        for message in errors[:20]:
+            print(f"      ❌ {message}")
+        for message in warnings[:5]:
+            print(f"      ⚠️  {message}")
+    return ok
@@ -0,0 +1,197 @@
+# src/materialize.py
+# Build YOLO dataset views from a manifest with reflinks/hardlinks/symlinks instead of copies
+import csv
+import json
+import os
+import shutil
+
+IMG_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+LINK_MODES = ('reflink', 'hardlink', 'symlink', 'copy')
+FICLONE = 0x40049409  # Linux ioctl: share extents copy-on-write (btrfs, xfs, bcachefs)
+
+
+def _reflink(src, dst):
+    import fcntl
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def _symlink(src, dst):
+    os.symlink(os.path.relpath(src, os.path.dirname(dst)), dst)
+
+
+_LINKERS = {
+    'reflink': _reflink,
+    'hardlink': os.link,
+    'symlink': _symlink,
+    'copy': shutil.copy2,
+}
+
+
+def _up_to_date(src, dst):
+    try:
+        if os.path.samefile(src, dst):
+            return True
+        a, b = os.stat(src), os.stat(dst)
+    except OSError:
+        return False
+    return a.st_size == b.st_size and a.st_mtime_ns == b.st_mtime_ns
+
+
+class Linker:
+    """Places files using the cheapest method the filesystem supports.
+
+    'auto' tries reflink, hardlink, symlink, then copy, and remembers per
+    (source device, target device) which one worked so failures are paid once.
+    """
+
+    def __init__(self, mode='auto'):
+        if mode != 'auto' and mode not in LINK_MODES:
+            raise ValueError(f"unknown link mode {mode!r}; use auto or one of {', '.join(LINK_MODES)}")
+        self.mode = mode
+        self._working = {}
+        self.counts = {}
+
+    def place(self, src, dst):
+        """Make dst a view of src; returns the method used or 'unchanged'"""
+        if _up_to_date(src, dst):
+            self.counts['unchanged'] = self.counts.get('unchanged', 0) + 1
+            return 'unchanged'
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = dst + '.tmp'
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+
+        devices = (os.stat(src).st_dev, os.stat(os.path.dirname(dst)).st_dev)
+        if self.mode != 'auto':
+            candidates = [self.mode]
+        elif devices in self._working:
+            candidates = LINK_MODES[LINK_MODES.index(self._working[devices]):]
+        else:
+            candidates = LINK_MODES
+
+        for method in candidates:
+            try:
+                _LINKERS[method](src, tmp)
+            except (OSError, NotImplementedError, ImportError):
+                if self.mode != 'auto':
+                    raise
+                continue
+            os.replace(tmp, dst)
+            self._working[devices] = method
+            self.counts[method] = self.counts.get(method, 0) + 1
+            return method
+        raise OSError(f"could not place {src} at {dst}")
+
+
+def read_manifest(path):
+    """Items ({image, label, split, name}) from a CSV with a header row or a JSON list"""
+    if path.endswith('.json'):
+        with open(path) as f:
+            data = json.load(f)
+        items = data['items'] if isinstance(data, dict) else data
+    else:
+        with open(path, newline='') as f:
+            items = list(csv.DictReader(f))
+    base = os.path.dirname(os.path.abspath(path))
+    for item in items:
+        for key in ('image', 'label'):
+            # Relative paths in a manifest are relative to the manifest itself
+            if item.get(key) and not os.path.isabs(item[key]):
+                item[key] = os.path.normpath(os.path.join(base, item[key]))
+        item['label'] = item.get('label') or None
+    return items
+
+
+def write_manifest(path, items):
+    """Write items as CSV or JSON (by extension) with paths relative to the manifest"""
+    base = os.path.dirname(os.path.abspath(path))
+    rows = [{'image': os.path.relpath(i['image'], base),
+             'label': os.path.relpath(i['label'], base) if i.get('label') else '',
+             'split': i['split'],
+             'name': i.get('name') or os.path.basename(i['image'])} for i in items]
+    os.makedirs(base, exist_ok=True)
+    if path.endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump({'items': rows}, f, indent=1)
+    else:
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['image', 'label', 'split', 'name'])
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def manifest_from_dir(root, splits=None, labels=True):
+    """Items for every image under <root>/images/<split>/, with its YOLO label if present"""
+    items = []
+    images_dir = os.path.join(root, 'images')
+    for split in sorted(os.listdir(images_dir)) if os.path.isdir(images_dir) else []:
+        if splits and split not in splits:
+            continue
+        split_dir = os.path.join(images_dir, split)
+        if not os.path.isdir(split_dir):
+            continue
+        for name in sorted(os.listdir(split_dir)):
+            if not name.lower().endswith(IMG_EXTENSIONS):
+                continue
+            label = os.path.join(root, 'labels', split, os.path.splitext(name)[0] + '.txt')
+            items.append({
+                'image': os.path.join(split_dir, name),
+                'label': label if labels and os.path.exists(label) else None,
+                'split': split,
+                'name': name,
+            })
+    return items
+
+
+def materialize_dataset(items, out_root, mode='auto', label_mode='copy', clean=True):
+    """Lay out <out_root>/{images,labels}/<split>/ from manifest items.
+
+    Images are placed with `mode`. Labels default to real copies: they are tiny,
+    and tools rewrite them in place, which would write through a hardlink into
+    the source dataset. With clean=True, files in the view that are no longer in
+    the manifest are removed. Returns {method: count}.
+    """
+    images, labels = Linker(mode), Linker(label_mode)
+    wanted = set()
+    for item in items:
+        name = item.get('name') or os.path.basename(item['image'])
+        dst = os.path.join(out_root, 'images', item['split'], name)
+        images.place(item['image'], dst)
+        wanted.add(os.path.abspath(dst))
+        if item.get('label'):
+            dst = os.path.join(out_root, 'labels', item['split'], os.path.splitext(name)[0] + '.txt')
+            labels.place(item['label'], dst)
+            wanted.add(os.path.abspath(dst))
+
+    removed = 0
+    if clean:
+        for kind, exts in (('images', IMG_EXTENSIONS), ('labels', ('.txt',))):
+            kind_dir = os.path.join(out_root, kind)
+            for dirpath, _, files in os.walk(kind_dir):
+                for f in files:
+                    path = os.path.abspath(os.path.join(dirpath, f))
+                    if f.lower().endswith(exts) and path not in wanted:
+                        os.remove(path)
+                        removed += 1
+
+    counts = {f"image_{k}": v for k, v in images.counts.items()}
+    counts.update({f"label_{k}": v for k, v in labels.counts.items()})
+    if removed:
+        counts['removed'] = removed
+    return counts
+
+
+def write_dataset_yaml(out_root, splits, names):
+    """dataset.yaml for a view, listing only the splits it has"""
+    import yaml
+    config = {'path': f'./{os.path.normpath(out_root)}', 'nc': len(names), 'names': list(names)}
+    config.update({split: f'images/{split}' for split in ('train', 'val', 'test') if split in splits})
+    with open(os.path.join(out_root, 'dataset.yaml'), 'w') as f:
+        yaml.dump(config, f, default_flow_style=False)
@@ -0,0 +1,73 @@
+# src/metrics.py
+# Prometheus metrics for the analysis and chat pipelines (no-ops if prometheus_client is missing)
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# 1 ms .. 30 s covers everything from JSON writes to a cold model load
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+if PROMETHEUS_AVAILABLE:
+    STAGE_SECONDS = Histogram(
+        "dental_stage_seconds", "Time spent in each pipeline stage",
+        ["endpoint", "stage"], buckets=STAGE_BUCKETS,
+    )
+    MODEL_LOADS = Counter(
+        "dental_model_loads_total", "Model load events", ["model", "outcome"],
+    )
+    CACHE_EVENTS = Counter(
+        "dental_cache_events_total", "Cache lookups by result", ["cache", "result"],
+    )
+    SCREEN_EVENTS = Counter(
+        "dental_cascade_screens_total", "Cascade screening outcomes", ["result"],
+    )
+
+
+@contextmanager
+def stage_timer(endpoint, stage):
+    """Observe the wall time of the enclosed block as one pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if PROMETHEUS_AVAILABLE:
+            STAGE_SECONDS.labels(endpoint, stage).observe(time.perf_counter() - start)
+
+
+def record_model_load(model, outcome, seconds=None):
+    """Count a model load ('loaded', 'missing' or 'failed') and time it as a stage"""
+    if PROMETHEUS_AVAILABLE:
+        MODEL_LOADS.labels(model, outcome).inc()
+        if seconds is not None:
+            STAGE_SECONDS.labels("model", "load").observe(seconds)
+
+
+def record_cache(cache, hit):
+    """Count a cache hit or miss"""
+    if PROMETHEUS_AVAILABLE:
+        CACHE_EVENTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_screen(passed):
+    """Count an image that the cascade screen sent to full detection or skipped"""
+    if PROMETHEUS_AVAILABLE:
+        SCREEN_EVENTS.labels("detect" if passed else "skipped").inc()
+
+
+def render_metrics():
+    """Metrics in Prometheus text format, aggregated across workers in multiprocess mode"""
+    if not PROMETHEUS_AVAILABLE:
+        return b"# prometheus_client not installed\n"
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import CollectorRegistry, multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
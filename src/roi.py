@@ -0,0 +1,135 @@
+# src/roi.py
+# Cheap dental-arch region finder based on NumPy intensity and edge projections
+import numpy as np
+from PIL import Image
+
+
+def _smooth(profile, frac=0.05):
+    """Moving-average smoothing with a window proportional to the profile length"""
+    k = max(3, int(len(profile) * frac) | 1)
+    kernel = np.ones(k, dtype=np.float32) / k
+    return np.convolve(np.pad(profile, k // 2, mode="edge"), kernel, mode="valid")
+
+
+def _bright_band(profile, level=0.5, border=0.03, bridge=0.0):
+    """Contiguous run around the brightest point that stays above the given level.
+
+    The outer border is ignored so that white frames or labels burnt into the
+    edge of an exported radiograph cannot win the peak. Dips below the level
+    no longer than bridge (a fraction of the profile) do not end the run.
+    """
+    edge = int(len(profile) * border)
+    if edge:
+        profile = profile.copy()
+        profile[:edge] = profile[-edge:] = profile[edge:-edge].min()
+    lo, hi = float(profile.min()), float(profile.max())
+    if hi - lo < 1e-6:
+        return 0, len(profile)
+    above = profile >= lo + level * (hi - lo)
+    gap = int(len(profile) * bridge)
+    if gap:
+        # Close short runs of below-level samples between two above-level ones
+        idx = np.flatnonzero(above)
+        for a, b in zip(idx[:-1], idx[1:]):
+            if 1 < b - a <= gap + 1:
+                above[a:b] = True
+    peak = int(np.argmax(profile))
+    start = peak
+    while start > 0 and above[start - 1]:
+        start -= 1
+    end = peak + 1
+    while end < len(profile) and above[end]:
+        end += 1
+    return start, end
+
+
+def _expand(start, end, length, margin, min_frac):
+    """Pad a band by a margin and enforce a minimum size, clipped to [0, length]"""
+    pad = int(length * margin)
+    start, end = start - pad, end + pad
+    min_len = int(length * min_frac)
+    if end - start < min_len:
+        center = (start + end) // 2
+        start, end = center - min_len // 2, center + min_len // 2
+    return max(0, start), min(length, end)
+
+
+def _film_box(a, floor=0.1):
+    """Bounding box of the exposed film, skipping the black padding around exports"""
+    rows = np.flatnonzero(a.mean(axis=1) > floor * a.max())
+    cols = np.flatnonzero(a.mean(axis=0) > floor * a.max())
+    if not len(rows) or not len(cols):
+        return 0, 0, a.shape[1], a.shape[0]
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def _intensity_band(a, level, bridge):
+    """Rows and columns of the brightest band, used for bitewing-shaped films"""
+    y1, y2 = _bright_band(_smooth(a.mean(axis=1)), level, bridge=bridge)
+    x1, x2 = _bright_band(_smooth(a[y1:y2].mean(axis=0)), level)
+    return x1, y1, x2, y2
+
+
+def _edge_band(a, level, bridge, inset=0.05):
+    """Rows and columns dense in tooth edges, used for panoramic films.
+
+    Skull, spine and mandible are as bright as the teeth in a panoramic, so the
+    intensity peak is flat and wide there. Teeth are instead a dense row of narrow
+    vertical structures: the horizontal gradient over the central half of the
+    columns peaks on the crowns and roots, and the total gradient inside that row
+    band peaks over the arch from molar to molar.
+    """
+    h, w = a.shape
+    ix, iy = int(w * inset), int(h * inset)
+    f = a[iy:h - iy, ix:w - ix]
+    gx = np.abs(np.diff(f, axis=1))[:-1]
+    gy = np.abs(np.diff(f, axis=0))[:, :-1]
+    fw = gx.shape[1]
+    y1, y2 = _bright_band(_smooth(gx[:, fw // 4:3 * fw // 4].mean(axis=1)), level, border=0, bridge=bridge)
+    x1, x2 = _bright_band(_smooth((gx + gy)[y1:y2].mean(axis=0), 0.1), 0.8 * level, border=0, bridge=bridge)
+    return x1 + ix, y1 + iy, x2 + ix, y2 + iy
+
+
+def find_dental_arch_roi(img: Image.Image, work_width=256, level=0.5, margin=0.08, min_frac=0.3,
+                         min_area=0.1, bridge=0.1, panoramic_aspect=1.6):
+    """Return an (x1, y1, x2, y2) box around the dental arch of a dental X-ray.
+
+    The black padding of the export is trimmed first. On panoramic-shaped films
+    (width/height >= panoramic_aspect) the arch is the band densest in edges, see
+    _edge_band; on bitewings and periapicals enamel and fillings are the brightest
+    structures, so the row and column intensity projections peak on the teeth.
+    A dark row band up to bridge (a fraction of the height, the gap between open
+    upper and lower arches) is spanned so both arches are included. The margin
+    keeps the root tips that fade out of the band. Falls back to the full image
+    if no band stands out.
+    """
+    W, H = img.size
+    scale = work_width / float(W)
+    small = img.convert("L").resize((work_width, max(1, int(H * scale))), Image.BILINEAR)
+    a = np.asarray(small, dtype=np.float32)
+
+    fx1, fy1, fx2, fy2 = _film_box(a)
+    film = a[fy1:fy2, fx1:fx2]
+    h, w = film.shape
+    if min(h, w) < 16:
+        return (0, 0, W, H)
+    if w >= panoramic_aspect * h:
+        x1, y1, x2, y2 = _edge_band(film, level, bridge)
+    else:
+        x1, y1, x2, y2 = _intensity_band(film, level, bridge)
+
+    x1, x2 = _expand(x1, x2, w, margin, min_frac)
+    y1, y2 = _expand(y1, y2, h, margin, min_frac)
+    if (x2 - x1) * (y2 - y1) < min_area * a.size:
+        return (0, 0, W, H)
+
+    x1, x2, y1, y2 = x1 + fx1, x2 + fx1, y1 + fy1, y2 + fy1
+    return (int(x1 / scale), int(y1 / scale), min(W, int(round(x2 / scale))), min(H, int(round(y2 / scale))))
+
+
+def shift_detections(detections, offset_x, offset_y):
+    """Map detections from crop coordinates back to full-image coordinates"""
+    for det in detections:
+        x1, y1, x2, y2 = det["bbox"]
+        det["bbox"] = [x1 + offset_x, y1 + offset_y, x2 + offset_x, y2 + offset_y]
+    return detections
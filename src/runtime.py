@@ -0,0 +1,113 @@
+# src/runtime.py
+# Per-worker thread counts and CPU pinning for inference processes
+import os
+import sys
+
+# Effective settings of this process, filled in by configure_runtime()
+_settings = None
+
+
+def _available_cores():
+    """CPU ids this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def configure_runtime(intra_threads=None, inter_threads=None, workers=None, worker_index=None, pin=None):
+    """Set thread counts (and optionally CPU affinity) for this inference worker.
+
+    Values not passed explicitly come from INFERENCE_INTRA_THREADS,
+    INFERENCE_INTER_THREADS, INFERENCE_WORKERS and INFERENCE_PIN_CPUS. By default
+    the cores are split evenly across workers so that N workers each spawning a
+    full-size torch thread pool cannot oversubscribe the machine.
+
+    Call this before torch/onnxruntime are imported where possible: OpenMP and
+    MKL only read their thread env vars at import time.
+    """
+    global _settings
+
+    cores = _available_cores()
+    workers = workers or _env_int("INFERENCE_WORKERS", 1)
+    worker_index = worker_index if worker_index is not None else _env_int("INFERENCE_WORKER_INDEX", 0)
+    if pin is None:
+        pin = os.getenv("INFERENCE_PIN_CPUS", "false").lower() == "true"
+
+    share = max(1, len(cores) // workers)
+    intra_threads = intra_threads or _env_int("INFERENCE_INTRA_THREADS", share)
+    inter_threads = inter_threads or _env_int("INFERENCE_INTER_THREADS", 1)
+
+    # Disjoint core set for this worker
+    pinned = None
+    if pin and hasattr(os, "sched_setaffinity"):
+        start = (worker_index % workers) * share
+        pinned = cores[start:start + share] or cores
+        os.sched_setaffinity(0, pinned)
+
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(intra_threads)
+
+    _settings = {
+        "pid": os.getpid(),
+        "worker_index": worker_index,
+        "workers": workers,
+        "intra_threads": intra_threads,
+        "inter_threads": inter_threads,
+        "cores": pinned or cores,
+        "pinned": pinned is not None,
+    }
+
+    # torch may already be loaded, e.g. by a preloading gunicorn master
+    apply_torch_threads()
+    return _settings
+
+
+def runtime_settings():
+    """Current settings, configuring from the environment on first use"""
+    return _settings if _settings is not None else configure_runtime()
+
+
+def apply_torch_threads():
+    """Apply the configured thread counts to torch if it has been imported"""
+    if _settings is None or "torch" not in sys.modules:
+        return
+    torch = sys.modules["torch"]
+    torch.set_num_threads(_settings["intra_threads"])
+    try:
+        torch.set_num_interop_threads(_settings["inter_threads"])
+    except RuntimeError:
+        # Only allowed before the first parallel op; keep whatever is in place
+        pass
+
+
+def onnx_session_options():
+    """onnxruntime SessionOptions with the configured thread counts"""
+    import onnxruntime as ort
+    settings = runtime_settings()
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = settings["intra_threads"]
+    options.inter_op_num_threads = settings["inter_threads"]
+    return options
+
+
+def describe_runtime():
+    """One-line summary of the effective topology, printed at worker startup"""
+    s = runtime_settings()
+    line = f"🧵 Worker {s['worker_index'] + 1}/{s['workers']} (pid {s['pid']}): "
+    line += f"intra-op {s['intra_threads']}, inter-op {s['inter_threads']} threads, "
+    line += f"{'pinned to' if s['pinned'] else 'free on'} cores {s['cores']}"
+    if "torch" in sys.modules:
+        torch = sys.modules["torch"]
+        line += f" | torch {torch.get_num_threads()}/{torch.get_num_interop_threads()}"
+    return line
+
+
+def select_device():
+    """'cuda' if a GPU is usable, else 'cpu'; imports torch only when called"""
+    import torch
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
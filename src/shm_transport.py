@@ -0,0 +1,264 @@
+# src/shm_transport.py
+# Shared-memory ring of image slots for handing decoded images to inference worker processes
+import itertools
+import queue
+import threading
+from concurrent.futures import Future
+import numpy as np
+
+# Largest RGB image a slot holds; bigger ones are pickled through the task queue instead
+SLOT_PIXELS = 4096 * 2048
+# Seconds submit() waits for a free slot before giving up
+SLOT_TIMEOUT = 30.0
+
+
+class HandlerError(RuntimeError):
+    """The handler raised in the worker; the worker itself is still running"""
+
+
+class WorkerLost(RuntimeError):
+    """The worker holding a task exited, or the pool closed, before the result came back"""
+
+
+class ImageRing:
+    """Fixed-size uint8 image slots in one SharedMemory block.
+
+    The creating process owns the block and hands slots out with acquire()
+    and back with release(); workers attach by name and view a slot as a
+    NumPy array without copying it.
+    """
+
+    def __init__(self, slots, slot_bytes, name=None):
+        from multiprocessing import shared_memory
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._free = queue.Queue()
+        for slot in range(slots if self.owner else 0):
+            self._free.put(slot)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def acquire(self, timeout=None):
+        """Index of a free slot, waiting up to timeout seconds (queue.Empty if none frees up)"""
+        return self._free.get(timeout=timeout)
+
+    def release(self, slot):
+        self._free.put(slot)
+
+    def view(self, slot, shape):
+        """uint8 array of the given shape backed by the slot's memory"""
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def write(self, slot, array):
+        np.copyto(self.view(slot, array.shape), array)
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _worker(ring_name, slots, slot_bytes, tasks, results, handler_factory, index, processes):
+    """Inference process: build the handler once, then run it on every slot it is sent.
+
+    results is this worker's own pipe, so a worker killed mid-write cannot
+    leave a lock held that the other workers need.
+    """
+    from src.runtime import configure_runtime
+    configure_runtime(workers=processes, worker_index=index)
+    ring = ImageRing(slots, slot_bytes, name=ring_name)
+    handler = handler_factory()
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, slot, shape, inline = task
+        try:
+            array = ring.view(slot, shape) if inline is None else inline
+            result = handler(array)
+            # The slot is reused as soon as the result is in; no view may outlive it
+            del array
+            results.send((task_id, result, None))
+        except Exception as e:
+            results.send((task_id, None, f"{type(e).__name__}: {e}"))
+    ring.close()
+
+
+def detector_handler(weights_path="weights/best.pt"):
+    """Per-worker callable: raw (boxes, conf, cls) of an RGB array, or None without a trained model"""
+    from PIL import Image
+    from src.detect import Detector, detector_settings
+    detector = Detector(weights_path, mock_ok=False, **detector_settings())
+
+    def handle(array):
+        if detector.use_mock:
+            return None
+        return detector.detect_raw(Image.fromarray(array))
+    return handle
+
+
+def image_size_handler():
+    """Per-worker callable that only turns the array into a PIL image (transport benchmark)"""
+    from PIL import Image
+    return lambda array: Image.fromarray(array).size
+
+
+class InferencePool:
+    """Inference worker processes fed through a shared-memory ring of image slots.
+
+    submit() copies a decoded image into a free slot and queues only
+    (slot, shape) to the least busy worker; the worker views the slot in
+    place, and the slot is released when its result arrives. With
+    transport="pickle" (or an image larger than a slot) the array itself goes
+    through the queue instead. Each worker has its own task queue, so when one
+    exits its queued and running tasks fail with WorkerLost, their slots are
+    released and the worker is respawned (up to max_restarts times in total).
+    handler_factory must be picklable (a module-level function or a
+    functools.partial of one) and is called once in each worker.
+    """
+
+    def __init__(self, processes=2, handler_factory=detector_handler, slots=None, slot_pixels=SLOT_PIXELS,
+                 transport="shm", max_restarts=None):
+        import multiprocessing as mp
+        self._ctx = mp.get_context("spawn")
+        self.transport = transport
+        self.processes = processes
+        self.handler_factory = handler_factory
+        self.ring = ImageRing(slots or 2 * processes, slot_pixels * 3)
+        # task id -> (future, slot, worker index)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._closing = False
+        self.restarts = 0
+        self.max_restarts = 4 * processes if max_restarts is None else max_restarts
+        self.workers, self.task_queues, self._results = [None] * processes, [None] * processes, [None] * processes
+        for index in range(processes):
+            self._spawn(index)
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _spawn(self, index):
+        tasks = self._ctx.Queue()
+        reader, writer = self._ctx.Pipe(duplex=False)
+        worker = self._ctx.Process(target=_worker, daemon=True,
+                                   args=(self.ring.name, self.ring.slots, self.ring.slot_bytes, tasks,
+                                         writer, self.handler_factory, index, self.processes))
+        worker.start()
+        # Only the worker holds the write end, so its exit shows up here as EOF
+        writer.close()
+        self.workers[index], self.task_queues[index], self._results[index] = worker, tasks, reader
+
+    def submit(self, img, timeout=SLOT_TIMEOUT):
+        """Future for the handler's result on one RGB image (PIL image or HxWx3 uint8 array).
+
+        Waits up to timeout seconds for a free slot and raises TimeoutError if
+        none frees up. The future fails with HandlerError if the handler
+        raised and with WorkerLost if its worker exited.
+        """
+        if not self._collector.is_alive():
+            raise WorkerLost("inference pool is closed or its workers exited")
+        array = np.asarray(img if isinstance(img, np.ndarray) else img.convert("RGB"), dtype=np.uint8)
+        slot, inline = None, array
+        if self.transport == "shm" and array.nbytes <= self.ring.slot_bytes:
+            try:
+                slot, inline = self.ring.acquire(timeout), None
+            except queue.Empty:
+                raise TimeoutError(f"no free image slot within {timeout} s") from None
+            self.ring.write(slot, array)
+        future = Future()
+        task_id = next(self._ids)
+        with self._lock:
+            busy = [0] * self.processes
+            for _, _, index in self._pending.values():
+                busy[index] += 1
+            live = [i for i, worker in enumerate(self.workers) if worker.is_alive()] or range(self.processes)
+            index = min(live, key=busy.__getitem__)
+            self._pending[task_id] = (future, slot, index)
+            self.task_queues[index].put((task_id, slot, array.shape, inline))
+        return future
+
+    def map(self, imgs, timeout=None):
+        """Handler results for several images, in order; submission waits for free slots, so memory stays bounded"""
+        return [f.result(timeout) for f in [self.submit(img) for img in imgs]]
+
+    def _deliver(self, message):
+        task_id, result, error = message
+        with self._lock:
+            entry = self._pending.pop(task_id, None)
+        if entry is None:
+            # Already failed as lost
+            return
+        future, slot, _ = entry
+        if slot is not None:
+            self.ring.release(slot)
+        if error:
+            future.set_exception(HandlerError(error))
+        else:
+            future.set_result(result)
+
+    def _lost(self, index):
+        """Fail the tasks of an exited worker, release their slots and start a replacement"""
+        worker = self.workers[index]
+        worker.join(timeout=1)
+        self._results[index].close()
+        self._results[index] = None
+        with self._lock:
+            lost = [self._pending.pop(t) for t, e in list(self._pending.items()) if e[2] == index]
+            self.task_queues[index].cancel_join_thread()
+            if not self._closing and self.restarts < self.max_restarts:
+                self.restarts += 1
+                self._spawn(index)
+                print(f"Inference worker {index} exited with code {worker.exitcode}, restarted it")
+        self._fail(lost, f"inference worker {index} exited with code {worker.exitcode}")
+
+    def _collect(self):
+        from multiprocessing.connection import wait
+        while True:
+            readers = {conn: index for index, conn in enumerate(self._results) if conn is not None}
+            if not readers:
+                self._fail_pending("inference pool closed" if self._closing else "all inference workers exited")
+                break
+            for conn in wait(list(readers)):
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    self._lost(readers[conn])
+                else:
+                    self._deliver(message)
+
+    def _fail(self, entries, reason):
+        for future, slot, _ in entries:
+            if slot is not None:
+                self.ring.release(slot)
+            if not future.done():
+                future.set_exception(WorkerLost(reason))
+
+    def _fail_pending(self, reason):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        self._fail(pending.values(), reason)
+
+    def close(self):
+        self._closing = True
+        for tasks in self.task_queues:
+            tasks.put(None)
+        for worker in self.workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        self._collector.join(timeout=10)
+        self.ring.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,99 @@
+# src/tiling.py
+# Overlapping tile layout and box merging for high-resolution panoramic X-rays
+import math
+import numpy as np
+
+
+def _axis_starts(length, tile, stride):
+    """Start offsets along one axis so tiles cover [0, length) with the last tile flush to the edge"""
+    if length <= tile:
+        return [0]
+    n = math.ceil((length - tile) / stride) + 1
+    starts = [min(i * stride, length - tile) for i in range(n)]
+    return sorted(set(starts))
+
+
+def tile_grid(img_size, tile_size=640, overlap=0.2, max_tiles=None):
+    """Return (x1, y1, x2, y2) windows covering the image with the given overlap.
+
+    If the grid would exceed max_tiles, the tile size is grown until it fits;
+    the detector resizes every tile to its input size anyway.
+    """
+    W, H = img_size
+    tile = int(tile_size)
+    while True:
+        stride = max(1, int(tile * (1.0 - overlap)))
+        xs = _axis_starts(W, min(tile, W), stride)
+        ys = _axis_starts(H, min(tile, H), stride)
+        if not max_tiles or len(xs) * len(ys) <= max_tiles or tile >= max(W, H):
+            break
+        tile = int(tile * 1.25) + 1
+
+    tw, th = min(tile, W), min(tile, H)
+    return [(x, y, x + tw, y + th) for y in ys for x in xs]
+
+
+def box_iou(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy arrays"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    wh = np.clip(rb - lt, 0, None)
+    inter = wh[..., 0] * wh[..., 1]
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def nms(boxes, scores, iou_thr=0.5):
+    """Greedy non-maximum suppression; returns kept indices sorted by score"""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    order = np.argsort(-scores)
+    iou = box_iou(boxes[order], boxes[order])
+    suppressed = np.zeros(len(order), dtype=bool)
+    keep = []
+    for i in range(len(order)):
+        if suppressed[i]:
+            continue
+        keep.append(order[i])
+        suppressed |= iou[i] > iou_thr
+    return np.asarray(keep, dtype=np.int64)
+
+
+def weighted_boxes_fusion(boxes, scores, iou_thr=0.55):
+    """Fuse overlapping boxes into score-weighted averages instead of dropping them"""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    if len(boxes) == 0:
+        return boxes, scores
+
+    order = np.argsort(-scores)
+    iou = box_iou(boxes[order], boxes[order])
+    assigned = np.zeros(len(order), dtype=bool)
+    fused_boxes, fused_scores = [], []
+    for i in range(len(order)):
+        if assigned[i]:
+            continue
+        members = (~assigned) & (iou[i] > iou_thr)
+        members[i] = True
+        assigned |= members
+        idx = order[members]
+        w = scores[idx]
+        fused_boxes.append((boxes[idx] * w[:, None]).sum(axis=0) / w.sum())
+        fused_scores.append(w.mean())
+    return np.stack(fused_boxes), np.asarray(fused_scores, dtype=np.float32)
+
+
+def merge_detections(boxes, scores, method="nms", iou_thr=0.5):
+    """Merge duplicate boxes from overlapping tiles with NMS or WBF"""
+    if method == "wbf":
+        return weighted_boxes_fusion(boxes, scores, iou_thr)
+    keep = nms(boxes, scores, iou_thr)
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    return boxes[keep], scores[keep]
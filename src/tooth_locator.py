@@ -0,0 +1,209 @@
+# src/tooth_locator.py
+# Per-image tooth boxes (tooth model, or a layout fitted to the dental arch) and lesion-to-tooth assignment
+import os
+import numpy as np
+from PIL import Image
+from src.roi import find_dental_arch_roi, _smooth
+
+# YOLO model trained on one box per tooth; class i is Universal tooth i + 1
+TOOTH_WEIGHTS = "weights/teeth.pt"
+# Located tooth boxes per image SHA-1 (a DetectionStore; cls is the Universal id - 1)
+TOOTH_STORE = ".outputs/teeth"
+
+# Relative mesio-distal crown widths, third molar to central incisor
+UPPER_WIDTHS = np.array([0.90, 1.00, 1.05, 0.70, 0.72, 0.80, 0.68, 0.88], dtype=np.float32)
+LOWER_WIDTHS = np.array([1.00, 1.05, 1.12, 0.72, 0.70, 0.68, 0.58, 0.53], dtype=np.float32)
+
+# Universal ids of the layout boxes from image left to right (patient's right is on the left)
+UPPER_IDS = np.arange(1, 17)
+LOWER_IDS = np.arange(32, 16, -1)
+# Share of the arch band height added above and below it for the root tips
+ROOT_MARGIN = 0.2
+
+
+def _edges(widths, x1, x2):
+    """Tooth boundaries across [x1, x2] for one arch, mirrored around the midline"""
+    full = np.concatenate([widths, widths[::-1]])
+    return x1 + (x2 - x1) * np.concatenate([[0], np.cumsum(full)]) / full.sum()
+
+
+def occlusal_curve(img, roi, strips=12, work_width=256):
+    """Quadratic fit (coefficients of y over x, full-image pixels) of the gap between the arches.
+
+    The occlusal plane is the darkest row band in the middle of the arch
+    region; it is found per vertical strip of a downsampled copy and a
+    parabola is fitted so a tilted or smiling plane is followed.
+    Returns None when the region is featureless.
+    """
+    x1, y1, x2, y2 = roi
+    scale = work_width / float(max(1, x2 - x1))
+    crop = img.crop(roi).convert("L")
+    small = np.asarray(crop.resize((work_width, max(8, int((y2 - y1) * scale))), Image.BILINEAR),
+                       dtype=np.float32)
+    if small.std() < 1e-3:
+        return None
+    h = small.shape[0]
+    lo, hi = int(h * 0.3), int(h * 0.7)
+    xs, ys = [], []
+    for strip in np.array_split(np.arange(work_width), strips):
+        profile = _smooth(small[:, strip].mean(axis=1))
+        xs.append(x1 + (strip.mean() + 0.5) / scale)
+        ys.append(y1 + (lo + int(np.argmin(profile[lo:hi])) + 0.5) / scale)
+    return np.polyfit(xs, ys, 2)
+
+
+def crown_profiles(img, roi, curve, crown=0.45, work_width=512):
+    """Column intensity profiles (upper, lower) of the crown bands next to the occlusal curve.
+
+    Each band covers the given share of the arch height on its side of the
+    curve. Crowns are bright and the interproximal gaps between them dark, so
+    tooth boundaries show up as local minima; the profiles span the region width.
+    """
+    x1, y1, x2, y2 = roi
+    scale = work_width / float(max(1, x2 - x1))
+    crop = img.crop(roi).convert("L")
+    small = np.asarray(crop.resize((work_width, max(8, int((y2 - y1) * scale))), Image.BILINEAR),
+                       dtype=np.float32)
+    h = small.shape[0]
+    xs = x1 + (np.arange(work_width) + 0.5) / scale
+    split = np.clip((np.polyval(curve, xs) - y1) * scale, 1, h - 1)
+    rows = np.arange(h)[:, None]
+    upper = (rows < split) & (rows >= split * (1 - crown))
+    lower = (rows >= split) & (rows < split + (h - split) * crown)
+    return tuple(_smooth((small * band).sum(axis=0) / np.maximum(band.sum(axis=0), 1), 0.01)
+                 for band in (upper, lower))
+
+
+def _snap(edges, profile, reach=0.35, depth=0.1):
+    """Move inner tooth boundaries to the darkest nearby column of the profile.
+
+    A boundary only moves within reach times the narrower neighbouring tooth,
+    so boundaries never cross, and only to a real valley (deeper than depth
+    times the profile's spread); otherwise the layout position is kept.
+    """
+    x1, x2 = edges[0], edges[-1]
+    scale = len(profile) / max(1e-6, x2 - x1)
+    spread = float(profile.std()) + 1e-6
+    edges = edges.copy()
+    for i in range(1, len(edges) - 1):
+        r = reach * min(edges[i] - edges[i - 1], edges[i + 1] - edges[i]) * scale
+        center = (edges[i] - x1) * scale
+        lo, hi = max(0, int(np.ceil(center - r))), min(len(profile), int(center + r) + 1)
+        if hi - lo < 3:
+            continue
+        window = profile[lo:hi]
+        j = int(np.argmin(window))
+        if 0 < j < len(window) - 1 and window.mean() - window[j] > depth * spread:
+            edges[i] = x1 + (lo + j + 0.5) / scale
+    return edges
+
+
+def arch_layout(roi, curve=None, profiles=None):
+    """32 tooth boxes (float32 xyxy) and their Universal ids laid out over the arch region.
+
+    Upper teeth run from the top of the region down to the occlusal curve and
+    lower teeth from the curve to the bottom; without a curve the plane is
+    the horizontal midline of the region. With crown profiles (see
+    crown_profiles) the boundaries between teeth are snapped to interproximal gaps.
+    """
+    x1, y1, x2, y2 = roi
+    boxes = []
+    for i, (widths, upper) in enumerate(((UPPER_WIDTHS, True), (LOWER_WIDTHS, False))):
+        edges = _edges(widths, x1, x2)
+        if profiles is not None:
+            edges = _snap(edges, profiles[i])
+        centers = (edges[:-1] + edges[1:]) / 2
+        split = np.polyval(curve, centers) if curve is not None else np.full(16, (y1 + y2) / 2)
+        split = np.clip(split, y1 + 1, y2 - 1)
+        top, bottom = (np.full(16, y1), split) if upper else (split, np.full(16, y2))
+        boxes.append(np.stack([edges[:-1], top, edges[1:], bottom], axis=1))
+    return np.concatenate(boxes).astype(np.float32), np.concatenate([UPPER_IDS, LOWER_IDS])
+
+
+def containment(lesions, teeth):
+    """(L, T) share of each lesion box's area that lies inside each tooth box"""
+    lesions = np.asarray(lesions, dtype=np.float32).reshape(-1, 4)
+    teeth = np.asarray(teeth, dtype=np.float32).reshape(-1, 4)
+    l, t = lesions[:, None, :], teeth[None, :, :]
+    iw = np.clip(np.minimum(l[..., 2], t[..., 2]) - np.maximum(l[..., 0], t[..., 0]), 0, None)
+    ih = np.clip(np.minimum(l[..., 3], t[..., 3]) - np.maximum(l[..., 1], t[..., 1]), 0, None)
+    area = np.maximum((lesions[:, 2] - lesions[:, 0]) * (lesions[:, 3] - lesions[:, 1]), 1e-6)
+    return iw * ih / area[:, None]
+
+
+def assign_teeth(lesions, teeth):
+    """Index of the tooth box holding most of each lesion; the nearest tooth center if none overlaps"""
+    lesions = np.asarray(lesions, dtype=np.float32).reshape(-1, 4)
+    teeth = np.asarray(teeth, dtype=np.float32).reshape(-1, 4)
+    if not len(lesions) or not len(teeth):
+        return np.zeros(len(lesions), dtype=np.int64)
+    inside = containment(lesions, teeth)
+    best = inside.argmax(axis=1)
+    outside = inside.max(axis=1) <= 0
+    if outside.any():
+        lc = (lesions[outside, :2] + lesions[outside, 2:]) / 2
+        tc = (teeth[:, :2] + teeth[:, 2:]) / 2
+        best[outside] = ((lc[:, None, :] - tc[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    return best
+
+
+class ToothLocator:
+    """Finds the teeth of an image once, so lesions can be assigned by containment.
+
+    With TOOTH_WEIGHTS present, a YOLO model trained on individual teeth gives
+    one box per visible tooth (missing teeth simply have no box); batches of
+    images go through it in one forward pass. Otherwise the 32-tooth layout is
+    fitted to the image: the dental arch region from src.roi, the occlusal
+    curve found between the arches and the interproximal gaps along each arch,
+    so shifted or scaled panoramics still line up.
+    """
+
+    def __init__(self, weights_path=TOOTH_WEIGHTS, conf_thr=0.3):
+        self.weights_path = weights_path
+        self.conf_thr = conf_thr
+        self.model = None
+        if os.path.exists(weights_path):
+            try:
+                from ultralytics import YOLO
+                self.model = YOLO(weights_path, task="detect")
+                print(f"Loaded tooth model from {weights_path}")
+            except Exception as e:
+                print(f"Error loading tooth model: {e}, using the fitted arch layout")
+
+    def layout(self, img):
+        """(boxes, universal ids, 'layout') fitted to the image"""
+        # No margin: the layout's outer boxes should end at the last molars; the
+        # band of tooth edges stops short of the root tips, so those are added back
+        x1, y1, x2, y2 = find_dental_arch_roi(img, margin=0, min_area=0, bridge=0.1)
+        pad = ROOT_MARGIN * (y2 - y1)
+        roi = (x1, max(0, int(y1 - pad)), x2, min(img.size[1], int(round(y2 + pad))))
+        curve = occlusal_curve(img, roi)
+        profiles = crown_profiles(img, roi, curve) if curve is not None else None
+        return (*arch_layout(roi, curve, profiles), "layout")
+
+    def _from_result(self, img, result):
+        from src.detect import _result_arrays
+        boxes, conf, cls = _result_arrays(result)
+        keep = conf > self.conf_thr
+        if not keep.any():
+            return self.layout(img)
+        # One box per tooth: the most confident one
+        boxes, conf, ids = boxes[keep], conf[keep], cls[keep].astype(np.int64) + 1
+        order = np.lexsort((-conf, ids))
+        first = np.concatenate([[True], ids[order][1:] != ids[order][:-1]])
+        return boxes[order][first], ids[order][first], "model"
+
+    def locate(self, img):
+        """(boxes float32 (T, 4), universal ids (T,), source 'model' or 'layout') for one image"""
+        return self.locate_batch([img])[0]
+
+    def locate_batch(self, imgs):
+        """locate() for several images with one forward pass of the tooth model"""
+        if self.model is None:
+            return [self.layout(img) for img in imgs]
+        try:
+            results = self.model(list(imgs), verbose=False)
+            return [self._from_result(img, result) for img, result in zip(imgs, results)]
+        except Exception as e:
+            print(f"Tooth model failed: {e}, using the fitted arch layout")
+            return [self.layout(img) for img in imgs]
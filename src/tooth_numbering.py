@@ -1,115 +1,75 @@
 # src/tooth_numbering.py
-# Maps a bbox center to a tooth id using realistic tooth positions for panoramic X-rays
+# Maps lesion bboxes to tooth ids and surfaces through the tooth boxes of the image
+import numpy as np
+from src.tooth_locator import arch_layout, assign_teeth
 
-def _universal_id(idx: int) -> int:
-    """Convert grid index to Universal numbering (1-32)"""
-    return idx + 1  # 1..32
+def _fdi_id(universal: int) -> int:
+    """Convert Universal numbering (1-32) to FDI (11-18, 21-28, 31-38, 41-48)"""
+    if universal <= 8:
+        return 19 - universal          # upper right: 1 -> 18 ... 8 -> 11
+    if universal <= 16:
+        return 12 + universal          # upper left: 9 -> 21 ... 16 -> 28
+    if universal <= 24:
+        return 55 - universal          # lower left: 17 -> 38 ... 24 -> 31
+    return 16 + universal              # lower right: 25 -> 41 ... 32 -> 48
 
-def _fdi_id(idx: int) -> int:
-    """Convert grid index to FDI numbering (11-18, 21-28, 31-38, 41-48)"""
-    row = idx // 16
-    col = idx % 16
-    
-    if row == 0:  # Upper arch
-        return 11 + col if col < 8 else 21 + (col - 8)
-    else:  # Lower arch
-        return 31 + col if col < 8 else 41 + (col - 8)
-
-def _region(cx, cy, x1, y1, x2, y2, arch):
+def _region(cx, cy, x1, y1, x2, y2, arch, midline):
     """Determine tooth surface region (M/D + O/B)"""
+    # Mesial is the half of the tooth facing the midline of the arch
     mx = x1 + (x2 - x1) / 2.0
-    mesial = cx < mx
+    mesial = (cx < mx) == (mx > midline)
     md = "M" if mesial else "D"
-    
+
     # Occlusal vs Buccal/Lingual determination
-    oy = y1 + (y2 - y1) * (0.33 if arch == "upper" else 0.66)
-    occlusal = (cy < oy and arch == "upper") or (cy > oy and arch == "lower")
-    
+    oy = y1 + (y2 - y1) * (0.66 if arch == "upper" else 0.33)
+    occlusal = (cy > oy and arch == "upper") or (cy < oy and arch == "lower")
+
     return (md + "O") if occlusal else (md + "B")
 
-def grid_tooth_map(img_size, notation_system="universal"):
-    """Create a tooth locator function for the given image size and notation system"""
-    W, H = img_size
-    
-    # Create realistic tooth positions for panoramic X-rays
-    # Upper arch: 16 teeth (8 left, 8 right)
-    # Lower arch: 16 teeth (8 left, 8 right)
-    
-    # Define tooth positions as percentages of image width
-    # This creates a more realistic tooth layout for panoramic X-rays
-    tooth_positions = {
-        # Upper arch (row 0) - from left to right
-        0: (0.05, 0.15),   # Tooth 1 (upper right 3rd molar)
-        1: (0.10, 0.20),   # Tooth 2
-        2: (0.15, 0.25),   # Tooth 3
-        3: (0.20, 0.30),   # Tooth 4
-        4: (0.25, 0.35),   # Tooth 5
-        5: (0.30, 0.40),   # Tooth 6
-        6: (0.35, 0.45),   # Tooth 7
-        7: (0.40, 0.50),   # Tooth 8 (central)
-        8: (0.50, 0.60),   # Tooth 9 (central)
-        9: (0.55, 0.65),   # Tooth 10
-        10: (0.60, 0.70),  # Tooth 11
-        11: (0.65, 0.75),  # Tooth 12
-        12: (0.70, 0.80),  # Tooth 13
-        13: (0.75, 0.85),  # Tooth 14
-        14: (0.80, 0.90),  # Tooth 15
-        15: (0.85, 0.95),  # Tooth 16 (upper left 3rd molar)
-        
-        # Lower arch (row 1) - from left to right
-        16: (0.05, 0.85),  # Tooth 17 (lower left 3rd molar)
-        17: (0.10, 0.80),  # Tooth 18
-        18: (0.15, 0.75),  # Tooth 19
-        19: (0.20, 0.70),  # Tooth 20
-        20: (0.25, 0.65),  # Tooth 21
-        21: (0.30, 0.60),  # Tooth 22
-        22: (0.35, 0.55),  # Tooth 23
-        23: (0.40, 0.50),  # Tooth 24 (central)
-        24: (0.50, 0.60),  # Tooth 25 (central)
-        25: (0.55, 0.65),  # Tooth 26
-        26: (0.60, 0.70),  # Tooth 27
-        27: (0.65, 0.75),  # Tooth 28
-        28: (0.70, 0.80),  # Tooth 29
-        29: (0.75, 0.85),  # Tooth 30
-        30: (0.80, 0.90),  # Tooth 31
-        31: (0.85, 0.95),  # Tooth 32 (lower right 3rd molar)
-    }
+class ToothMap:
+    """Locator over the tooth boxes of one image.
+
+    Called with one bbox it returns (tooth_id, region) like the old grid
+    locator; assign() handles many lesions with one containment matrix.
+    """
+
+    def __init__(self, boxes, tooth_ids, notation_system="universal"):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.tooth_ids = np.asarray(tooth_ids, dtype=np.int64).reshape(-1)
+        self.notation_system = notation_system
+        self.midline = float((self.boxes[:, 0].min() + self.boxes[:, 2].max()) / 2) if len(self.boxes) else 0.0
 
-    def locator(bbox_xyxy):
+    def assign(self, bboxes):
+        """[(tooth_id, region)] for an (N, 4) array of xyxy lesion boxes"""
+        bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+        if not len(self.boxes):
+            return [(0, "MO")] * len(bboxes)
+        out = []
+        for (x1, y1, x2, y2), t in zip(bboxes.tolist(), assign_teeth(bboxes, self.boxes).tolist()):
+            universal = int(self.tooth_ids[t])
+            arch = "upper" if universal <= 16 else "lower"
+            region = _region((x1 + x2) / 2.0, (y1 + y2) / 2.0, *self.boxes[t].tolist(), arch, self.midline)
+            out.append((_fdi_id(universal) if self.notation_system == "fdi" else universal, region))
+        return out
+
+    def __call__(self, bbox_xyxy):
         """Locate tooth ID and region for a bounding box"""
-        x1, y1, x2, y2 = bbox_xyxy
-        cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
-        
-        # Normalize coordinates to percentages
-        cx_pct = cx / W
-        cy_pct = cy / H
-        
-        # Find the closest tooth position
-        min_distance = float('inf')
-        closest_tooth = 0
-        
-        for tooth_idx, (x_start, x_end) in tooth_positions.items():
-            # Calculate distance to tooth center
-            tooth_center_x = (x_start + x_end) / 2
-            distance = abs(cx_pct - tooth_center_x)
-            
-            if distance < min_distance:
-                min_distance = distance
-                closest_tooth = tooth_idx
-        
-        # Determine arch based on Y position
-        arch = "upper" if closest_tooth < 16 else "lower"
-        
-        # Get tooth position for region calculation
-        x_start, x_end = tooth_positions[closest_tooth]
-        region = _region(cx, cy, x_start * W, 0, x_end * W, H, arch)
-        
-        # Convert to appropriate numbering system
-        if notation_system == "fdi":
-            tooth_id = _fdi_id(closest_tooth)
-        else:  # universal
-            tooth_id = _universal_id(closest_tooth)
-        
-        return tooth_id, region
-    
-    return locator
+        return self.assign([bbox_xyxy])[0]
+
+def image_tooth_map(img, notation_system="universal", locator=None):
+    """ToothMap from the teeth found in this image (src.tooth_locator.ToothLocator)"""
+    if locator is None:
+        from src.tooth_locator import ToothLocator
+        locator = ToothLocator()
+    boxes, tooth_ids, _ = locator.locate(img)
+    return ToothMap(boxes, tooth_ids, notation_system)
+
+def grid_tooth_map(img_size, notation_system="universal", roi=None):
+    """Create a tooth locator from the standard 32-tooth layout, without looking at the image.
+
+    If roi (x1, y1, x2, y2) is given, e.g. from src.roi.find_dental_arch_roi,
+    tooth positions are laid out over that region instead of the whole image.
+    Prefer image_tooth_map(), which also follows the occlusal plane.
+    """
+    roi = roi if roi is not None else (0, 0, img_size[0], img_size[1])
+    return ToothMap(*arch_layout(roi), notation_system)
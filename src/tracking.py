@@ -0,0 +1,175 @@
+# src/tracking.py
+# Register a patient's radiographs across visits and track lesions between them
+import json
+import os
+import numpy as np
+from src.tiling import box_iou
+
+REGISTRATION_CACHE = ".outputs/registrations.json"
+REG_SIZE = 256          # registration runs on images downsampled to this width
+MATCH_IOU = 0.3         # lesions closer than this in aligned coordinates are the same lesion
+GROWTH = 0.2            # relative area change that counts as progression/regression
+MIN_RESPONSE = 0.05     # weaker phase-correlation peaks are noise; keep the images unaligned
+
+
+def _gray(path, grid):
+    """Grayscale, zero-mean unit-variance float32 image resampled to grid (w, h)"""
+    from PIL import Image
+    with Image.open(path) as img:
+        # JPEG decodes at reduced scale directly
+        img.draft('L', (grid[0] * 2, grid[1] * 2))
+        g = np.asarray(img.convert('L').resize(grid, Image.BILINEAR), dtype=np.float32)
+    return (g - g.mean()) / (g.std() + 1e-6)
+
+
+def register(prev_path, cur_path, size=REG_SIZE, refine=True):
+    """Affine transform (2x3) taking normalized [0, 1] coordinates of the current image to the previous one.
+
+    Both images are resampled to the same grid, so different resolutions are
+    absorbed by normalization. Phase correlation gives the translation;
+    with refine, ECC on the same downsampled images refines it to a full
+    affine warp (small rotation/scale from a different head position) and
+    falls back to the translation if it does not converge. Returns
+    (transform, score) where score is the phase-correlation peak response;
+    below MIN_RESPONSE the identity is returned.
+    """
+    import cv2
+    from PIL import Image
+    with Image.open(prev_path) as img:
+        pw, ph = img.size
+    grid = (size, max(16, round(size * ph / pw)))
+    prev, cur = _gray(prev_path, grid), _gray(cur_path, grid)
+
+    window = cv2.createHanningWindow(grid, cv2.CV_32F)
+    (dx, dy), score = cv2.phaseCorrelate(cur, prev, window)
+    if not score >= MIN_RESPONSE:
+        return np.array([[1, 0, 0], [0, 1, 0]], dtype=np.float32), float(score)
+    # prev(x) ~ cur(x - d): current pixel x sits at x + d in the previous image
+    to_prev = np.array([[1, 0, dx], [0, 1, dy]], dtype=np.float32)
+
+    if refine:
+        # ECC's warp maps template (previous) coordinates into the input (current) image
+        warp = np.array([[1, 0, -dx], [0, 1, -dy]], dtype=np.float32)
+        try:
+            criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 50, 1e-4)
+            _, warp = cv2.findTransformECC(prev, cur, warp, cv2.MOTION_AFFINE, criteria, None, 5)
+            to_prev = cv2.invertAffineTransform(warp)
+        except cv2.error:
+            pass
+
+    # Pixel grid -> normalized coordinates
+    scale = np.array([grid[0], grid[1]], dtype=np.float32)
+    normalized = to_prev.copy()
+    normalized[:, 2] /= scale
+    normalized[0, 1] *= grid[1] / grid[0]
+    normalized[1, 0] *= grid[0] / grid[1]
+    return normalized, float(score)
+
+
+def apply_transform(boxes, transform):
+    """Map normalized xyxy boxes through a 2x3 affine; returns the bounding boxes of the mapped corners"""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    if not len(boxes):
+        return boxes
+    x1, y1, x2, y2 = boxes.T
+    corners = np.stack([np.stack([x1, y1], 1), np.stack([x2, y1], 1),
+                        np.stack([x1, y2], 1), np.stack([x2, y2], 1)], axis=1)  # (N, 4, 2)
+    mapped = corners @ transform[:, :2].T + transform[:, 2]
+    return np.concatenate([mapped.min(axis=1), mapped.max(axis=1)], axis=1)
+
+
+class RegistrationCache:
+    """Registration transforms by (previous image sha1, current image sha1), persisted as JSON"""
+
+    def __init__(self, path=REGISTRATION_CACHE):
+        self.path = path
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def get(self, prev_sha1, cur_sha1):
+        entry = self._load().get(f"{prev_sha1}:{cur_sha1}")
+        return (np.array(entry["transform"], dtype=np.float32), entry["score"]) if entry else None
+
+    def put(self, prev_sha1, cur_sha1, transform, score):
+        self._load()[f"{prev_sha1}:{cur_sha1}"] = {"transform": np.round(transform, 6).tolist(), "score": score}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp, self.path)
+
+
+def match_lesions(prev_boxes, cur_boxes, iou_thr=MATCH_IOU):
+    """Greedy one-to-one matching by IoU; returns (pairs [(prev i, cur j, iou)], unmatched prev, unmatched cur)"""
+    pairs = []
+    if len(prev_boxes) and len(cur_boxes):
+        iou = box_iou(np.asarray(prev_boxes, np.float32), np.asarray(cur_boxes, np.float32))
+        for flat in np.argsort(-iou, axis=None):
+            i, j = np.unravel_index(flat, iou.shape)
+            if iou[i, j] < iou_thr:
+                break
+            if all(i != p and j != c for p, c, _ in pairs):
+                pairs.append((int(i), int(j), float(iou[i, j])))
+    matched_prev = {p for p, _, _ in pairs}
+    matched_cur = {c for _, c, _ in pairs}
+    return (pairs, [i for i in range(len(prev_boxes)) if i not in matched_prev],
+            [j for j in range(len(cur_boxes)) if j not in matched_cur])
+
+
+def _normalized(findings, size):
+    w, h = size
+    return np.array([f["bbox"] for f in findings], dtype=np.float32).reshape(-1, 4) / [w, h, w, h]
+
+
+def _area(box):
+    return max(0.0, float(box[2] - box[0])) * max(0.0, float(box[3] - box[1]))
+
+
+def track_lesions(prev, cur, cache=None, iou_thr=MATCH_IOU):
+    """Progression report between two visits.
+
+    prev and cur are dicts with image_path, image_sha1, image_size and
+    findings (patient records have all of these). Current lesions are
+    mapped into the previous image's normalized coordinates and matched by
+    IoU; each lesion is 'progressed', 'stable', 'regressed', 'new' or
+    'resolved' (seen before, not now).
+    """
+    cache = cache or RegistrationCache()
+    cached = cache.get(prev["image_sha1"], cur["image_sha1"])
+    if cached is None:
+        transform, score = register(prev["image_path"], cur["image_path"])
+        cache.put(prev["image_sha1"], cur["image_sha1"], transform, score)
+    else:
+        transform, score = cached
+
+    prev_boxes = _normalized(prev["findings"], prev["image_size"])
+    cur_boxes = apply_transform(_normalized(cur["findings"], cur["image_size"]), transform)
+    pairs, gone, new = match_lesions(prev_boxes, cur_boxes, iou_thr)
+
+    lesions = []
+    for i, j, iou in pairs:
+        p, c = prev["findings"][i], cur["findings"][j]
+        growth = _area(cur_boxes[j]) / max(_area(prev_boxes[i]), 1e-9) - 1
+        status = "progressed" if growth > GROWTH else "regressed" if growth < -GROWTH else "stable"
+        lesions.append({"status": status, "tooth_id": c.get("tooth_id"), "previous_tooth_id": p.get("tooth_id"),
+                        "iou": round(iou, 3), "area_change": round(growth, 3),
+                        "conf_change": round(c.get("conf", 0) - p.get("conf", 0), 3),
+                        "bbox": c["bbox"], "previous_bbox": p["bbox"]})
+    lesions += [{"status": "new", "tooth_id": cur["findings"][j].get("tooth_id"),
+                 "bbox": cur["findings"][j]["bbox"]} for j in new]
+    lesions += [{"status": "resolved", "tooth_id": prev["findings"][i].get("tooth_id"),
+                 "previous_bbox": prev["findings"][i]["bbox"]} for i in gone]
+
+    summary = {s: sum(1 for l in lesions if l["status"] == s)
+               for s in ("progressed", "stable", "regressed", "new", "resolved")}
+    return {"previous_case": prev.get("patient_id"), "previous_date": prev.get("analyzed_at"),
+            "registration_score": round(score, 3), "transform": np.round(transform, 4).tolist(),
+            "summary": summary, "lesions": lesions}
@@ -0,0 +1,114 @@
+# src/training.py
+# Checkpoint discovery for resumable training and per-epoch wall-time accounting
+import csv
+import glob
+import os
+import time
+
+COMPLETE_MARKER = ".complete"
+
+
+def _run_args(run_dir):
+    try:
+        import yaml
+        with open(os.path.join(run_dir, "args.yaml")) as f:
+            return yaml.safe_load(f) or {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _run_finished(run_dir, args):
+    """True if the run completed (marker) or logged as many epochs as it was asked for"""
+    if os.path.exists(os.path.join(run_dir, COMPLETE_MARKER)):
+        return True
+    try:
+        with open(os.path.join(run_dir, "results.csv")) as f:
+            done = sum(1 for _ in f) - 1
+        epochs = int(args.get("epochs", 0))
+    except (OSError, ValueError, TypeError):
+        return False
+    return epochs > 0 and done >= epochs
+
+
+def find_resumable_run(pattern="runs/train/caries_detection*", data=None):
+    """last.pt of the most recently written unfinished run matching pattern, or None.
+
+    With data, only runs that trained on that dataset.yaml qualify, since a
+    resumed run keeps the dataset it was started with.
+    """
+    candidates = []
+    for run_dir in glob.glob(pattern):
+        last = os.path.join(run_dir, "weights", "last.pt")
+        if not os.path.exists(last):
+            continue
+        args = _run_args(run_dir)
+        if data and os.path.normpath(str(args.get("data", ""))) != os.path.normpath(data):
+            continue
+        if not _run_finished(run_dir, args):
+            candidates.append((os.path.getmtime(last), last))
+    return max(candidates)[1] if candidates else None
+
+
+def mark_complete(run_dir):
+    """Record that a run finished so it is never picked up for resuming"""
+    open(os.path.join(run_dir, COMPLETE_MARKER), "w").close()
+
+
+class EpochTimer:
+    """ultralytics callbacks that split each epoch's wall time into data loading,
+    forward/backward (incl. optimizer step) and validation.
+
+    Rows are appended to <save_dir>/epoch_times.csv, so a resumed run keeps
+    extending the same file.
+    """
+
+    FIELDS = ["epoch", "data_s", "compute_s", "val_s", "other_s", "total_s"]
+
+    def __init__(self):
+        self.mark = self.epoch_start = 0.0
+        self.data = self.compute = self.val = 0.0
+
+    def on_train_start(self, trainer):
+        validate = trainer.validate
+
+        def timed_validate():
+            start = time.perf_counter()
+            try:
+                return validate()
+            finally:
+                self.val += time.perf_counter() - start
+
+        trainer.validate = timed_validate
+
+    def on_train_epoch_start(self, trainer):
+        self.epoch_start = self.mark = time.perf_counter()
+        self.data = self.compute = self.val = 0.0
+
+    def on_train_batch_start(self, trainer):
+        now = time.perf_counter()
+        self.data += now - self.mark
+        self.mark = now
+
+    def on_train_batch_end(self, trainer):
+        now = time.perf_counter()
+        self.compute += now - self.mark
+        self.mark = now
+
+    def on_fit_epoch_end(self, trainer):
+        total = time.perf_counter() - self.epoch_start
+        row = {"epoch": trainer.epoch + 1, "data_s": self.data, "compute_s": self.compute, "val_s": self.val,
+               "other_s": max(0.0, total - self.data - self.compute - self.val), "total_s": total}
+        path = os.path.join(str(trainer.save_dir), "epoch_times.csv")
+        new = not os.path.exists(path)
+        with open(path, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+            if new:
+                writer.writeheader()
+            writer.writerow({k: round(v, 3) if isinstance(v, float) else v for k, v in row.items()})
+        print(f"⏱️  epoch {row['epoch']}: data {self.data:.1f}s, fwd/bwd {self.compute:.1f}s, "
+              f"val {self.val:.1f}s, total {total:.1f}s")
+
+    def callbacks(self):
+        return {name: getattr(self, name) for name in ("on_train_start", "on_train_epoch_start",
+                                                       "on_train_batch_start", "on_train_batch_end",
+                                                       "on_fit_epoch_end")}
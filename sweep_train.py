@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Training sweep orchestrator for CPU boxes
+
+Runs a grid (or random sample) of training configurations - model size, imgsz,
+batch, augmentation preset, dataset - as parallel processes that together stay
+within a CPU and RAM budget. Trials report val mAP after every epoch; a trial
+whose best mAP falls below the median of its peers at the same epoch is pruned
+(median stopping rule). Results go to a leaderboard and the winning best.pt is
+promoted to weights/best.pt.
+
+    python3 sweep_train.py --models yolov8n.pt,yolov8s.pt --imgsz 512,640 --batch 8,16 --aug light,default
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+AUGMENTATIONS = {
+    "none": dict(mosaic=0.0, mixup=0.0, fliplr=0.0, hsv_h=0.0, hsv_s=0.0, hsv_v=0.0, degrees=0.0, scale=0.0, translate=0.0),
+    "light": dict(mosaic=0.5, mixup=0.0, fliplr=0.5, hsv_h=0.0, hsv_s=0.0, hsv_v=0.2, degrees=0.0, scale=0.2, translate=0.05),
+    "default": dict(mosaic=1.0, mixup=0.0, fliplr=0.5, hsv_h=0.015, hsv_s=0.7, hsv_v=0.4, degrees=0.0, scale=0.5, translate=0.1),
+    "heavy": dict(mosaic=1.0, mixup=0.15, fliplr=0.5, hsv_h=0.015, hsv_s=0.7, hsv_v=0.5, degrees=5.0, scale=0.6, translate=0.15),
+}
+
+# Rough resident memory per trial in GB for batch 16 at 640px; scaled by batch and imgsz
+MODEL_RAM_GB = {"n": 2.0, "s": 3.0, "m": 5.0, "l": 7.5, "x": 10.0}
+
+MAP_KEY = "metrics/mAP50-95(B)"
+MAP50_KEY = "metrics/mAP50(B)"
+
+def estimate_ram_gb(model, imgsz, batch):
+    """Crude per-trial RAM estimate used for admission; real usage is also checked via MemAvailable"""
+    size = next((s for s in "nsmlx" if os.path.splitext(os.path.basename(model))[0].endswith(s)), "n")
+    return round(1.0 + (MODEL_RAM_GB[size] - 1.0) * (batch / 16) * (imgsz / 640) ** 2, 2)
+
+def available_ram_gb():
+    """MemAvailable from /proc/meminfo, or None where that is not available"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024 ** 2
+    except OSError:
+        pass
+    return None
+
+def build_trials(args):
+    """Cartesian product of all sweep dimensions, optionally randomly subsampled"""
+    grid = itertools.product(args.models.split(","), [int(v) for v in args.imgsz.split(",")],
+                             [int(v) for v in args.batch.split(",")], args.aug.split(","), args.data.split(","))
+    trials = [{"model": m, "imgsz": i, "batch": b, "aug": a, "data": d} for m, i, b, a, d in grid]
+    if args.trials and args.trials < len(trials):
+        trials = random.Random(args.seed).sample(trials, args.trials)
+    for n, trial in enumerate(trials):
+        trial["id"] = f"t{n:02d}_{os.path.splitext(trial['model'])[0]}_{trial['imgsz']}_b{trial['batch']}_{trial['aug']}"
+        trial["ram_gb"] = estimate_ram_gb(trial["model"], trial["imgsz"], trial["batch"])
+    return trials
+
+def read_progress(trial_dir):
+    """Per-epoch metrics a worker has reported so far"""
+    path = os.path.join(trial_dir, "progress.jsonl")
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def should_prune(history, peers, warmup, min_peers):
+    """Median stopping rule: prune if our best mAP so far is below the median of
+    peers' best mAP up to the same epoch"""
+    if not history or len(history) < warmup:
+        return False
+    epoch = len(history)
+    ours = max(h["map"] for h in history)
+    others = [max(h["map"] for h in p[:epoch]) for p in peers if len(p) >= epoch]
+    return len(others) >= min_peers and ours < statistics.median(others)
+
+class Sweep:
+    def __init__(self, args, trials):
+        self.args = args
+        self.pending = list(trials)
+        self.running = {}  # id -> (trial, Popen, slot)
+        self.finished = []
+        self.n_slots = max(1, args.cpus // args.threads)
+        self.slots = list(range(self.n_slots))
+
+    def _admissible(self, trial):
+        if not self.slots:
+            return False
+        used = sum(t["ram_gb"] for t, _, _ in self.running.values())
+        if used + trial["ram_gb"] > self.args.ram_gb:
+            return False
+        free = available_ram_gb()
+        # Something else may be using the machine; keep a 10% margin on real free memory
+        return free is None or not self.running or trial["ram_gb"] <= free * 0.9
+
+    def _launch(self, trial):
+        slot = self.slots.pop(0)
+        trial_dir = os.path.join(self.args.project, trial["id"])
+        os.makedirs(trial_dir, exist_ok=True)
+        with open(os.path.join(trial_dir, "trial.json"), "w") as f:
+            json.dump(dict(trial, epochs=self.args.epochs, threads=self.args.threads, slot=slot,
+                           slots=self.n_slots, project=self.args.project), f)
+        with open(os.path.join(trial_dir, "train.log"), "w") as log:
+            proc = subprocess.Popen([sys.executable, __file__, "--worker", os.path.join(trial_dir, "trial.json")],
+                                    stdout=log, stderr=subprocess.STDOUT)
+        trial["started"] = time.time()
+        self.running[trial["id"]] = (trial, proc, slot)
+        print(f"▶️  {trial['id']} (slot {slot}, ~{trial['ram_gb']} GB)")
+
+    def _peers(self, trial_id):
+        histories = [read_progress(os.path.join(self.args.project, t["id"])) for t in self.finished
+                     if t["status"] == "done"]
+        histories += [read_progress(os.path.join(self.args.project, tid)) for tid in self.running if tid != trial_id]
+        return histories
+
+    def _poll(self):
+        for trial_id, (trial, proc, slot) in list(self.running.items()):
+            trial_dir = os.path.join(self.args.project, trial_id)
+            history = read_progress(trial_dir)
+            stop_file = os.path.join(trial_dir, "STOP")
+            if proc.poll() is None:
+                if not os.path.exists(stop_file) and should_prune(history, self._peers(trial_id),
+                                                                  self.args.prune_warmup, self.args.min_peers):
+                    open(stop_file, "w").close()
+                    print(f"✂️  Pruning {trial_id} at epoch {len(history)} (mAP {max(h['map'] for h in history):.3f})")
+                continue
+            del self.running[trial_id]
+            self.slots.append(slot)
+            self.slots.sort()
+            status = "pruned" if os.path.exists(stop_file) else ("done" if proc.returncode == 0 else "failed")
+            best = max(history, key=lambda h: h["map"]) if history else None
+            trial.update(status=status, epochs_run=len(history), minutes=round((time.time() - trial["started"]) / 60, 1),
+                         map50_95=best["map"] if best else None, map50=best["map50"] if best else None,
+                         best_pt=os.path.join(trial_dir, "weights", "best.pt"))
+            self.finished.append(trial)
+            print(f"{'✅' if status == 'done' else '⏹️ ' if status == 'pruned' else '❌'} {trial_id}: {status}, "
+                  f"mAP50-95 {trial['map50_95'] if best else '-'}")
+
+    def run(self):
+        while self.pending or self.running:
+            while self.pending and self._admissible(self.pending[0]):
+                self._launch(self.pending.pop(0))
+            if self.pending and not self.running:
+                trial = self.pending.pop(0)
+                print(f"⚠️  {trial['id']} needs ~{trial['ram_gb']} GB, over the {self.args.ram_gb} GB budget - skipped")
+                self.finished.append(dict(trial, status="skipped", map50_95=None, map50=None))
+                continue
+            self._poll()
+            time.sleep(self.args.poll)
+        return self.finished
+
+    def stop_all(self):
+        for _, proc, _ in self.running.values():
+            proc.send_signal(signal.SIGINT)
+
+def leaderboard(trials):
+    ranked = sorted(trials, key=lambda t: (t.get("map50_95") is None, -(t.get("map50_95") or 0)))
+    print(f"\n{'rank':<5}{'trial':<44}{'status':<9}{'epochs':>7}{'mAP50':>8}{'mAP50-95':>10}{'min':>7}")
+    for rank, t in enumerate(ranked, 1):
+        fmt = lambda v: f"{v:.3f}" if v is not None else "-"
+        print(f"{rank:<5}{t['id']:<44}{t['status']:<9}{t.get('epochs_run', 0):>7}{fmt(t.get('map50')):>8}"
+              f"{fmt(t.get('map50_95')):>10}{t.get('minutes', 0):>7}")
+    return ranked
+
+def promote(best, weights_dir="weights"):
+    """Copy the winning best.pt to weights/best.pt, keeping the previous model as best.prev.pt"""
+    os.makedirs(weights_dir, exist_ok=True)
+    target = os.path.join(weights_dir, "best.pt")
+    if os.path.exists(target):
+        shutil.copy2(target, os.path.join(weights_dir, "best.prev.pt"))
+    shutil.copy2(best["best_pt"], target)
+    with open(os.path.join(weights_dir, "best_sweep.json"), "w") as f:
+        json.dump(best, f, indent=2)
+    print(f"🏆 Promoted {best['id']} (mAP50-95 {best['map50_95']:.3f}) to {target}")
+
+def run_worker(trial_path):
+    """Train one trial in this process; report metrics per epoch and honour the STOP file"""
+    with open(trial_path) as f:
+        trial = json.load(f)
+    trial_dir = os.path.dirname(trial_path)
+
+    # Disjoint cores per slot so parallel trials don't fight over the same CPUs
+    from src.runtime import configure_runtime
+    configure_runtime(intra_threads=trial["threads"], workers=trial["slots"], worker_index=trial["slot"], pin=True)
+
+    def on_fit_epoch_end(trainer):
+        metrics = trainer.metrics or {}
+        with open(os.path.join(trial_dir, "progress.jsonl"), "a") as f:
+            f.write(json.dumps({"epoch": trainer.epoch + 1, "map": float(metrics.get(MAP_KEY, 0.0)),
+                                "map50": float(metrics.get(MAP50_KEY, 0.0)), "time": time.time()}) + "\n")
+        if os.path.exists(os.path.join(trial_dir, "STOP")):
+            trainer.stop = True
+
+    from train_yolo import train_model
+    train_model(model_name=trial["model"], callbacks={"on_fit_epoch_end": on_fit_epoch_end}, auto_resume=False,
+                data=trial["data"], epochs=trial["epochs"], imgsz=trial["imgsz"], batch=trial["batch"],
+                workers=min(2, trial["threads"]), project=trial["project"], name=trial["id"], exist_ok=True,
+                save_period=-1, plots=False, amp=False, **AUGMENTATIONS[trial["aug"]])
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel training sweep with pruning and model promotion")
+    parser.add_argument("--models", default="yolov8n.pt,yolov8s.pt")
+    parser.add_argument("--imgsz", default="512,640")
+    parser.add_argument("--batch", default="8,16")
+    parser.add_argument("--aug", default="light,default", help="presets: " + ",".join(AUGMENTATIONS))
+    parser.add_argument("--data", default="data/dataset.yaml", help="comma-separated dataset.yaml files to sweep over")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--trials", type=int, default=0, help="random sample of the grid (0 = full grid)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cpus", type=int, default=os.cpu_count() or 1, help="CPU budget for all trials")
+    parser.add_argument("--threads", type=int, default=2, help="CPU threads per trial")
+    parser.add_argument("--ram-gb", type=float, default=(available_ram_gb() or 8.0) * 0.8, help="RAM budget for all trials")
+    parser.add_argument("--prune-warmup", type=int, default=5, help="epochs before a trial may be pruned")
+    parser.add_argument("--min-peers", type=int, default=2, help="peers needed at an epoch to prune against")
+    parser.add_argument("--poll", type=float, default=5.0, help="seconds between progress checks")
+    parser.add_argument("--project", default=None, help="output dir (default runs/sweep/<timestamp>)")
+    parser.add_argument("--no-promote", action="store_true", help="do not copy the winner to weights/")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args.worker)
+
+    for aug in args.aug.split(","):
+        if aug not in AUGMENTATIONS:
+            parser.error(f"unknown augmentation preset {aug!r}")
+    args.project = args.project or os.path.join("runs", "sweep", time.strftime("%Y%m%d-%H%M%S"))
+    trials = build_trials(args)
+
+    print("🦷 Training Sweep")
+    print("=" * 60)
+    sweep = Sweep(args, trials)
+    print(f"🧪 {len(trials)} trials, {sweep.n_slots} in parallel "
+          f"({args.threads} threads each, {args.cpus} CPUs, {args.ram_gb:.1f} GB RAM budget)")
+    print(f"📁 {args.project}")
+
+    # Trials sharing a dataset and imgsz read the same image caches; build each once up front
+    from build_image_cache import build_dataset_caches
+    for data, imgsz in sorted({(t["data"], t["imgsz"]) for t in trials}):
+        build_dataset_caches(data, imgsz)
+
+    try:
+        finished = sweep.run()
+    except KeyboardInterrupt:
+        print("\n⏹️  Interrupted - stopping running trials")
+        sweep.stop_all()
+        finished = sweep.finished
+
+    ranked = leaderboard(finished)
+    os.makedirs(args.project, exist_ok=True)
+    with open(os.path.join(args.project, "leaderboard.json"), "w") as f:
+        json.dump(ranked, f, indent=2)
+    print(f"\n✅ Leaderboard saved: {os.path.join(args.project, 'leaderboard.json')}")
+
+    # Pruned trials stop early, so only completed ones compete for promotion
+    best = next((t for t in ranked if t["status"] == "done" and t.get("map50_95") is not None
+                 and os.path.exists(t["best_pt"])), None)
+    if best and not args.no_promote:
+        promote(best)
+    elif not best:
+        print("⚠️  No completed trial with a best.pt - nothing promoted")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
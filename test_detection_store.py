@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Detection store: raw boxes round-trip, re-threshold at query time and survive compaction
+"""
+import numpy as np
+from src.detection_store import DetectionStore, apply_operating_point
+
+BOXES = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60], [70, 70, 80, 80]], np.float32)
+CONF = np.array([0.9, 0.6, 0.3, 0.01], np.float32)
+
+def test_round_trip_and_rethreshold(tmp_path):
+    """Boxes above the floor come back as written and any operating point can be applied later"""
+    store = DetectionStore(str(tmp_path))
+    store.put("a", BOXES, CONF, cls=[0, 0, 1, 1], model="best.pt")
+    store.put("b", BOXES[:1], CONF[:1] / 2)
+    assert store.get("a") is None
+    store.flush()
+
+    boxes, conf, cls, model = store.get("a")
+    # The 0.01 box is under RAW_CONF_FLOOR and never stored
+    assert np.array_equal(boxes, BOXES[:3]) and np.allclose(conf, CONF[:3])
+    assert cls.tolist() == [0, 0, 1] and model == "best.pt"
+    assert np.allclose(store.query("a", conf_thr=0.5)[1], [0.9, 0.6])
+    # NMS at query time drops the overlapping 0.6 box
+    assert np.allclose(store.query("a", conf_thr=0.2, iou_thr=0.5)[1], [0.9, 0.3])
+    assert np.array_equal(apply_operating_point(boxes, conf, conf_thr=0.8)[0], BOXES[:1])
+
+    keys, counts, max_conf = store.rethreshold(conf_thr=0.4)
+    assert dict(zip(keys.tolist(), counts.tolist())) == {"a": 2, "b": 1}
+    assert np.allclose(max_conf, [0.9, 0.45])
+    # A fresh store sees the same segment on disk
+    assert len(DetectionStore(str(tmp_path))) == 2
+
+def test_later_writes_win_through_compaction(tmp_path):
+    """Rewritten keys return their latest boxes before and after segments are merged"""
+    store = DetectionStore(str(tmp_path), max_segments=3)
+    for i in range(6):
+        store.put(f"img{i % 2}", BOXES[:1] + i, [0.1 * (i + 1)])
+        store.flush()
+    # Auto-compaction keeps the segment count bounded
+    assert len(store._segment_names()) <= 3
+    assert np.array_equal(store.get("img0")[0], BOXES[:1] + 4)
+    assert np.allclose(store.get("img1")[1], [0.6])
+
+    store.compact()
+    assert len(store._segment_names()) == 1
+    reloaded = DetectionStore(str(tmp_path))
+    assert len(reloaded) == 2
+    assert np.array_equal(reloaded.get("img0")[0], BOXES[:1] + 4)
+    assert np.allclose(reloaded.rethreshold(conf_thr=0.55)[1], [0, 1])
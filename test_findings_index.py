@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Findings index: queries, incremental journal updates and the offline rebuild
+"""
+import json
+import numpy as np
+from src.findings_index import build_findings_index, load_findings_index, record_findings
+
+def _record(case, email, day, findings):
+    return {
+        "patient_id": case,
+        "patient_email": email,
+        "analyzed_at": f"2026-03-{day:02d}T10:00:00",
+        "image_size": [1000, 500],
+        "findings": [{"tooth_id": tooth, "region": region, "conf": conf, "bbox": bbox}
+                     for tooth, region, conf, bbox in findings],
+    }
+
+def _paths(tmp_path):
+    return str(tmp_path), str(tmp_path / "index.npz"), str(tmp_path / "index.jsonl")
+
+def _write(tmp_path, record):
+    with open(tmp_path / f"patient_{record['patient_id']}.json", "w") as f:
+        json.dump(record, f)
+
+def test_queries(tmp_path):
+    """History, visits, region and per-tooth counts over a rebuilt index"""
+    _write(tmp_path, _record("a1", "jane@example.com", 1, [(14, "MO", 0.9, [100, 100, 200, 200])]))
+    _write(tmp_path, _record("a2", "Jane@example.com", 20, [(14, "MO", 0.8, [110, 100, 210, 200]),
+                                                           (3, "DB", 0.7, [800, 300, 900, 400])]))
+    _write(tmp_path, _record("b1", "bob@example.com", 5, [(14, "DO", 0.6, [500, 250, 520, 270])]))
+    index = build_findings_index(*_paths(tmp_path))
+
+    history = index.history("email:jane@example.com", tooth_id=14)
+    assert [(f["case_id"], f["date"]) for f in history] == [("a1", "2026-03-01"), ("a2", "2026-03-20")]
+    assert index.history("email:jane@example.com", surface="DB")[0]["tooth_id"] == 3
+    assert [case for case, _ in index.visits("email:jane@example.com")] == ["a1", "a2"]
+    assert index.tooth_counts() == {3: 1, 14: 3}
+    # Only bob's finding is centered in the middle of the image
+    assert index.rows(index.in_region(0.4, 0.4, 0.6, 0.6))[0]["patient"] == "email:bob@example.com"
+    assert index.heatmap().sum() == 4
+
+def test_journal_updates_match_rebuild(tmp_path):
+    """Records added through the journal are queryable, replace earlier versions and survive a rebuild"""
+    outputs, index_path, journal_path = _paths(tmp_path)
+    _write(tmp_path, _record("a1", "jane@example.com", 1, [(14, "MO", 0.9, [100, 100, 200, 200])]))
+    assert len(load_findings_index(outputs, index_path, journal_path)) == 1
+
+    second = _record("a2", "jane@example.com", 9, [(14, "MO", 0.8, [100, 100, 200, 200])])
+    _write(tmp_path, second)
+    record_findings(second, journal_path=journal_path)
+    index = load_findings_index(outputs, index_path, journal_path)
+    assert [case for case, _ in index.visits("email:jane@example.com")] == ["a1", "a2"]
+
+    # Re-analysis of a case replaces its rows instead of adding to them
+    second["findings"] = []
+    _write(tmp_path, second)
+    record_findings(second, journal_path=journal_path)
+    index = load_findings_index(outputs, index_path, journal_path)
+    assert len(index) == 1 and index.tooth_counts() == {14: 1}
+
+    rebuilt = build_findings_index(outputs, index_path, journal_path)
+    assert np.array_equal(rebuilt.key, index.key)
+    assert rebuilt.visits("email:jane@example.com") == index.visits("email:jane@example.com")
+    assert len(load_findings_index(outputs, index_path, journal_path)) == 1
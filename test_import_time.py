@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Import-time budget for the app entry points (python -X importtime)
+"""
+import os
+import subprocess
+import sys
+
+# Cumulative import time allowed per entry point, in milliseconds
+IMPORT_BUDGET_MS = {
+    "flask_app": int(os.getenv("FLASK_APP_IMPORT_BUDGET_MS", "1000")),
+    "app": int(os.getenv("APP_IMPORT_BUDGET_MS", "500")),
+    "train_yolo": int(os.getenv("TRAIN_IMPORT_BUDGET_MS", "500")),
+    "quick_train": int(os.getenv("TRAIN_IMPORT_BUDGET_MS", "500")),
+}
+
+# Heavy modules that must only be imported on first use
+LAZY_MODULES = ["openai", "twilio", "ultralytics", "torch", "gradio", "smtplib", "email.mime", "src.detect"]
+
+def profile_import(module):
+    """Import a module in a fresh interpreter and return {module_name: cumulative_us}"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            timings[name.strip()] = int(cumulative)
+    return timings
+
+def test_entry_point_import_budget():
+    """Entry points import quickly and leave heavy dependencies for first use"""
+    for module, budget_ms in IMPORT_BUDGET_MS.items():
+        timings = profile_import(module)
+        eager = [name for name in timings
+                 if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)]
+        assert not eager, f"{module} imports {eager} eagerly"
+
+        total_ms = timings[module] / 1000
+        assert total_ms <= budget_ms, f"{module} import took {total_ms:.0f} ms (budget {budget_ms} ms)"
+        print(f"✅ {module}: {total_ms:.0f} ms (budget {budget_ms} ms)")
+
+if __name__ == "__main__":
+    test_entry_point_import_budget()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Dataset importer: class ids stay consistent across archives and annotations pair by split
+"""
+import json
+import os
+import numpy as np
+from PIL import Image
+from src.importer import import_archive
+
+def _image(path, size=(100, 50)):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new("L", size).save(path)
+
+def _labels(items, name):
+    item = next(i for i in items if i['name'] == name)
+    with open(item['label']) as f:
+        return [line.split() for line in f.read().splitlines()]
+
+def test_yolo_ids_follow_earlier_archives(tmp_path):
+    """A YOLO archive's class ids are mapped onto the names collected from earlier archives"""
+    masks = tmp_path / "masks_archive"
+    _image(str(masks / "images" / "a.png"))
+    mask = np.zeros((50, 100), np.uint8)
+    mask[10:20, 10:30] = 255
+    os.makedirs(masks / "masks")
+    Image.fromarray(mask).save(masks / "masks" / "a_mask.png")
+
+    yolo = tmp_path / "yolo_archive"
+    _image(str(yolo / "train" / "images" / "b.jpg"))
+    os.makedirs(yolo / "train" / "labels")
+    (yolo / "train" / "labels" / "b.txt").write_text("0 0.5 0.5 0.2 0.2\n1 0.2 0.2 0.1 0.1\n")
+    (yolo / "data.yaml").write_text("names: [filling, caries]\n")
+
+    out = str(tmp_path / "out")
+    items, names = import_archive(str(masks), out, workers=1)
+    assert names == ['caries'] and _labels(items, "a.png")[0][0] == "0"
+    items, names = import_archive(str(yolo), out, workers=1, class_names=names)
+    assert names == ['caries', 'filling']
+    # filling was class 0 in the archive and is class 1 in the dataset; caries is 0 in both
+    assert [row[0] for row in _labels(items, "b.jpg")] == ["1", "0"]
+    assert _labels(items, "b.jpg")[0][1:] == ["0.5", "0.5", "0.2", "0.2"]
+
+def test_coco_boxes_pair_by_split(tmp_path):
+    """Per-split COCO files do not mix boxes of images that share a stem across splits"""
+    archive = tmp_path / "coco_archive"
+    for split, size, box in (("train", (100, 50), [0, 0, 10, 10]), ("valid", (200, 100), [100, 50, 20, 20])):
+        _image(str(archive / split / "0001.jpg"), size)
+        coco = {"images": [{"id": 1, "file_name": "0001.jpg", "width": size[0], "height": size[1]}],
+                "annotations": [{"image_id": 1, "category_id": 1, "bbox": box}],
+                "categories": [{"id": 1, "name": "caries"}]}
+        (archive / split / "_annotations.coco.json").write_text(json.dumps(coco))
+
+    items, _ = import_archive(str(archive), str(tmp_path / "out"), workers=1)
+    by_split = {i['split']: i for i in items}
+    assert set(by_split) == {"train", "val"}
+    with open(by_split["train"]['label']) as f:
+        assert f.read().split() == ["0", "0.050000", "0.100000", "0.100000", "0.200000"]
+    with open(by_split["val"]['label']) as f:
+        assert f.read().split() == ["0", "0.550000", "0.600000", "0.100000", "0.200000"]
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Dental-arch ROI: the crop shrinks bundled panoramics but keeps the teeth
+"""
+import glob
+from PIL import Image
+from src.roi import find_dental_arch_roi
+
+def test_roi_shrinks_panoramics():
+    """The ROI covers well under half of each bundled panoramic and contains the incisor region"""
+    paths = sorted(glob.glob("data/images/train/*.jpg"))
+    assert paths
+    for path in paths:
+        img = Image.open(path)
+        W, H = img.size
+        x1, y1, x2, y2 = find_dental_arch_roi(img)
+        assert (x2 - x1) * (y2 - y1) < 0.35 * W * H, path
+        # Front teeth sit around the middle of a panoramic, on both sides of the occlusal plane
+        assert x1 < 0.4 * W and x2 > 0.6 * W and y1 < 0.4 * H and y2 > 0.65 * H, path
+
+def test_roi_falls_back_to_full_image():
+    """A film without any structure gives back the whole image"""
+    assert find_dental_arch_roi(Image.new("L", (400, 200), 128)) == (0, 0, 400, 200)
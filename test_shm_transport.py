@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Shared-memory inference pool: slots and futures survive a crashing worker
+"""
+import os
+import numpy as np
+import pytest
+from src.shm_transport import InferencePool, WorkerLost, HandlerError
+
+# First pixel value that makes the test handler kill its process
+CRASH = 255
+
+def crashing_handler():
+    """Handler that exits the worker on CRASH, raises on 7 and otherwise echoes the first pixel"""
+    def handle(array):
+        if array[0, 0, 0] == CRASH:
+            os._exit(3)
+        if array[0, 0, 0] == 7:
+            raise ValueError("bad pixel")
+        return int(array[0, 0, 0])
+    return handle
+
+def _image(value):
+    return np.full((8, 8, 3), value, np.uint8)
+
+def test_worker_crash_releases_slot():
+    """A worker exit fails only its task, frees the slot and respawns the worker"""
+    with InferencePool(2, crashing_handler, slots=2, slot_pixels=64) as pool:
+        assert pool.map([_image(i) for i in range(3)], 60) == [0, 1, 2]
+
+        with pytest.raises(WorkerLost):
+            pool.submit(_image(CRASH)).result(60)
+        with pytest.raises(HandlerError):
+            pool.submit(_image(7)).result(60)
+
+        # Both slots are free again and the pool keeps serving with a replacement worker
+        assert pool.ring._free.qsize() == 2
+        assert pool.restarts == 1
+        assert pool.map([_image(i) for i in range(4)], 60) == [0, 1, 2, 3]
+
+def test_submit_times_out_without_free_slot():
+    """submit() gives up after its timeout instead of blocking forever"""
+    with InferencePool(1, crashing_handler, slots=1, slot_pixels=64) as pool:
+        slot = pool.ring.acquire()
+        with pytest.raises(TimeoutError):
+            pool.submit(_image(1), timeout=0.1)
+        pool.ring.release(slot)
+        assert pool.submit(_image(1)).result(60) == 1
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Tooth locator: lesions go to the tooth box that contains them
+"""
+import numpy as np
+from PIL import Image
+from src.tooth_locator import ToothLocator, arch_layout, assign_teeth, containment
+from src.tooth_numbering import ToothMap
+
+# Two upper teeth side by side over two lower teeth, split at y=100
+TEETH = np.array([[0, 0, 50, 100], [50, 0, 100, 100], [0, 100, 50, 200], [50, 100, 100, 200]], np.float32)
+IDS = np.array([8, 9, 25, 24])
+
+def test_assign_by_containment():
+    """Each lesion goes to the tooth holding most of it, or the nearest one if none overlaps"""
+    lesions = [[10, 10, 30, 30],      # inside tooth 0
+               [40, 150, 70, 170],    # 1/3 in tooth 2, 2/3 in tooth 3
+               [120, 180, 130, 190]]  # outside every box, nearest to tooth 3
+    inside = containment(lesions, TEETH)
+    assert np.allclose(inside[1], [0, 0, 1 / 3, 2 / 3])
+    assert assign_teeth(lesions, TEETH).tolist() == [0, 3, 3]
+    assert assign_teeth(np.zeros((0, 4)), TEETH).tolist() == []
+
+def test_tooth_map_assign():
+    """ToothMap.assign gives Universal or FDI ids and the surface inside the tooth"""
+    lesions = [[35, 80, 45, 95], [55, 105, 65, 115]]
+    assert ToothMap(TEETH, IDS).assign(lesions) == [(8, "MO"), (24, "MO")]
+    assert ToothMap(TEETH, IDS, "fdi").assign(lesions) == [(11, "MO"), (31, "MO")]
+    assert ToothMap(np.zeros((0, 4)), []).assign(lesions) == [(0, "MO")] * 2
+
+def test_layout_fits_the_arch():
+    """Without a tooth model the layout lies inside the arch, not across the whole film"""
+    img = Image.open("data/images/train/100.jpg").convert("RGB")
+    boxes, ids, source = ToothLocator(weights_path="weights/missing.pt").layout(img)
+    assert source == "layout" and sorted(ids.tolist()) == list(range(1, 33))
+    W, H = img.size
+    assert boxes[:, 1].min() > 0.2 * H and boxes[:, 3].max() < 0.8 * H
+    assert (boxes[:, 2] > boxes[:, 0]).all() and (boxes[:, 3] > boxes[:, 1]).all()
+    # Boundaries move to interproximal gaps but keep the tooth order
+    _, _, x2, _ = boxes[:16].T
+    assert (np.diff(x2) > 0).all()
+    plain, _ = arch_layout((0, 0, 100, 50))
+    assert plain[:, 1].min() == 0 and plain[:, 3].max() == 50
@@ -4,8 +4,8 @@ YOLO Training Script for Dental Caries Detection
 """
 import os
 import yaml
-from ultralytics import YOLO
-import torch
+from src.labels import check_labels
+from src.runtime import select_device
 
 def create_dataset_config():
     """Create dataset configuration for YOLO training"""
@@ -80,19 +80,39 @@ def create_sample_annotations():
     print("✅ Sample annotation files created")
     print("⚠️  IMPORTANT: Replace sample annotations with real bounding box coordinates!")
 
-def train_model():
-    """Train YOLO model for caries detection"""
+def train_model(use_image_cache=True, model_name='yolov8n.pt', callbacks=None, auto_resume=True, **overrides):
+    """Train YOLO model for caries detection
+
+    With use_image_cache, images are decoded once into a memory-mapped cache
+    (see build_image_cache.py) instead of being decoded every epoch. Keyword
+    overrides replace entries of the default training config (sweep_train.py
+    uses them to vary imgsz, batch, augmentation, ...); callbacks maps
+    ultralytics event names to functions.
+
+    With auto_resume, an unfinished run under <project>/<name>* (last.pt is
+    written every epoch) is resumed instead of starting over.
+    """
     print("🚀 Starting YOLO training...")
     
+    # ultralytics pulls in torch, so import it only when training
+    from ultralytics import YOLO
+    from src.image_cache import cached_trainer
+    from src.training import EpochTimer, find_resumable_run, mark_complete
+
     # Check if CUDA is available
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    device = select_device()
     print(f"🖥️  Using device: {device}")
     
-    # Load YOLO model (YOLOv8n for faster training, YOLOv8s for better accuracy)
-    model = YOLO('yolov8n.pt')  # You can use 'yolov8s.pt' for better accuracy
+    def load(weights):
+        model = YOLO(weights)
+        for event, callback in EpochTimer().callbacks().items():
+            model.add_callback(event, callback)
+        for event, callback in (callbacks or {}).items():
+            model.add_callback(event, callback)
+        return model
     
-    # Train the model
-    results = model.train(
+    # Training configuration
+    train_args = dict(
         data='data/dataset.yaml',
         epochs=100,  # Number of training epochs
         imgsz=640,   # Image size
@@ -135,25 +155,26 @@ def train_model():
         profile=False,  # Profile ONNX and TensorRT speeds
         freeze=None,    # Freeze layers
         multi_scale=False,   # Multi-scale training
-        overlap_mask=True,   # Overlap mask
-        mask_ratio=4,        # Mask ratio
-        dropout=0.0,         # Dropout
-        val=True,            # Validate during training
-        plots=True,          # Generate training plots
-        verbose=True,        # Verbose output
-        seed=0,              # Random seed
-        deterministic=True,  # Deterministic training
-        single_cls=False,    # Single class training
-        rect=False,          # Rectangular training
-        cos_lr=False,        # Cosine LR scheduler
-        close_mosaic=10,    # Close mosaic augmentation
-        resume=False,        # Resume training
-        amp=True,            # Automatic Mixed Precision
-        fraction=1.0,        # Dataset fraction
-        profile=False,       # Profile ONNX and TensorRT speeds
-        freeze=None,         # Freeze layers
-        multi_scale=False,   # Multi-scale training
     )
+    train_args.update(overrides)
+    trainer = cached_trainer() if use_image_cache else None
+    
+    # Resume an interrupted run (ultralytics restores its args, optimizer and epoch)
+    results = None
+    checkpoint = (find_resumable_run(f"{train_args['project']}/{train_args['name']}*", train_args['data'])
+                  if auto_resume else None)
+    if checkpoint:
+        print(f"♻️  Resuming interrupted run from {checkpoint}")
+        try:
+            results = load(checkpoint).train(trainer=trainer, resume=True)
+        except AssertionError as e:
+            # e.g. an early-stopped run from before completion markers existed
+            print(f"⚠️  Cannot resume ({e}); starting a new run")
+    
+    # Train the model (YOLOv8n for faster training, YOLOv8s for better accuracy)
+    if results is None:
+        results = load(model_name).train(trainer=trainer, **train_args)
+    mark_complete(results.save_dir)
     
     print("✅ Training completed!")
     print(f"📁 Model saved to: {results.save_dir}")
@@ -166,14 +187,17 @@ def validate_model(model_path):
     print("🔍 Validating trained model...")
     
     # Load the trained model
+    from ultralytics import YOLO
+    from src.image_cache import cached_validator
     model = YOLO(model_path)
     
-    # Validate on validation set
+    # Validate on validation set (images come from the pre-decoded cache)
     results = model.val(
+        validator=cached_validator(),
         data='data/dataset.yaml',
         imgsz=640,
         batch=16,
-        device='cuda' if torch.cuda.is_available() else 'cpu',
+        device=select_device(),
         project='runs/val',
         name='caries_validation',
         save=True,
@@ -205,6 +229,12 @@ def main():
     # Step 3: Create sample annotations (if needed)
     create_sample_annotations()
     
+    # Step 3b: Validate every label once (index is cached for later runs)
+    print("\n🔎 Validating labels...")
+    if not check_labels('data/dataset.yaml'):
+        print("❌ Fix the label errors above before training.")
+        return
+    
     # Step 4: Train the model
     print("\n🚀 Starting training...")
     results = train_model()
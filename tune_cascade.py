@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Pick the cascade screening threshold: recall lost versus detection compute saved
+"""
+import argparse
+import glob
+import json
+import os
+import time
+import numpy as np
+from PIL import Image
+from src.detect import Detector
+from src.tiling import box_iou
+from evaluate_tiling import load_yolo_labels
+
+def profile(detector, images, iou_thr=0.3):
+    """Per image: screen score, screen and full-detection time, lesions and hits"""
+    rows = []
+    for img_path in images:
+        img = Image.open(img_path).convert("RGB")
+        label_path = img_path.replace('images', 'labels').rsplit('.', 1)[0] + '.txt'
+        gt = load_yolo_labels(label_path, img.size)
+
+        detector.screen(img)  # warmup
+        start = time.perf_counter()
+        score = detector.screen(img)
+        screen_ms = (time.perf_counter() - start) * 1000
+
+        detector.detect(img)  # warmup (cascade is off on this detector)
+        start = time.perf_counter()
+        dets = detector.detect(img)
+        full_ms = (time.perf_counter() - start) * 1000
+
+        hits = 0
+        if len(gt) and dets:
+            pred = np.array([d["bbox"] for d in dets], dtype=np.float32)
+            hits = int((box_iou(gt, pred).max(axis=1) >= iou_thr).sum())
+        rows.append({"image": img_path, "score": round(score, 4), "screen_ms": screen_ms,
+                     "full_ms": full_ms, "lesions": len(gt), "hits": hits})
+    return rows
+
+def sweep(rows, thresholds):
+    """Recall and compute of the cascade at each threshold, relative to always running full detection"""
+    score = np.array([r["score"] for r in rows])
+    screen_ms = np.array([r["screen_ms"] for r in rows])
+    full_ms = np.array([r["full_ms"] for r in rows])
+    lesions = np.array([r["lesions"] for r in rows])
+    hits = np.array([r["hits"] for r in rows])
+    base_hits, base_ms = hits.sum(), full_ms.sum()
+
+    table = []
+    for thr in thresholds:
+        passed = score >= thr
+        cascade_ms = screen_ms.sum() + full_ms[passed].sum()
+        table.append({
+            "threshold": round(float(thr), 3),
+            "images_detected": int(passed.sum()),
+            "images_skipped": int((~passed).sum()),
+            "recall": round(float(hits[passed].sum() / lesions.sum()), 3) if lesions.sum() else None,
+            "recall_loss": round(float(1 - hits[passed].sum() / base_hits), 3) if base_hits else 0.0,
+            "compute_saved": round(float(1 - cascade_ms / base_ms), 3) if base_ms else 0.0,
+        })
+    return table
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the cascade screening threshold")
+    parser.add_argument("--weights", default="weights/best.pt")
+    parser.add_argument("--screen-weights", default=None, help="e.g. weights/student.pt")
+    parser.add_argument("--screen-imgsz", type=int, default=320)
+    parser.add_argument("--images", nargs="+", default=["data/images/val"])
+    parser.add_argument("--max-recall-loss", type=float, default=0.02,
+                        help="largest acceptable share of full-detector hits lost to the screen")
+    parser.add_argument("--output", default=".outputs/cascade_report.json")
+    args = parser.parse_args()
+
+    images = sorted(p for d in args.images for p in glob.glob(f"{d}/*.jpg") + glob.glob(f"{d}/*.png"))
+    if not images:
+        print(f"❌ No images found in {', '.join(args.images)}")
+        return 1
+
+    print("🦷 Cascade Threshold Tuning")
+    print("=" * 50)
+
+    detector = Detector(args.weights, mock_ok=False, cascade=False,
+                        screen_weights=args.screen_weights, screen_imgsz=args.screen_imgsz)
+    if detector.use_mock:
+        print("❌ No trained model loaded - the cascade needs real screening scores")
+        return 1
+    detector._load_screener()
+
+    rows = profile(detector, images)
+    thresholds = np.unique(np.concatenate([[0.0, 0.01, 0.05, 0.1, 0.2, 0.3, 0.5],
+                                           [r["score"] for r in rows]]))
+    table = sweep(rows, thresholds)
+
+    # Highest threshold (most compute saved) whose recall loss is acceptable
+    ok = [t for t in table if t["recall_loss"] <= args.max_recall_loss]
+    best = max(ok, key=lambda t: (t["compute_saved"], -t["threshold"])) if ok else table[0]
+
+    print(f"{'threshold':>10}{'skipped':>9}{'recall':>8}{'loss':>7}{'saved':>7}")
+    for t in table:
+        mark = "  ◀" if t is best else ""
+        print(f"{t['threshold']:>10}{t['images_skipped']:>9}{str(t['recall']):>8}"
+              f"{t['recall_loss']:>7}{t['compute_saved']:>7}{mark}")
+    print(f"\n✅ Recommended: CASCADE_THRESHOLD={best['threshold']} "
+          f"({best['compute_saved']:.0%} compute saved, {best['recall_loss']:.1%} recall lost)")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"weights": args.weights, "screen_weights": args.screen_weights,
+                   "screen_imgsz": args.screen_imgsz, "recommended": best,
+                   "thresholds": table, "images": rows}, f, indent=2)
+    print(f"📝 Report saved: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Validate YOLO labels and print dataset statistics
+
+Parses every labels/*.txt of a dataset in bulk, checks class ids, coordinate
+ranges and image/label pairing, and caches the result as a .npz index next to
+each image split so visualization and training prep can reuse it.
+"""
+import argparse
+import json
+import time
+from src.labels import index_dataset
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate YOLO labels and build the label index")
+    parser.add_argument("--data", default="data/dataset.yaml", help="dataset.yaml to validate")
+    parser.add_argument("--force", action="store_true", help="reparse even if labels are unchanged")
+    parser.add_argument("--json", action="store_true", help="print statistics as JSON")
+    args = parser.parse_args()
+
+    print("🦷 Label Validation")
+    print("=" * 40)
+    start = time.perf_counter()
+    indexes = index_dataset(args.data, force=args.force)
+    elapsed = time.perf_counter() - start
+
+    total_errors = 0
+    for split, index in indexes.items():
+        stats, errors, warnings = index.stats(), index.errors(), index.warnings()
+        total_errors += len(errors)
+        print(f"\n📊 {split} ({index.path})")
+        if args.json:
+            print(json.dumps(stats, indent=2))
+        else:
+            for key, value in stats.items():
+                print(f"   {key}: {value}")
+        for message in errors:
+            print(f"   ❌ {message}")
+        for message in warnings:
+            print(f"   ⚠️  {message}")
+
+    print(f"\n⏱️  Indexed {sum(len(i) for i in indexes.values())} images in {elapsed:.2f}s")
+    if total_errors:
+        print(f"❌ {total_errors} label errors")
+        return 1
+    print("✅ All labels valid")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,59 +2,151 @@
 """
 Annotation Visualization Tool
 Shows bounding boxes on your dental X-rays
+
+Renders in parallel and only redraws images whose pixels or labels changed since
+the last run. --contact-sheet tiles annotated thumbnails into a few mosaics for
+fast review of large datasets.
 """
+import argparse
+import hashlib
+import json
 import os
-from PIL import Image, ImageDraw, ImageFont
-import glob
+import sys
+import time
+from multiprocessing import Pool
+from PIL import Image, ImageDraw
+from src.labels import index_dataset
+
+MANIFEST = '.manifest.json'
+
+def _key(img_path, labels):
+    """Changes whenever the image file or its label rows change"""
+    st = os.stat(img_path)
+    h = hashlib.sha1(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    h.update(labels.tobytes())
+    return h.hexdigest()
+
+def _draw(img, boxes, class_ids, scale=1.0, width=3):
+    draw = ImageDraw.Draw(img)
+    for (x1, y1, x2, y2), class_id in zip(boxes, class_ids):
+        x1, y1, x2, y2 = (int(v * scale) for v in (x1, y1, x2, y2))
+        draw.rectangle([x1, y1, x2, y2], outline='red', width=width)
+        if scale == 1.0:
+            draw.text((x1, y1-20), f'Caries {class_id:g}', fill='red')
+    return img
+
+def render_image(task):
+    """Worker: draw one full-size visualization"""
+    img_path, boxes, class_ids, output_path = task
+    img = Image.open(img_path)
+    _draw(img, boxes, class_ids)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    img.save(output_path)
+    return output_path
+
+def render_sheet(task):
+    """Worker: tile annotated thumbnails of many images into one mosaic"""
+    items, output_path, thumb, cols = task
+    rows = (len(items) + cols - 1) // cols
+    sheet = Image.new('RGB', (cols * thumb, rows * thumb), 'black')
+    for n, (img_path, boxes, class_ids, w0) in enumerate(items):
+        img = Image.open(img_path)
+        # JPEG decodes at a reduced scale directly, no full-size decode needed
+        img.draft('RGB', (thumb, thumb))
+        img = img.convert('RGB')
+        img.thumbnail((thumb, thumb))
+        _draw(img, boxes, class_ids, scale=img.size[0] / w0, width=2)
+        x, y = (n % cols) * thumb, (n // cols) * thumb
+        sheet.paste(img, (x + (thumb - img.size[0]) // 2, y + (thumb - img.size[1]) // 2))
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    sheet.save(output_path, quality=85)
+    return output_path
+
+def _load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _run(tasks, worker, workers, label):
+    """Render tasks on a process pool, streaming progress as results arrive"""
+    if not tasks:
+        return
+    start = time.perf_counter()
+    with Pool(min(workers, len(tasks))) as pool:
+        for done, _ in enumerate(pool.imap_unordered(worker, tasks, chunksize=4), 1):
+            sys.stdout.write(f"\r   {label}: {done}/{len(tasks)} ({done / (time.perf_counter() - start):.1f}/s)")
+            sys.stdout.flush()
+    print()
 
-def visualize_annotations():
+def visualize_annotations(dataset_yaml='data/dataset.yaml', output_dir='data/visualizations',
+                          workers=None, force=False, contact_sheet=False, thumb=256, cols=8, rows=8):
     """Visualize annotations on images"""
     print("🔍 Visualizing annotations...")
-    
-    # Get all images
-    images = glob.glob('data/images/**/*.jpg', recursive=True) +              glob.glob('data/images/**/*.png', recursive=True)
-    
-    if not images:
+    workers = workers or os.cpu_count() or 1
+
+    # Labels come from the cached label index instead of reparsing every .txt
+    indexes = index_dataset(dataset_yaml)
+    if not any(len(index) for index in indexes.values()):
         print("❌ No images found")
         return
-    
-    for img_path in images:
-        # Load image
-        img = Image.open(img_path)
-        draw = ImageDraw.Draw(img)
-        
-        # Get corresponding label file
-        label_path = img_path.replace('images', 'labels').rsplit('.', 1)[0] + '.txt'
-        
-        if os.path.exists(label_path):
-            # Read annotations
-            with open(label_path, 'r') as f:
-                lines = f.readlines()
-            
-            # Draw bounding boxes
-            for line in lines:
-                parts = line.strip().split()
-                if len(parts) == 5:
-                    class_id, center_x, center_y, width, height = map(float, parts)
-                    
-                    # Convert normalized coordinates to pixel coordinates
-                    img_width, img_height = img.size
-                    x1 = int((center_x - width/2) * img_width)
-                    y1 = int((center_y - height/2) * img_height)
-                    x2 = int((center_x + width/2) * img_width)
-                    y2 = int((center_y + height/2) * img_height)
-                    
-                    # Draw rectangle
-                    draw.rectangle([x1, y1, x2, y2], outline='red', width=3)
-                    
-                    # Draw label
-                    draw.text((x1, y1-20), f'Caries {class_id}', fill='red')
-        
-        # Save visualization
-        output_path = img_path.replace('images', 'visualizations')
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        img.save(output_path)
-        print(f"   Saved: {output_path}")
+
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    manifest = {} if force else _load_manifest(manifest_path)
+    current, image_tasks, sheet_tasks = {}, [], []
+
+    for split, index in indexes.items():
+        items = []
+        for i, img_path in enumerate(index.image_files):
+            labels = index.labels(i)
+            key = _key(img_path, labels)
+            item = (img_path, index.pixel_boxes(i).tolist(), labels[:, 0].tolist())
+            items.append((key, (*item, int(index.image_sizes[i][0]))))
+            if contact_sheet:
+                continue
+            output_path = os.path.join(output_dir, split, os.path.basename(img_path))
+            current[output_path] = key
+            if manifest.get(output_path) != key or not os.path.exists(output_path):
+                image_tasks.append((*item, output_path))
+
+        if contact_sheet:
+            per_sheet = cols * rows
+            for s in range(0, len(items), per_sheet):
+                chunk = items[s:s + per_sheet]
+                output_path = os.path.join(output_dir, 'contact_sheets', f'{split}_{s // per_sheet:03d}.jpg')
+                key = hashlib.sha1(f"{thumb}:{cols}".encode() + ''.join(k for k, _ in chunk).encode()).hexdigest()
+                current[output_path] = key
+                if manifest.get(output_path) != key or not os.path.exists(output_path):
+                    sheet_tasks.append(([item for _, item in chunk], output_path, thumb, cols))
+
+        for message in index.errors():
+            print(f"   ❌ {split}: {message}")
+
+    skipped = len(current) - len(image_tasks) - len(sheet_tasks)
+    print(f"   {len(image_tasks) + len(sheet_tasks)} to render, {skipped} unchanged, {workers} workers")
+    _run(image_tasks, render_image, workers, "images")
+    _run(sheet_tasks, render_sheet, workers, "contact sheets")
+
+    manifest.update(current)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    print(f"✅ Visualizations in {output_dir}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Draw YOLO annotations on dataset images")
+    parser.add_argument("--data", default="data/dataset.yaml")
+    parser.add_argument("--output", default="data/visualizations")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: all CPUs)")
+    parser.add_argument("--force", action="store_true", help="redraw even unchanged images")
+    parser.add_argument("--contact-sheet", action="store_true", help="tile thumbnails into mosaics instead")
+    parser.add_argument("--thumb", type=int, default=256, help="contact sheet thumbnail size in pixels")
+    parser.add_argument("--cols", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=8)
+    args = parser.parse_args()
+    visualize_annotations(args.data, args.output, args.workers, args.force,
+                          args.contact_sheet, args.thumb, args.cols, args.rows)
 
 if __name__ == "__main__":
-    visualize_annotations()
+    main()